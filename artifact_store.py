@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+
+class ArtifactStore:
+    """Store d'artefacts adressé par contenu, partagé entre les runs du pipeline.
+
+    Chaque fichier produit est stocké une seule fois sous objects/<sha256>. Un manifeste par
+    (étape, clé) associe les noms de sortie aux objets; la clé est calculée à partir des
+    entrées et de la configuration de l'étape, si bien qu'un nouveau run ne refait que les
+    éléments dont les entrées ont changé et relie (hardlink) tout le reste.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.manifests_dir = self.root / 'manifests'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def hash_file(path, buffer_size=1024 * 1024):
+        """Empreinte SHA-256 d'un fichier, lu par blocs"""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(buffer_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def key(stage, inputs, config=None):
+        """Clé d'un artefact: empreinte des entrées et de la configuration de l'étape"""
+        payload = json.dumps(
+            {"stage": stage, "inputs": inputs, "config": config or {}},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def object_path(self, digest):
+        """Chemin d'un objet dans le store"""
+        return self.objects_dir / digest[:2] / digest
+
+    def put_file(self, path):
+        """Ajoute un fichier au store et retourne son empreinte"""
+        digest = self.hash_file(path)
+        target = self.object_path(digest)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f"{digest}.{os.getpid()}.tmp")
+            link_or_copy(path, tmp_path)
+            os.replace(tmp_path, target)
+        return digest
+
+    def manifest_path(self, stage, key):
+        return self.manifests_dir / stage / f"{key}.json"
+
+    def record(self, stage, key, outputs, lineage=None, **attributes):
+        """Enregistre les sorties {nom relatif: chemin} d'une étape pour une clé.
+
+        lineage (empreinte de la source: site, dossier d'entrée...) tient à jour un dernier
+        manifeste propre à cette source, en plus du dernier manifeste de l'étape.
+        """
+        manifest = {
+            "stage": stage,
+            "key": key,
+            "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+            "outputs": {str(name): self.put_file(path) for name, path in outputs.items()},
+            **attributes
+        }
+        path = self.manifest_path(stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+
+        # Dernier manifeste de l'étape (et de la source), base des mises à jour incrémentales
+        self.set_latest(stage, key)
+        if lineage:
+            self.set_latest(stage, key, lineage)
+        return manifest
+
+    def lookup(self, stage, key):
+        """Retourne le manifeste d'une clé si tous ses objets sont présents"""
+        path = self.manifest_path(stage, key)
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if not all(self.object_path(digest).exists() for digest in manifest['outputs'].values()):
+            self.logger.warning(f"Objets manquants pour {stage}/{key}, artefact ignoré")
+            return None
+        return manifest
+
+    def latest_path(self, stage, lineage=None):
+        return self.manifests_dir / stage / (f'latest-{lineage}' if lineage else 'latest')
+
+    def set_latest(self, stage, key, lineage=None):
+        self.latest_path(stage, lineage).write_text(key, encoding='utf-8')
+
+    def latest(self, stage, lineage=None):
+        """Dernier manifeste enregistré pour une étape (pour une source si lineage est donné)"""
+        latest_path = self.latest_path(stage, lineage)
+        if not latest_path.exists():
+            return None
+        return self.lookup(stage, latest_path.read_text(encoding='utf-8').strip())
+
+    def materialize(self, manifest, dest_dir):
+        """Relie les sorties d'un manifeste dans un dossier de run"""
+        dest_dir = Path(dest_dir)
+        paths = []
+        for name, digest in manifest['outputs'].items():
+            target = dest_dir / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if target.exists():
+                if self.hash_file(target) == digest:
+                    paths.append(target)
+                    continue
+                target.unlink()
+            link_or_copy(self.object_path(digest), target)
+            paths.append(target)
+        return paths
+
+
+def link_or_copy(source, target):
+    """Crée un hardlink, ou une copie si le système de fichiers ne le permet pas"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def collect_outputs(directory, pattern='**/*'):
+    """Sorties d'un dossier sous forme {chemin relatif: chemin}"""
+    directory = Path(directory)
+    return {
+        path.relative_to(directory).as_posix(): path
+        for path in sorted(directory.glob(pattern)) if path.is_file()
+    }
@@ -0,0 +1,68 @@
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from dedup import Deduplicator, connected_components
+
+
+def generate_corpus(output_dir, rows, dim, duplicate_share=0.3, noise=0.05, seed=0):
+    """Vecteurs aléatoires dont une part sont des variantes bruitées d'autres lignes.
+
+    Retourne le label attendu de chaque ligne (indice de la ligne d'origine de sa variante).
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # Variantes de produits et chunks qui se chevauchent: copies bruitées d'une ligne d'origine
+    variants = rng.choice(rows, size=int(rows * duplicate_share), replace=False)
+    originals = np.setdiff1d(np.arange(rows), variants)
+    sources = rng.choice(originals, size=len(variants))
+    vectors[variants] = vectors[sources] + noise * rng.standard_normal((len(variants), dim)).astype(np.float32) / np.sqrt(dim)
+    expected = np.arange(rows)
+    expected[variants] = sources
+
+    with open(Path(output_dir) / "chunks.json", 'w', encoding='utf-8') as f:
+        json.dump({"metadata": [
+            {"filename": f"doc_{i // 10}.txt", "chunk_id": i % 10, "text": f"chunk {i}"} for i in range(rows)
+        ]}, f)
+    np.save(Path(output_dir) / "embeddings.npy", vectors)
+    return connected_components(rows, np.arange(rows), expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark du dédoublonnage des embeddings (dedup.py)')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 50000, 200000, 1000000])
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--duplicate-share', type=float, default=0.3)
+    parser.add_argument('--threshold', type=float, default=0.98)
+    parser.add_argument('--blocked-max-rows', type=int, default=50000,
+                        help='Au-delà, la méthode exacte par blocs (O(n²)) n\'est pas mesurée')
+    args = parser.parse_args()
+
+    print(f"Vecteurs de dimension {args.dim}, {args.duplicate_share:.0%} de variantes, cosinus ≥ {args.threshold}")
+    for rows in args.rows:
+        for method in ['blocked', 'lsh']:
+            if method == 'blocked' and rows > args.blocked_max_rows:
+                continue
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                expected = generate_corpus(tmp_dir, rows, args.dim, args.duplicate_share)
+                deduplicator = Deduplicator(threshold=args.threshold, method=method)
+                start = time.perf_counter()
+                report = deduplicator.deduplicate(tmp_dir)
+                duration = time.perf_counter() - start
+
+                # Rappel: part des variantes attendues effectivement retirées
+                expected_removed = rows - len(np.unique(expected))
+                print(
+                    f"{rows:>8} lignes, {method:<7}: {duration:7.2f}s, "
+                    f"{report['rows_before']} -> {report['rows_after']} lignes "
+                    f"({report['bytes_before'] / 1024 / 1024:.0f} -> {report['bytes_after'] / 1024 / 1024:.0f} Mo), "
+                    f"{report['removed']}/{expected_removed} doublons retirés"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from lexical_index import HybridIndex, LexicalIndex, export_lexical_index
+
+
+def generate_corpus(output_dir, rows, dim, words_per_chunk, vocabulary=50000, seed=0):
+    """Corpus synthétique: mots de fréquence Zipf, une référence produit par chunk, vecteurs aléatoires"""
+    rng = np.random.default_rng(seed)
+    words = [f"mot{i}" for i in range(vocabulary)]
+    ranks = np.minimum(rng.zipf(1.2, size=(rows, words_per_chunk)) - 1, vocabulary - 1)
+    skus = [f"ORF-R{i:06d}" for i in range(rows)]
+
+    texts = [
+        ' '.join(words[rank] for rank in row) + f" Modèle {skus[i]}, 120/240 V"
+        for i, row in enumerate(ranks)
+    ]
+    with open(Path(output_dir) / "chunks.json", 'w', encoding='utf-8') as f:
+        json.dump({"metadata": [
+            {"filename": f"doc_{i // 10}.txt", "chunk_id": i % 10, "text": text}
+            for i, text in enumerate(texts)
+        ]}, f, ensure_ascii=False)
+    np.save(Path(output_dir) / "embeddings.npy", rng.standard_normal((rows, dim)).astype(np.float32))
+    return texts, skus
+
+
+def percentiles(durations):
+    values = np.array(durations) * 1000
+    return f"p50 {np.percentile(values, 50):.2f} ms, p99 {np.percentile(values, 99):.2f} ms"
+
+
+def measure(func, queries):
+    """Latence de chaque requête et résultats"""
+    durations, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(func(query))
+        durations.append(time.perf_counter() - start)
+    return durations, results
+
+
+def run(rows, args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        texts, skus = generate_corpus(tmp_dir, rows, args.dim, args.words)
+        print(f"\n== {rows} chunks (génération {time.perf_counter() - start:.1f}s)")
+
+        start = time.perf_counter()
+        export_lexical_index(texts, tmp_dir)
+        build_time = time.perf_counter() - start
+        lexical = LexicalIndex.load(tmp_dir)
+        text_bytes = sum(len(text.encode('utf-8')) for text in texts)
+        print(
+            f"Index BM25: {len(lexical.terms)} termes, {len(lexical.postings)} postings, "
+            f"{lexical.nbytes / 1024 / 1024:.1f} Mo (texte {text_bytes / 1024 / 1024:.1f} Mo), "
+            f"construction {build_time:.1f}s"
+        )
+
+        rng = np.random.default_rng(1)
+        targets = rng.integers(0, rows, size=args.queries)
+        sku_queries = [skus[i] for i in targets]
+        durations, results = measure(lambda q: lexical.search(q, k=args.k), sku_queries)
+        found = np.mean([len(ids) and ids[0] == target for (ids, _), target in zip(results, targets)])
+        print(f"BM25 référence (ex. {sku_queries[0]}) : {percentiles(durations)}, top-1 exact {found:.3f}")
+
+        # Variantes de saisie de la même référence
+        variants = [sku.replace('-', '') for sku in sku_queries] + [sku.lower().replace('-', ' ') for sku in sku_queries]
+        durations, results = measure(lambda q: lexical.search(q, k=args.k), variants)
+        found = np.mean([
+            len(ids) and ids[0] == target for (ids, _), target in zip(results, list(targets) * 2)
+        ])
+        print(f"BM25 variantes (ORFR..., orf r...)   : {percentiles(durations)}, top-1 exact {found:.3f}")
+
+        word_queries = [' '.join(texts[i].split()[:3]) for i in targets]
+        durations, _ = measure(lambda q: lexical.search(q, k=args.k), word_queries)
+        print(f"BM25 3 mots                          : {percentiles(durations)}")
+
+        scan_queries = sku_queries[:args.scan_queries]
+        durations, _ = measure(lambda q: [i for i, text in enumerate(texts) if q in text][:args.k], scan_queries)
+        print(f"Parcours des sous-chaînes (référence): {percentiles(durations)}")
+        del texts
+
+        start = time.perf_counter()
+        hybrid = HybridIndex(tmp_dir)
+        print(f"Index hybride chargé en {time.perf_counter() - start:.1f}s")
+        query_vectors = np.asarray(hybrid.vector_index.vectors[targets])
+        durations, results = measure(
+            lambda i: hybrid.search_ids(sku_queries[i], query_vectors[i], k=args.k), range(len(targets))
+        )
+        found = np.mean([ids[0] == target for (ids, *_), target in zip(results, targets)])
+        print(f"Hybride (BM25 + cosinus exact)       : {percentiles(durations)}, top-1 exact {found:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de la recherche lexicale BM25 et hybride')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--dim', type=int, default=64, help='Dimension des vecteurs synthétiques')
+    parser.add_argument('--words', type=int, default=40, help='Mots par chunk')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--scan-queries', type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        run(rows, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+from mock_openai_server import MockOpenAIServer
+from pipeline import Pipeline
+
+WORDS = (
+    "chauffage plinthe convecteur thermostat aérotherme puissance tension garantie installation "
+    "modèle blanc acier watts volts longueur prix mural encastré salle bain ventilateur radiant "
+    "contrôle électronique programmable sécurité protection surchauffe commercial résidentiel"
+).split()
+
+
+def generate_documents(content_dir, docs, words_per_doc, seed=0):
+    """Écrit des fichiers de contenu synthétiques (texte produit avec références SKU)"""
+    rng = random.Random(seed)
+    content_dir = Path(content_dir)
+    content_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(docs):
+        lines = [f"# Produit ORF-{i:04d}"]
+        for _ in range(words_per_doc // 12):
+            lines.append(' '.join(rng.choice(WORDS) for _ in range(12)) + '.')
+        (content_dir / f"content_{i:05d}.txt").write_text('\n'.join(lines), encoding='utf-8')
+    return content_dir
+
+
+def api_calls(client):
+    """Nombre total d'appels HTTP effectués par le client (retries inclus)"""
+    return sum(stats['calls'] for stats in client.metrics().values())
+
+
+def run_stage(name, func, client, docs, count_units):
+    """Exécute une étape et calcule son débit"""
+    calls_before = api_calls(client)
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    units = count_units()
+    calls = api_calls(client) - calls_before
+    return {
+        "stage": name,
+        "docs": docs,
+        "units": units,
+        "seconds": elapsed,
+        "docs_per_min": docs / elapsed * 60 if elapsed else 0.0,
+        "units_per_s": units / elapsed if elapsed else 0.0,
+        "api_calls_per_doc": calls / docs if docs else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de bout en bout du pipeline contre un serveur OpenAI simulé')
+    parser.add_argument('--docs', type=int, default=50, help='Nombre de documents de contenu synthétiques')
+    parser.add_argument('--words', type=int, default=1500, help='Mots par document')
+    parser.add_argument('--pdf-dir', help='Dossier de PDFs réels à faire passer par PDFExtractor')
+    parser.add_argument('--latency', type=float, default=0.2, help='Latence simulée des complétions (s)')
+    parser.add_argument('--embedding-latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Proportion de 429 injectés')
+    parser.add_argument('--rpm', type=int, default=None)
+    parser.add_argument('--tpm', type=int, default=None)
+    parser.add_argument('--config', help='Fichier de configuration du pipeline (options des étapes)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    server = MockOpenAIServer(
+        latency=args.latency, embedding_latency=args.embedding_latency, error_rate=args.error_rate,
+        requests_per_minute=args.rpm, tokens_per_minute=args.tpm
+    ).start()
+
+    config = {}
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pipeline = Pipeline(openai_api_key='mock', options={
+            **config,
+            'output_dir': tmp_dir,
+            'artifact_reuse': False,
+            'api_options': {**(config.get('api_options') or {}), 'base_url': server.base_url},
+            # Cache en mémoire: aucun résultat réutilisé d'un run de benchmark à l'autre
+            'embedding_options': {**(config.get('embedding_options') or {}), 'cache_path': None}
+        })
+        client = pipeline.api_client()
+        content_dir = Path(pipeline.dirs['crawler']) / 'content'
+
+        if args.pdf_dir:
+            pdf_count = len(list(Path(args.pdf_dir).glob('*.pdf')))
+            results.append(run_stage(
+                'pdf', lambda: pipeline.run_pdf_processor(args.pdf_dir, content_dir), client, pdf_count,
+                lambda: len(list(content_dir.glob('*.txt')))
+            ))
+
+        generate_documents(content_dir, args.docs, args.words)
+        doc_count = len(list(content_dir.glob('*.txt')))
+
+        def count_chunks():
+            with open(Path(pipeline.dirs['embeddings']) / 'chunks.json', 'r', encoding='utf-8') as f:
+                return len(json.load(f)['metadata'])
+
+        results.append(run_stage('embedding', pipeline.run_embedding, client, doc_count, count_chunks))
+
+    server.shutdown()
+    print(f"{'étape':<10} {'docs':>6} {'unités':>8} {'durée (s)':>10} {'docs/min':>10} {'unités/s':>10} {'appels/doc':>11}")
+    for result in results:
+        print(
+            f"{result['stage']:<10} {result['docs']:>6} {result['units']:>8} {result['seconds']:>10.1f} "
+            f"{result['docs_per_min']:>10.1f} {result['units_per_s']:>10.2f} {result['api_calls_per_doc']:>11.2f}"
+        )
+    print(f"Serveur simulé: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
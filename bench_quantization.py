@@ -0,0 +1,52 @@
+import argparse
+import tempfile
+import time
+import numpy as np
+from bench_vector_search import generate_corpus, recall_at_k
+from quantization import QuantizedIndex, export_int8
+from vector_search import VectorIndex
+
+
+def throughput(index, queries, k, repeat=3):
+    """Nombre de requêtes par seconde (meilleur de plusieurs passes)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        index.search_vectors(queries, k=k)
+        best = min(best, time.perf_counter() - start)
+    return len(queries) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark stockage/débit/rappel des embeddings quantifiés int8')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queries = generate_corpus(tmp_dir, args.rows, args.dim)[:args.batch]
+        full = VectorIndex(tmp_dir)
+        export_int8(full.vectors, tmp_dir)
+        quantized = QuantizedIndex(tmp_dir)
+
+        mib = 1024 * 1024
+        print(f"Corpus: {args.rows} vecteurs x {args.dim} dims")
+        print(f"Stockage float64 : {args.rows * args.dim * 8 / mib:8.1f} MiB")
+        print(f"Stockage float32 : {full.vectors.nbytes / mib:8.1f} MiB")
+        print(f"Stockage int8    : {quantized.codes.nbytes / mib:8.1f} MiB")
+        # Le score int8 élargit chaque bloc en float32: seul le stockage (disque, cache de pages) est réduit
+        print(f"Bloc float32 temporaire de la recherche int8 : "
+              f"{quantized.block_size * args.dim * 4 / mib:.1f} MiB ({quantized.block_size} lignes)")
+
+        print(f"Débit float32    : {throughput(full, queries, args.k):8.1f} requêtes/s")
+        print(f"Débit int8       : {throughput(quantized, queries, args.k):8.1f} requêtes/s")
+
+        exact_ids, _ = full.search_vectors(queries, k=args.k)
+        quantized_ids, _ = quantized.search_vectors(queries, k=args.k)
+        print(f"recall@{args.k} int8   : {recall_at_k(exact_ids, quantized_ids):.3f}")
+
+
+if __name__ == "__main__":
+    main()
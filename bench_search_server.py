@@ -0,0 +1,97 @@
+import argparse
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from bench_lexical_search import generate_corpus
+from mock_openai_server import MockOpenAIServer
+from openai_client import OpenAIClient
+from search_server import SearchServer
+
+
+def load_test(url, queries, concurrency, total):
+    """Envoie total requêtes avec concurrency clients; retourne les latences et la durée"""
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def client():
+        session = requests.Session()
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            start = time.perf_counter()
+            response = session.post(f"{url}/search", json={"query": queries[index % len(queries)]}, timeout=60)
+            response.raise_for_status()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return latencies, time.perf_counter() - start
+
+
+def report(label, latencies, duration, stats):
+    values = np.array(latencies) * 1000
+    batcher = stats['batcher']
+    print(
+        f"{label}: p50 {np.percentile(values, 50):.2f} ms, p99 {np.percentile(values, 99):.2f} ms, "
+        f"{len(values) / duration:.0f} QPS | lot moyen {batcher['mean_batch_size']}, "
+        f"cache résultats {stats['result_cache']['hit_rate']:.0%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Test de charge du service de recherche (search_server.py)')
+    parser.add_argument('--url', help='Service déjà démarré (sinon corpus synthétique et serveur local)')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=256)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--max-batch', type=int, nargs='+', default=[1, 64],
+                        help='Tailles de lot comparées (1 = sans micro-batching)')
+    parser.add_argument('--distinct', type=float, default=0.5,
+                        help='Proportion de requêtes distinctes (le reste répète des requêtes déjà vues)')
+    parser.add_argument('--embedding-latency', type=float, default=0.02,
+                        help="Latence simulée de l'API d'embeddings des requêtes (s)")
+    args = parser.parse_args()
+
+    if args.url:
+        queries = [f"ORF-R{i:06d}" for i in range(max(1, int(args.requests * args.distinct)))]
+        for concurrency in args.concurrency:
+            latencies, duration = load_test(args.url, queries, concurrency, args.requests)
+            report(f"{concurrency} clients", latencies, duration, requests.get(f"{args.url}/stats").json())
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        texts, skus = generate_corpus(tmp_dir, args.rows, args.dim, 40)
+        rng = np.random.default_rng(0)
+        pool = [skus[i] for i in rng.integers(0, args.rows, size=args.requests)]
+        pool += [' '.join(texts[i].split()[:3]) for i in rng.integers(0, args.rows, size=args.requests)]
+        del texts
+        print(f"Corpus: {args.rows} chunks x {args.dim} dims, {args.requests} requêtes par mesure")
+
+        mock = MockOpenAIServer(latency=0, embedding_latency=args.embedding_latency, jitter=0, dim=args.dim).start()
+        for max_batch in args.max_batch:
+            print(f"\n== max_batch={max_batch}")
+            for concurrency in args.concurrency:
+                # Nouveau serveur par mesure: caches vides
+                client = OpenAIClient('bench', base_url=mock.base_url, rate_limits=False)
+                server = SearchServer(tmp_dir, port=0, client=client, max_batch=max_batch).start()
+                rng.shuffle(pool)
+                distinct = pool[:max(1, int(args.requests * args.distinct))]
+                queries = [distinct[i] for i in rng.integers(0, len(distinct), size=args.requests)]
+                latencies, duration = load_test(server.url, queries, concurrency, args.requests)
+                report(f"{concurrency:>3} clients", latencies, duration, server.summary())
+                server.stop()
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
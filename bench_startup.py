@@ -0,0 +1,60 @@
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# Modules importés par chaque sous-commande de main.py avant de commencer le travail
+SUBCOMMANDS = {
+    '--help': [],
+    'crawl': ['crawler'],
+    'pdf': ['pdf_extractor'],
+    'embed': ['embedding_processor'],
+    'pipeline': ['crawler', 'pdf_extractor', 'embedding_processor'],
+}
+
+
+def measure(modules, repeat):
+    """Temps d'import (ms) de main puis des modules d'une étape, et plus gros imports"""
+    code = "import main\n" + "".join(f"import {module}\n" for module in modules)
+    best_wall, heaviest, error = float('inf'), [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            cwd=Path(__file__).parent, capture_output=True, text=True
+        )
+        best_wall = min(best_wall, time.perf_counter() - start)
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1]
+            break
+
+        # Lignes "import time: self | cumulative | package": les imports de premier niveau
+        # n'ont pas d'indentation dans la colonne package
+        top_level = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, package = line.split('|')
+            if not package.startswith('  '):
+                top_level.append((int(cumulative) / 1000, package.strip()))
+        heaviest = sorted(top_level, reverse=True)[:5]
+    return best_wall * 1000, heaviest, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure le temps d'import de chaque sous-commande de main.py")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for command, modules in SUBCOMMANDS.items():
+        wall_ms, heaviest, error = measure(modules, args.repeat)
+        if error:
+            print(f"{command:<10} indisponible ({error})")
+            continue
+        details = ', '.join(f"{name} {ms:.0f}ms" for ms, name in heaviest)
+        print(f"{command:<10} {wall_ms:7.0f} ms (démarrage interpréteur inclus) | {details}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+from vector_search import VectorIndex, normalize_rows
+
+
+def generate_corpus(output_dir, rows, dim, clusters=256, seed=0):
+    """Génère un corpus synthétique groupé (embeddings.npy + chunks.json)"""
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((clusters, dim)))
+    labels = rng.integers(0, clusters, size=rows)
+    vectors = centers[labels] + 0.3 * rng.standard_normal((rows, dim)).astype(np.float32) / np.sqrt(dim)
+    np.save(Path(output_dir) / "embeddings.npy", vectors.astype(np.float32))
+    with open(Path(output_dir) / "chunks.json", 'w', encoding='utf-8') as f:
+        json.dump({"metadata": [
+            {"filename": f"doc_{i // 10}.txt", "chunk_id": i % 10} for i in range(rows)
+        ]}, f)
+    queries = centers[rng.integers(0, clusters, size=200)]
+    return queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(dim)
+
+
+def link_inputs(source_dir, output_dir):
+    """Relie (ou copie) embeddings.npy et chunks.json dans output_dir.
+
+    Le benchmark écrit ses fichiers dérivés (embeddings_normalized.npy, ivf_index.npz) à côté
+    des entrées: ils restent ainsi dans le dossier temporaire, pas dans les sorties du pipeline.
+    """
+    for name in ['embeddings.npy', 'chunks.json']:
+        source = Path(source_dir).resolve() / name
+        if not source.exists():
+            continue
+        try:
+            os.symlink(source, Path(output_dir) / name)
+        except OSError:
+            shutil.copy2(source, Path(output_dir) / name)
+
+
+def timed(func, repeat=3):
+    """Retourne le meilleur temps d'exécution et le résultat"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def recall_at_k(exact_ids, approx_ids):
+    """Proportion des voisins exacts retrouvés par la recherche approximative"""
+    hits = sum(len(set(e) & set(a)) for e, a in zip(exact_ids, approx_ids))
+    return hits / exact_ids.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark latence/rappel de la recherche vectorielle')
+    parser.add_argument('--embeddings-dir', help='Dossier de sortie existant (sinon corpus synthétique)')
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=1536)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=32)
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.embeddings_dir:
+            link_inputs(args.embeddings_dir, tmp_dir)
+            queries = None
+        else:
+            queries = generate_corpus(tmp_dir, args.rows, args.dim)
+
+        load_time, index = timed(lambda: VectorIndex(tmp_dir), repeat=1)
+        if queries is None:
+            queries = np.asarray(index.vectors[:200])
+        print(f"Corpus: {len(index)} vecteurs x {index.vectors.shape[1]} dims (chargement {load_time:.2f}s)")
+
+        batch = queries[:args.batch]
+        single_time, _ = timed(lambda: [index.search_vectors(q, k=args.k) for q in batch[:8]])
+        print(f"Exact, requête unique : {single_time / 8 * 1000:.2f} ms/requête")
+        batch_time, (exact_ids, _) = timed(lambda: index.search_vectors(batch, k=args.k))
+        print(f"Exact, lot de {len(batch)}   : {batch_time / len(batch) * 1000:.2f} ms/requête")
+
+        build_time, _ = timed(lambda: index.build_ivf(), repeat=1)
+        print(f"IVF: {index.ivf.n_lists} listes (construction {build_time:.2f}s)")
+        for n_probe in args.n_probe:
+            approx_time, (approx_ids, _) = timed(
+                lambda: index.search_vectors(batch, k=args.k, approximate=True, n_probe=n_probe)
+            )
+            print(
+                f"IVF n_probe={n_probe:<3}: {approx_time / len(batch) * 1000:.2f} ms/requête, "
+                f"recall@{args.k}={recall_at_k(exact_ids, approx_ids):.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
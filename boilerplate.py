@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+# Conteneurs candidats au gabarit (bannières, menus, panneaux "contactez un représentant",
+# mentions légales...), comparés par leur texte normalisé. Les titres, paragraphes et tableaux
+# n'en font pas partie: un intertitre récurrent ("Caractéristiques", "Documentation") structure
+# le contenu de chaque page et doit rester dans le Markdown.
+BLOCK_TAGS = ['header', 'nav', 'footer', 'aside', 'div', 'section', 'ul', 'ol', 'form']
+HEADING_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+
+
+def normalize_text(element):
+    return ' '.join(element.get_text(' ').split()).lower()
+
+
+def block_text(element):
+    """Texte normalisé d'un conteneur, ou None s'il ne contient que des titres
+    (une simple enveloppe d'intertitre n'est pas du gabarit)"""
+    text = normalize_text(element)
+    headings = ' '.join(normalize_text(heading) for heading in element.find_all(HEADING_TAGS))
+    if text == ' '.join(headings.split()):
+        return None
+    return text
+
+
+def block_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def estimate_tokens(text_bytes):
+    """Approximation du nombre de tokens (≈ 4 octets par token)"""
+    return text_bytes // 4
+
+
+class BoilerplateDetector:
+    """Apprend les blocs répétés d'un site et les retire du contenu principal des pages.
+
+    Un bloc (texte normalisé d'un élément de bloc) présent dans au moins min_share des pages
+    observées fait partie du gabarit. Le retrait se fait de haut en bas: un bloc du gabarit
+    est supprimé avec tous ses descendants, les autres blocs sont explorés récursivement.
+    """
+
+    def __init__(self, min_share=0.5, sample_size=200, min_pages=5, min_chars=20):
+        self.min_share = min_share
+        self.sample_size = sample_size
+        self.min_pages = min_pages
+        self.min_chars = min_chars
+        self.logger = logging.getLogger(__name__)
+
+        self.pages_observed = 0
+        self.document_frequency = {}
+        self.templates = set()
+        # Gabarit d'un crawl précédent du site, appliqué tant que l'apprentissage n'est pas terminé
+        self.loaded = False
+
+        # Statistiques
+        self.pages_stripped = 0
+        self.bytes_removed = 0
+
+    @property
+    def learning(self):
+        return self.pages_observed < self.sample_size
+
+    def observe(self, root):
+        """Compte les blocs distincts d'une page de l'échantillon d'apprentissage"""
+        if root is None or not self.learning:
+            return
+        hashes = set()
+        for element in root.find_all(BLOCK_TAGS):
+            text = block_text(element)
+            if text and len(text) >= self.min_chars:
+                hashes.add(block_hash(text))
+        for value in hashes:
+            self.document_frequency[value] = self.document_frequency.get(value, 0) + 1
+        self.pages_observed += 1
+
+    def finalize(self):
+        """Fixe le gabarit à partir des fréquences observées"""
+        if self.pages_observed < self.min_pages:
+            self.logger.info(
+                f"Gabarit non appris: {self.pages_observed} pages observées (minimum {self.min_pages})"
+                + (f", gabarit précédent conservé ({len(self.templates)} blocs)" if self.loaded else "")
+            )
+            if not self.loaded:
+                self.templates = set()
+            return self.templates
+        threshold = max(2, self.min_share * self.pages_observed)
+        self.templates = {value for value, count in self.document_frequency.items() if count >= threshold}
+        self.document_frequency = {}
+        self.logger.info(
+            f"Gabarit appris sur {self.pages_observed} pages: {len(self.templates)} blocs répétés"
+        )
+        return self.templates
+
+    def strip(self, root):
+        """Retire les blocs du gabarit; retourne le nombre d'octets de texte supprimés"""
+        if not self.templates or root is None:
+            return 0
+        removed = self.strip_children(root)
+        self.pages_stripped += 1
+        self.bytes_removed += removed
+        return removed
+
+    def strip_children(self, element):
+        removed = 0
+        for child in list(element.children):
+            name = getattr(child, 'name', None)
+            if not name:
+                continue
+            if name in BLOCK_TAGS:
+                text = block_text(child)
+                if text and len(text) >= self.min_chars and block_hash(text) in self.templates:
+                    removed += len(text.encode('utf-8'))
+                    child.decompose()
+                    continue
+            removed += self.strip_children(child)
+        return removed
+
+    def summary(self):
+        return (
+            f"Gabarit: {len(self.templates)} blocs, {self.pages_stripped} pages nettoyées, "
+            f"{self.bytes_removed} octets (~{estimate_tokens(self.bytes_removed)} tokens) retirés"
+        )
+
+    @staticmethod
+    def read_sites(path):
+        """Gabarits enregistrés, par site (un fichier peut servir à plusieurs sites)"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        return data.get('sites', {}) if isinstance(data, dict) else {}
+
+    def load(self, path, site):
+        """Charge le gabarit appris lors d'un crawl précédent du site; retourne True s'il existe.
+
+        Il est appliqué dès les premières pages (crawl distribué, où le contenu est extrait
+        pendant l'apprentissage) et conservé si le nouvel échantillon est trop petit.
+        """
+        entry = self.read_sites(path).get(site)
+        if not entry or not entry.get('templates'):
+            return False
+        self.templates = set(entry['templates'])
+        self.loaded = True
+        self.logger.info(f"Gabarit précédent chargé pour {site}: {len(self.templates)} blocs")
+        return True
+
+    def save(self, path, site):
+        """Sauvegarde le gabarit du site (les gabarits des autres sites du fichier sont conservés)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sites = self.read_sites(path)
+        sites[site] = {
+            "pages_observed": self.pages_observed,
+            "min_share": self.min_share,
+            "templates": sorted(self.templates)
+        }
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"sites": sites}, f)
+        os.replace(tmp_path, path)
@@ -4,23 +4,31 @@ import os
 from urllib.parse import urljoin, urlparse
 import logging
 import time
-from collections import defaultdict, deque
+from collections import defaultdict
 import re
 from datetime import datetime
 import hashlib
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import html2text
+from tracing import tracer, traced
+from frontier import ChangeHistory, CrawlBudget, CrawlFrontier, UrlScorer
+from boilerplate import BoilerplateDetector, estimate_tokens
+from download_store import DownloadStore
 
 # Désactiver les avertissements SSL si nécessaire
 from urllib3.exceptions import InsecureRequestWarning
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
 class WebCrawler:
-    def __init__(self, start_url, max_depth=2):
+    def __init__(self, start_url, max_depth=2, on_file_saved=None, base_dir=None, frontier_options=None,
+                 boilerplate_options=None, download_options=None, priority_options=None,
+                 crawl_budget=None):
         self.start_url = start_url
         self.max_depth = max_depth
-        self.visited_pages = set()
+        # Callback appelé avec (type, chemin) pour chaque fichier écrit (mode flux)
+        self.on_file_saved = on_file_saved
+        self.frontier_options = frontier_options or {}
         self.downloaded_files = set()
         self.domain = urlparse(start_url).netloc
 
@@ -38,10 +46,39 @@ class WebCrawler:
         # Liste des segments d'URL à exclure
         self.excluded_paths = ['selecteur-de-produits']
 
-        # Création des dossiers nécessaires avec timestamp
-        self.base_dir = f"crawler_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # Création des dossiers nécessaires (avec timestamp si aucun dossier n'est imposé)
+        self.base_dir = base_dir or f"crawler_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         self.create_directories()
 
+        # Priorité des URLs (motifs, profondeur, densité de PDFs, historique des changements)
+        priority_options = dict(priority_options or {})
+        self.history = None
+        self.scorer = None
+        if priority_options.pop('enabled', False):
+            self.history = ChangeHistory(
+                priority_options.pop('history_path', None) or os.path.join(self.base_dir, 'logs', 'crawl_history.json')
+            )
+            self.scorer = UrlScorer(history=self.history, **priority_options)
+
+        # Budget du crawl (durée et/ou requêtes), compté sur les réponses HTTP
+        self.budget = self.create_budget(crawl_budget)
+
+        self.frontier = self.create_frontier()
+
+        # Gabarit du site (blocs répétés sur la plupart des pages), appris en phase 1 et repris
+        # du crawl précédent du même site s'il a été enregistré dans template_path
+        boilerplate_options = dict(boilerplate_options or {})
+        self.boilerplate = None
+        self.template_path = boilerplate_options.pop('template_path', None) or os.path.join(
+            self.base_dir, 'logs', 'boilerplate.json'
+        )
+        if boilerplate_options.pop('enabled', True):
+            self.boilerplate = BoilerplateDetector(**boilerplate_options)
+            self.boilerplate.load(self.template_path, self.domain)
+
+        # Fichiers téléchargés, stockés une seule fois par contenu
+        self.download_store = DownloadStore(self.base_dir, **(download_options or {}))
+
         # Configuration du logging
         self.setup_logging()
 
@@ -105,8 +142,37 @@ class WebCrawler:
         session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        session.hooks['response'].append(self.trace_response)
+        session.hooks['response'].append(self.budget.count_request)
         return session
 
+    def trace_response(self, response, *args, **kwargs):
+        """Hook requests: temps réseau et octets de chaque requête HTTP"""
+        if not tracer.enabled:
+            return
+        elapsed = response.elapsed.total_seconds()
+        tracer.add_span(
+            f"http.{response.request.method.lower()}", time.perf_counter() - elapsed, elapsed,
+            url=response.url, status=response.status_code
+        )
+        tracer.count('http.requests')
+        tracer.count('http.bytes', int(response.headers.get('Content-Length') or 0))
+
+    def create_frontier(self):
+        """Frontière compacte: empreintes des URLs vues, file BFS ou par priorité débordant sur
+        disque, journaux des URLs découvertes (rapport) et de l'ordre de visite (phase 2)"""
+        return CrawlFrontier(
+            spill_dir=os.path.join(self.base_dir, 'logs', 'frontier'),
+            urls_log=os.path.join(self.base_dir, 'logs', 'discovered_urls.txt'),
+            order_log=os.path.join(self.base_dir, 'logs', 'crawl_order.txt'),
+            scorer=self.scorer,
+            **self.frontier_options
+        )
+
+    def create_budget(self, crawl_budget):
+        """Budget du crawl (illimité sans options)"""
+        return CrawlBudget(**(crawl_budget or {}))
+
     def create_directories(self):
         """Crée la structure de dossiers nécessaire pour le crawler"""
         directories = ['content', 'PDF', 'Image', 'Doc', 'logs']
@@ -147,6 +213,15 @@ class WebCrawler:
         pattern = re.compile(r'\.(' + '|'.join([ext.strip('.') for exts in self.downloadable_extensions.values() for ext in exts]) + r')(\.[a-z0-9]+)?$', re.IGNORECASE)
         return bool(pattern.search(path))
 
+    def guess_file_type(self, url):
+        """Type de fichier d'après l'extension de l'URL (le type définitif vient des en-têtes du GET)"""
+        path = urlparse(url).path.lower()
+        for file_type, extensions in self.downloadable_extensions.items():
+            for ext in extensions:
+                if re.search(re.escape(ext) + r'(\.[a-z0-9]+)?$', path):
+                    return file_type
+        return None
+
     def get_file_type_and_extension(self, url, response):
         """Détermine le type de fichier et l'extension"""
         parsed_url = urlparse(url)
@@ -165,9 +240,9 @@ class WebCrawler:
 
         return None, None
 
-    def sanitize_filename(self, url, file_type, extension, page_number=None):
-        """Crée un nom de fichier sécurisé"""
-        url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+    def sanitize_filename(self, url, file_type, extension, page_number=None, content_hash=None):
+        """Crée un nom de fichier sécurisé (suffixé par l'empreinte du contenu si elle est connue)"""
+        url_hash = content_hash[:16] if content_hash else hashlib.md5(url.encode()).hexdigest()[:8]
         filename = url.split('/')[-1]
         if not filename:
             filename = 'index'
@@ -186,41 +261,58 @@ class WebCrawler:
         logging.debug(f"Nom de fichier sanitizé: {sanitized}")
         return sanitized
 
+    @traced('crawl.download')
     def download_file(self, url, file_type):
-        """Télécharge un fichier"""
+        """Télécharge un fichier dans le store adressé par contenu"""
         try:
             logging.info(f"Attempting to download {file_type} file from: {url}")
-            
-            response = self.session.head(url, allow_redirects=True, timeout=10)
-            file_type_detected, extension = self.get_file_type_and_extension(url, response)
-            if not file_type_detected:
-                logging.warning(f"Could not determine the file type for: {url}")
-                return False
-
-            filename = self.sanitize_filename(url, file_type_detected, extension)
-            save_path = os.path.join(self.base_dir, file_type_detected, filename)
 
-            if os.path.exists(save_path):
-                logging.info(f"Fichier déjà téléchargé, skipping: {filename}")
+            known_path = self.download_store.lookup(url)
+            if known_path:
+                logging.info(f"Fichier déjà téléchargé, skipping: {known_path.name}")
                 return False
 
-            response = self.session.get(url, stream=True, timeout=20)
+            # Le type est déduit des en-têtes du GET lui-même (pas de HEAD préalable)
+            with self.session.get(url, stream=True, timeout=20) as response:
+                if response.status_code != 200:
+                    logging.warning(f"Failed to download {file_type} from {url}: Status code {response.status_code}")
+                    return False
 
-            if response.status_code == 200:
-                with open(save_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
+                file_type_detected, extension = self.get_file_type_and_extension(url, response)
+                if not file_type_detected:
+                    logging.warning(f"Could not determine the file type for: {url}")
+                    return False
+
+                save_path, status = self.download_store.save(
+                    url, response, file_type_detected,
+                    lambda content_hash: self.sanitize_filename(url, file_type_detected, extension, content_hash=content_hash)
+                )
 
-                self.stats[f'{file_type_detected}_downloaded'] += 1
+            if status == 'too_large':
+                tracer.count('crawl.download_too_large')
                 self.downloaded_files.add(url)
-                logging.info(f"Successfully downloaded {file_type_detected}: {filename}")
-                return True
+                logging.warning(f"Fichier au-delà de la taille maximale ({file_type_detected}), ignoré: {url}")
+                return False
+
+            # Le nom du fichier porte l'empreinte de son contenu
+            self.record_change(url, save_path.name)
 
-            else:
-                logging.warning(f"Failed to download {file_type} from {url}: Status code {response.status_code}")
+            if status == 'duplicate':
+                # Même contenu servi par une autre URL: ni réécrit, ni retraité en aval
+                tracer.count('crawl.download_duplicates')
+                self.stats[f'{file_type_detected}_duplicates'] += 1
+                self.downloaded_files.add(url)
+                logging.info(f"Contenu identique à {save_path.name}, doublon ignoré: {url}")
                 return False
 
+            tracer.count(f'crawl.bytes_{file_type_detected}', os.path.getsize(save_path))
+            self.stats[f'{file_type_detected}_downloaded'] += 1
+            self.downloaded_files.add(url)
+            logging.info(f"Successfully downloaded {file_type_detected}: {save_path.name}")
+            if self.on_file_saved:
+                self.on_file_saved(file_type_detected, str(save_path))
+            return True
+
         except Exception as e:
             logging.error(f"Error downloading {url}: {str(e)}")
             return False
@@ -248,8 +340,35 @@ class WebCrawler:
 
         return text.strip()
 
-    def extract_content(self, url):
-        """Extrait le contenu d'une page"""
+    def remove_noise(self, soup):
+        """Supprime navigation, en-têtes, scripts et autres éléments hors contenu"""
+        for element in soup.find_all(['nav', 'header', 'footer', 'script', 'style', 'aside', 'iframe']):
+            element.decompose()
+
+    def find_main_content(self, soup):
+        """Élément portant le contenu principal de la page"""
+        return (
+            soup.find('main') or 
+            soup.find('article') or 
+            soup.find('div', class_='content') or
+            soup.find('div', id='content')
+        )
+
+    def record_change(self, url, fingerprint):
+        """Met à jour l'historique des changements (priorité des prochains crawls)"""
+        if self.history is not None and self.history.observe(url, fingerprint):
+            self.stats['content_changed'] += 1
+
+    def record_boilerplate(self, url, removed_bytes):
+        """Journalise les octets et tokens estimés retirés d'une page par le gabarit"""
+        tracer.count('crawl.boilerplate_bytes', removed_bytes)
+        report_path = os.path.join(self.base_dir, 'logs', 'boilerplate_removed.tsv')
+        with open(report_path, 'a', encoding='utf-8') as f:
+            f.write(f"{url}\t{removed_bytes}\t{estimate_tokens(removed_bytes)}\n")
+
+    @traced('crawl.page')
+    def extract_content(self, url, response=None):
+        """Extrait le contenu d'une page (response: réponse déjà obtenue en phase 1, sinon la page est téléchargée)"""
         logging.info(f"Extracting content from: {url}")
 
         try:
@@ -257,23 +376,20 @@ class WebCrawler:
                 logging.info(f"Skipping content extraction for downloadable file: {url}")
                 return
 
-            response = self.session.get(url, timeout=20)
+            if response is None:
+                response = self.session.get(url, timeout=20)
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-
-                for element in soup.find_all(['nav', 'header', 'footer', 'script', 'style', 'aside', 'iframe']):
-                    element.decompose()
+                with tracer.span('crawl.parse', url=url):
+                    soup = BeautifulSoup(response.text, 'html.parser')
 
-                main_content = (
-                    soup.find('main') or 
-                    soup.find('article') or 
-                    soup.find('div', class_='content') or
-                    soup.find('div', id='content')
-                )
+                self.remove_noise(soup)
+                main_content = self.find_main_content(soup)
 
                 if main_content:
+                    boilerplate_bytes = self.boilerplate.strip(main_content) if self.boilerplate else 0
                     main_content = self.convert_links_to_absolute(main_content, url)
-                    markdown_content = self.html_converter.handle(str(main_content))
+                    with tracer.span('crawl.markdown', url=url):
+                        markdown_content = self.html_converter.handle(str(main_content))
                     content_parts = []
 
                     title = soup.find('h1')
@@ -291,7 +407,13 @@ class WebCrawler:
                             f.write(content)
 
                         self.stats['pages_processed'] += 1
+                        tracer.count('crawl.content_bytes', len(content.encode('utf-8')))
+                        self.record_change(url, hashlib.sha256(content.encode('utf-8')).hexdigest())
+                        if boilerplate_bytes:
+                            self.record_boilerplate(url, boilerplate_bytes)
                         logging.info(f"Successfully saved content to: {filename}")
+                        if self.on_file_saved:
+                            self.on_file_saved('content', save_path)
                     else:
                         logging.warning(f"No significant content found for: {url}")
 
@@ -300,15 +422,7 @@ class WebCrawler:
                         if href:
                             file_url = urljoin(url, href)
                             if self.is_downloadable_file(file_url) and file_url not in self.downloaded_files:
-                                try:
-                                    response_head = self.session.head(file_url, allow_redirects=True, timeout=10)
-                                    file_type_detected, _ = self.get_file_type_and_extension(file_url, response_head)
-                                except:
-                                    response_head = self.session.get(file_url, allow_redirects=True, timeout=10)
-                                    file_type_detected, _ = self.get_file_type_and_extension(file_url, response_head)
-
-                                if file_type_detected:
-                                    self.download_file(file_url, file_type_detected)
+                                self.download_file(file_url, self.guess_file_type(file_url))
 
                 else:
                     logging.warning(f"No main content found for: {url}")
@@ -318,84 +432,88 @@ class WebCrawler:
 
     def extract_urls(self, start_url):
         """Extrait récursivement les URLs"""
-        queue = deque()
-        queue.append((start_url, 0))
-        self.visited_pages.add(start_url)
-
-        while queue:
-            current_url, depth = queue.popleft()
-
-            if depth > self.max_depth:
-                continue
+        self.frontier.add(start_url, 0)
 
-            if self.should_exclude(current_url):
-                logging.info(f"Excluded URL: {current_url}")
-                continue
+        while self.frontier:
+            if self.budget.exhausted(self.budget.exploration_share):
+                logging.warning(
+                    f"Budget d'exploration épuisé ({self.budget.summary()}), "
+                    f"{len(self.frontier)} URLs en file non explorées"
+                )
+                self.stats['budget_exhausted'] = 1
+                break
+            current_url, depth = self.frontier.pop()
+            self.visit_url(current_url, depth)
 
-            logging.info(f"Extracting URLs from: {current_url} (depth: {depth})")
+    def visit_url(self, current_url, depth):
+        """Phase 1 pour une URL: téléchargement si c'est un fichier, sinon mise en file de ses liens.
 
-            try:
-                if self.is_downloadable_file(current_url):
-                    try:
-                        response_head = self.session.head(current_url, allow_redirects=True, timeout=10)
-                        file_type_detected, _ = self.get_file_type_and_extension(current_url, response_head)
-                    except:
-                        response_head = self.session.get(current_url, allow_redirects=True, timeout=10)
-                        file_type_detected, _ = self.get_file_type_and_extension(current_url, response_head)
+        Retourne la réponse HTTP d'une page (None pour un fichier ou une URL ignorée).
+        """
+        if depth > self.max_depth:
+            return None
 
-                    if file_type_detected:
-                        filename = self.sanitize_filename(current_url, file_type_detected, self.content_type_mapping[file_type_detected].get(response_head.headers.get('Content-Type', '').lower(), ''))
-                        save_path = os.path.join(self.base_dir, file_type_detected, filename)
+        if self.should_exclude(current_url):
+            logging.info(f"Excluded URL: {current_url}")
+            return None
 
-                        if os.path.exists(save_path):
-                            logging.info(f"Fichier déjà téléchargé, skipping: {filename}")
-                            continue
+        logging.info(f"Extracting URLs from: {current_url} (depth: {depth})")
 
-                        self.download_file(current_url, file_type_detected)
-                        self.downloaded_files.add(current_url)
-                    continue
+        response = None
+        try:
+            if self.is_downloadable_file(current_url):
+                # URLs déjà connues: ignorées par le store sans requête réseau
+                self.download_file(current_url, self.guess_file_type(current_url))
+                self.downloaded_files.add(current_url)
+                return None
 
-                response = self.session.get(current_url, timeout=20)
-                if response.status_code == 200:
+            response = self.session.get(current_url, timeout=20)
+            if response.status_code == 200:
+                with tracer.span('crawl.parse', url=current_url):
                     soup = BeautifulSoup(response.text, 'html.parser')
+                tracer.count('crawl.pages_discovered')
 
-                    for tag in soup.find_all(['a', 'link', 'embed', 'iframe', 'object'], href=True):
-                        href = tag.get('href') or tag.get('src')
-                        if href:
-                            absolute_url = urljoin(current_url, href)
-                            parsed_url = urlparse(absolute_url)
-
-                            if self.is_downloadable_file(absolute_url):
-                                try:
-                                    response_head = self.session.head(absolute_url, allow_redirects=True, timeout=10)
-                                    file_type_detected, _ = self.get_file_type_and_extension(absolute_url, response_head)
-                                except:
-                                    response_head = self.session.get(absolute_url, allow_redirects=True, timeout=10)
-                                    file_type_detected, _ = self.get_file_type_and_extension(absolute_url, response_head)
-
-                                if file_type_detected:
-                                    filename = self.sanitize_filename(absolute_url, file_type_detected, self.content_type_mapping[file_type_detected].get(response_head.headers.get('Content-Type', '').lower(), ''))
-                                    save_path = os.path.join(self.base_dir, file_type_detected, filename)
+                pages, files = [], []
+                for tag in soup.find_all(['a', 'link', 'embed', 'iframe', 'object'], href=True):
+                    href = tag.get('href') or tag.get('src')
+                    if href:
+                        absolute_url = urljoin(current_url, href)
+                        parsed_url = urlparse(absolute_url)
 
-                                    if os.path.exists(save_path):
-                                        logging.info(f"Fichier déjà téléchargé, skipping: {filename}")
-                                        continue
-
-                                    self.download_file(absolute_url, file_type_detected)
-                                    self.downloaded_files.add(absolute_url)
-                                continue
+                        if self.is_downloadable_file(absolute_url):
+                            files.append(absolute_url)
+                            continue
 
-                            if (self.domain in parsed_url.netloc and 
-                                self.is_same_language(absolute_url) and
-                                absolute_url not in self.visited_pages and
-                                not absolute_url.endswith(('#', 'javascript:void(0)', 'javascript:;')) and
-                                not self.should_exclude(absolute_url)):
+                        if (self.domain in parsed_url.netloc and 
+                            self.is_same_language(absolute_url) and
+                            not absolute_url.endswith(('#', 'javascript:void(0)', 'javascript:;')) and
+                            not self.should_exclude(absolute_url)):
+                            pages.append(absolute_url)
+
+                # Mise en file seulement si l'URL n'a jamais été vue ou, en ordre de priorité, si
+                # elle est retrouvée moins profonde (max_depth reste mesuré au plus court depuis la
+                # racine). Les fichiers gardent la profondeur de la page (téléchargés même depuis
+                # max_depth) et sont téléchargés à leur tour de priorité; la densité de PDFs de la
+                # page favorise ses liens.
+                pdf_density = sum(self.guess_file_type(url) == 'PDF' for url in files) / max(1, len(files) + len(pages))
+                for file_url in files:
+                    if file_url not in self.downloaded_files:
+                        self.enqueue(file_url, depth, pdf_density)
+                for page_url in pages:
+                    self.enqueue(page_url, depth + 1, pdf_density)
+
+                # Échantillon d'apprentissage du gabarit (après l'extraction des liens)
+                if self.boilerplate and self.boilerplate.learning:
+                    self.remove_noise(soup)
+                    self.boilerplate.observe(self.find_main_content(soup))
 
-                                queue.append((absolute_url, depth + 1))
-                                self.visited_pages.add(absolute_url)
+        except Exception as e:
+            logging.error(f"Error crawling {current_url}: {str(e)}")
+        return response
 
-            except Exception as e:
-                logging.error(f"Error crawling {current_url}: {str(e)}")
+    def enqueue(self, url, depth, pdf_density=0.0):
+        """Ajoute une URL découverte à la frontière"""
+        self.frontier.add(url, depth, pdf_density)
 
     def crawl(self):
         """Méthode principale de crawling"""
@@ -405,16 +523,33 @@ class WebCrawler:
         logging.info(f"Maximum depth: {self.max_depth}")
 
         self.load_downloaded_files()
+        self.download_store.load()
+        self.budget.start()
 
         try:
             logging.info("Phase 1: Starting URL extraction")
-            self.extract_urls(self.start_url)
+            with tracer.span('crawl.phase1', url=self.start_url):
+                self.extract_urls(self.start_url)
+
+            logging.info(self.frontier.summary())
+
+            if self.boilerplate:
+                self.boilerplate.finalize()
+                self.boilerplate.save(self.template_path, self.domain)
+                removed_report = os.path.join(self.base_dir, 'logs', 'boilerplate_removed.tsv')
+                if os.path.exists(removed_report):
+                    os.remove(removed_report)
 
             logging.info("Phase 2: Starting content extraction")
-            for i, url in enumerate(self.visited_pages, 1):
+            # Ordre de visite de la phase 1: les pages prioritaires sont rafraîchies d'abord
+            for i, url in enumerate(self.frontier.visit_order(), 1):
                 if self.is_downloadable_file(url):
                     continue
-                logging.info(f"Processing URL {i}/{len(self.visited_pages)}: {url}")
+                if self.budget.exhausted():
+                    logging.warning(f"Budget épuisé ({self.budget.summary()}), extraction arrêtée")
+                    self.stats['budget_exhausted'] = 1
+                    break
+                logging.info(f"Processing URL {i}/{self.frontier.seen_count}: {url}")
                 self.extract_content(url)
 
             logging.info("Phase 2: Completed content extraction")
@@ -428,6 +563,9 @@ class WebCrawler:
 
         finally:
             self.save_downloaded_files()
+            if self.history is not None:
+                self.history.save()
+            self.frontier.close()
 
     def load_downloaded_files(self):
         """Charge les URLs des fichiers déjà téléchargés"""
@@ -469,12 +607,17 @@ Duration: {duration:.2f} seconds
 
 Statistics
 ---------
-Total URLs found: {len(self.visited_pages)}
+Total URLs found: {self.frontier.seen_count}
 Pages processed: {self.stats['pages_processed']}
 Files downloaded:
 - PDFs: {self.stats['PDF_downloaded']}
 - Images: {self.stats['Image_downloaded']}
 - Documents: {self.stats['Doc_downloaded']}
+{self.frontier.summary()}
+{self.boilerplate.summary() if self.boilerplate else 'Gabarit: désactivé'}
+{self.download_store.summary()}
+{self.budget.summary()}{' (épuisé, crawl arrêté)' if self.stats['budget_exhausted'] else ''}
+{f"Historique: {self.stats['content_changed']} contenus nouveaux ou modifiés" if self.history is not None else 'Priorité: désactivée (BFS)'}
 """)
 
         if error:
@@ -488,28 +631,29 @@ Critical Error: {error}
 Processed URLs
 -------------
 """)
-        for url in sorted(self.visited_pages):
-            report_sections.append(url)
 
-        report_sections.append("""
+        files_sections = ["""
 Generated Files
 --------------
-""")
+"""]
 
         for directory in ['content', 'PDF', 'Image', 'Doc']:
             dir_path = os.path.join(self.base_dir, directory)
             if os.path.exists(dir_path):
                 files = os.listdir(dir_path)
-                report_sections.append(f"\n{directory} Files ({len(files)}):")
+                files_sections.append(f"\n{directory} Files ({len(files)}):")
                 for file in sorted(files):
-                    report_sections.append(f"- {file}")
+                    files_sections.append(f"- {file}")
 
-        report_content = '\n'.join(report_sections)
         report_path = os.path.join(self.base_dir, 'crawler_report.txt')
 
         try:
             with open(report_path, 'w', encoding='utf-8') as f:
-                f.write(report_content)
+                f.write('\n'.join(report_sections) + '\n')
+                # URLs dans l'ordre de découverte (BFS), relues en flux depuis le journal
+                for url in self.frontier.discovered():
+                    f.write(url + '\n')
+                f.write('\n'.join(files_sections))
             logging.info(f"Report generated successfully: {report_path}")
         except Exception as e:
             logging.error(f"Error generating report: {str(e)}")
@@ -518,7 +662,7 @@ Generated Files
 Crawling Summary
 ---------------
 Start URL: {self.start_url}
-Total URLs: {len(self.visited_pages)}
+Total URLs: {self.frontier.seen_count}
 Pages Processed: {self.stats['pages_processed']}
 Total Files Downloaded: {sum(self.stats[k] for k in ['PDF_downloaded', 'Image_downloaded', 'Doc_downloaded'])}
 Duration: {duration:.2f} seconds
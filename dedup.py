@@ -0,0 +1,280 @@
+import json
+import logging
+import math
+import os
+import time
+from pathlib import Path
+import numpy as np
+from lexical_index import export_lexical_index
+from quantization import export_int8
+from vector_search import normalize_rows
+
+# Store complet (avant élagage), conservé pour le mode mise à jour de l'EmbeddingProcessor
+FULL_FILES = {"chunks.json": "chunks_full.json", "embeddings.npy": "embeddings_full.npy"}
+
+
+def row_norms(vectors, block_size=65536):
+    """Normes L2 des lignes, calculées par blocs (matrice éventuellement mappée)"""
+    norms = np.empty(vectors.shape[0], dtype=np.float32)
+    for start in range(0, vectors.shape[0], block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        norms[start:start + block_size] = np.linalg.norm(block, axis=1)
+    norms[norms == 0] = 1.0
+    return norms
+
+
+def pair_similarities(vectors, norms, rows, cols, block_size=65536):
+    """Cosinus des paires (rows[i], cols[i]), par blocs de paires"""
+    sims = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        a = rows[start:start + block_size]
+        b = cols[start:start + block_size]
+        dots = np.einsum('ij,ij->i', np.asarray(vectors[a], dtype=np.float32), np.asarray(vectors[b], dtype=np.float32))
+        sims[start:start + block_size] = dots / (norms[a] * norms[b])
+    return sims
+
+
+def blocked_pairs(vectors, threshold, block_size=4096):
+    """Paires (i < j) de cosinus ≥ threshold, par produits de blocs du triangle supérieur (O(n²))"""
+    rows, cols = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    n = vectors.shape[0]
+    for start in range(0, n, block_size):
+        block = normalize_rows(vectors[start:start + block_size])
+        for other in range(start, n, block_size):
+            other_block = block if other == start else normalize_rows(vectors[other:other + block_size])
+            scores = block @ other_block.T
+            if other == start:
+                scores = np.triu(scores, k=1)
+            i, j = np.nonzero(scores >= threshold)
+            rows.append(i + start)
+            cols.append(j + other)
+    return np.concatenate(rows).astype(np.int64), np.concatenate(cols).astype(np.int64)
+
+
+def lsh_pairs(vectors, threshold, bits=None, tables=8, window=32, block_size=65536, seed=0):
+    """Paires candidates par LSH (hyperplans aléatoires), vérifiées par le cosinus exact.
+
+    Pour chaque table, les lignes sont triées par signature de bits bits (par défaut
+    log2(n) - 1, soit ~2 lignes par seau, pour que les vérifications restent linéaires en n); chaque ligne est
+    comparée à ses window voisines de même signature. Dans un seau plus grand que window, les
+    doublons restent reliés de proche en proche (les composantes sont calculées ensuite).
+    """
+    n, dim = vectors.shape
+    bits = bits or int(min(63, max(8, math.log2(max(n, 2)) - 1)))
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((dim, bits * tables)).astype(np.float32)
+    weights = (1 << np.arange(bits, dtype=np.uint64)).astype(np.uint64)
+
+    signatures = np.empty((n, tables), dtype=np.uint64)
+    for start in range(0, n, block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        signs = (block @ planes > 0).reshape(len(block), tables, bits)
+        signatures[start:start + block_size] = (signs.astype(np.uint64) * weights).sum(axis=2, dtype=np.uint64)
+
+    norms = row_norms(vectors, block_size)
+    rows, cols = [], []
+    for table in range(tables):
+        keys = signatures[:, table]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        for offset in range(1, min(window, n - 1) + 1):
+            same = np.nonzero(sorted_keys[:-offset] == sorted_keys[offset:])[0]
+            if not len(same):
+                break
+            a, b = order[same], order[same + offset]
+            sims = pair_similarities(vectors, norms, a, b, block_size)
+            keep = sims >= threshold
+            rows.append(np.minimum(a[keep], b[keep]))
+            cols.append(np.maximum(a[keep], b[keep]))
+
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.unique(np.stack([np.concatenate(rows), np.concatenate(cols)], axis=1), axis=0)
+    return pairs[:, 0].astype(np.int64), pairs[:, 1].astype(np.int64)
+
+
+def connected_components(n, rows, cols):
+    """Union-find vectorisé: label de chaque ligne = plus petit indice de sa composante.
+
+    À chaque tour, la racine de chaque extrémité d'une paire est accrochée à la plus petite des
+    deux racines, puis les chemins sont compressés (saut de pointeurs) jusqu'aux racines.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    while len(rows):
+        root_rows, root_cols = parent[rows], parent[cols]
+        low = np.minimum(root_rows, root_cols)
+        np.minimum.at(parent, root_rows, low)
+        np.minimum.at(parent, root_cols, low)
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+        # Seules les paires encore à cheval sur deux composantes repassent au tour suivant
+        pending = parent[rows] != parent[cols]
+        rows, cols = rows[pending], cols[pending]
+    return parent
+
+
+class Deduplicator:
+    """Élagage des chunks quasi identiques d'une sortie de l'EmbeddingProcessor.
+
+    Les paires de vecteurs de cosinus ≥ threshold (produits par blocs, ou LSH au-delà de
+    lsh_min_rows lignes) sont regroupées en composantes; chaque composante est remplacée par le
+    chunk le plus proche de son centroïde, dont les métadonnées listent les chunks retirés
+    (`duplicates`: fichier, chunk_id, similarité).
+    """
+
+    def __init__(self, threshold=0.98, method='auto', lsh_min_rows=50000, bits=None, tables=8,
+                 window=32, block_size=4096, seed=0):
+        self.threshold = threshold
+        self.method = method
+        self.lsh_min_rows = lsh_min_rows
+        self.bits = bits
+        self.tables = tables
+        self.window = window
+        self.block_size = block_size
+        self.seed = seed
+        self.logger = logging.getLogger(__name__)
+
+    def resolve_method(self, rows):
+        if self.method == 'auto':
+            return 'lsh' if rows >= self.lsh_min_rows else 'blocked'
+        return self.method
+
+    def find_pairs(self, vectors):
+        """Paires (i, j) de vecteurs quasi identiques et méthode utilisée"""
+        method = self.resolve_method(vectors.shape[0])
+        if method == 'lsh':
+            rows, cols = lsh_pairs(
+                vectors, self.threshold, bits=self.bits, tables=self.tables,
+                window=self.window, seed=self.seed
+            )
+        else:
+            rows, cols = blocked_pairs(vectors, self.threshold, block_size=self.block_size)
+        return rows, cols, method
+
+    def cluster(self, vectors):
+        """Label de composante de chaque ligne et représentant de chaque ligne"""
+        rows, cols, method = self.find_pairs(vectors)
+        labels = connected_components(vectors.shape[0], rows, cols)
+        representatives = np.arange(vectors.shape[0], dtype=np.int64)
+
+        members = np.nonzero(np.bincount(labels, minlength=len(labels))[labels] > 1)[0]
+        if len(members):
+            # Représentant: membre de plus grand cosinus avec le centroïde de sa composante
+            member_labels = labels[members]
+            unit = normalize_rows(vectors[members])
+            clusters, inverse = np.unique(member_labels, return_inverse=True)
+            centroids = np.zeros((len(clusters), vectors.shape[1]), dtype=np.float32)
+            np.add.at(centroids, inverse, unit)
+            scores = np.einsum('ij,ij->i', unit, normalize_rows(centroids)[inverse])
+            order = np.lexsort((-scores, inverse))
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = inverse[order][1:] != inverse[order][:-1]
+            best = members[order[first]]
+            representatives[members] = best[inverse]
+        return labels, representatives, {"method": method, "pairs": int(len(rows))}
+
+    def deduplicate(self, embeddings_dir):
+        """Élague chunks.json et embeddings.npy; le store complet est gardé dans les fichiers *_full"""
+        start_time = time.perf_counter()
+        embeddings_dir = Path(embeddings_dir)
+        full_paths = {name: embeddings_dir / full for name, full in FULL_FILES.items()}
+
+        # Entrée: le store complet (un dossier déjà élagué garde le sien dans les fichiers *_full)
+        if all(path.exists() for path in full_paths.values()):
+            chunks_path, embeddings_path = full_paths['chunks.json'], full_paths['embeddings.npy']
+        else:
+            chunks_path, embeddings_path = embeddings_dir / 'chunks.json', embeddings_dir / 'embeddings.npy'
+        if not chunks_path.exists() or not embeddings_path.exists():
+            self.logger.info(f"Aucune sortie d'embeddings à dédoublonner dans {embeddings_dir}")
+            return None
+
+        with open(chunks_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f).get('metadata', [])
+        vectors = np.load(embeddings_path, mmap_mode='r')
+        if len(metadata) != vectors.shape[0]:
+            self.logger.warning("Store incohérent (métadonnées/embeddings), dédoublonnage ignoré")
+            return None
+
+        labels, representatives, details = self.cluster(vectors)
+        keep = np.nonzero(representatives == np.arange(len(representatives)))[0]
+
+        # Références arrière: chaque représentant liste les chunks qu'il remplace
+        removed = np.nonzero(representatives != np.arange(len(representatives)))[0]
+        similarities = pair_similarities(vectors, row_norms(vectors), removed, representatives[removed])
+        duplicates = {}
+        for row, similarity in zip(removed.tolist(), similarities.tolist()):
+            duplicates.setdefault(int(representatives[row]), []).append({
+                "filename": metadata[row].get('filename'),
+                "chunk_id": metadata[row].get('chunk_id'),
+                "similarity": round(similarity, 4)
+            })
+        pruned_metadata = []
+        for row in keep.tolist():
+            item = dict(metadata[row])
+            item.pop('duplicates', None)
+            if row in duplicates:
+                item['duplicates'] = duplicates[row]
+            pruned_metadata.append(item)
+
+        # Le store complet est déplacé (pas copié: la sortie peut être un lien vers un artefact)
+        if chunks_path != full_paths['chunks.json']:
+            for name, full_path in full_paths.items():
+                os.replace(embeddings_dir / name, full_path)
+
+        tmp_path = embeddings_dir / 'chunks.json.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"metadata": pruned_metadata}, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, embeddings_dir / 'chunks.json')
+
+        tmp_path = embeddings_dir / 'embeddings.tmp.npy'
+        pruned = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(len(keep), vectors.shape[1]))
+        for start in range(0, len(keep), self.block_size):
+            pruned[start:start + self.block_size] = vectors[keep[start:start + self.block_size]]
+        pruned.flush()
+        del pruned
+        os.replace(tmp_path, embeddings_dir / 'embeddings.npy')
+
+        # Sorties dérivées réécrites sur les lignes conservées
+        if (embeddings_dir / 'lexical_index.json').exists():
+            export_lexical_index([item['text'] for item in pruned_metadata], embeddings_dir)
+        if (embeddings_dir / 'embeddings_int8.npy').exists():
+            export_int8(np.load(embeddings_dir / 'embeddings.npy', mmap_mode='r'), embeddings_dir)
+
+        report = {
+            **details,
+            "threshold": self.threshold,
+            "rows_before": int(vectors.shape[0]),
+            "rows_after": int(len(keep)),
+            "clusters": len(duplicates),
+            "removed": int(len(removed)),
+            "bytes_before": int(vectors.shape[0] * vectors.shape[1] * 4),
+            "bytes_after": int(len(keep) * vectors.shape[1] * 4),
+            "seconds": round(time.perf_counter() - start_time, 3)
+        }
+        with open(embeddings_dir / 'dedup_report.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        self.logger.info(
+            f"Dédoublonnage ({report['method']}, cosinus ≥ {self.threshold}): "
+            f"{report['rows_before']} -> {report['rows_after']} chunks "
+            f"(-{report['removed'] / max(1, report['rows_before']):.1%}, {report['clusters']} groupes) "
+            f"en {report['seconds']:.1f}s"
+        )
+        return report
+
+
+def main():
+    # Configuration
+    embeddings_directory = "output"
+
+    try:
+        Deduplicator().deduplicate(embeddings_directory)
+
+    except Exception as e:
+        logging.error(f"Erreur principale: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+import zlib
+from datetime import datetime
+from urllib.parse import urlparse
+from crawler import WebCrawler
+from frontier import CrawlBudget, ChangeHistory
+
+# États d'une URL dans la frontière partagée
+PENDING, IN_PROGRESS, DONE, FAILED = 0, 1, 2, 3
+
+
+def shard_for(url, shards):
+    """Shard d'une URL: hôte + premier segment de chemin (arborescence de langue, ex. /fr-ca/)"""
+    parsed = urlparse(url)
+    segments = [segment for segment in parsed.path.split('/') if segment]
+    key = f"{parsed.netloc}/{segments[0] if segments else ''}"
+    return zlib.crc32(key.encode('utf-8')) % max(1, shards)
+
+
+class SharedFrontier:
+    """Frontière et registre des téléchargements partagés entre processus via SQLite (WAL).
+
+    Chaque URL n'est insérée qu'une fois (clé primaire); un worker réclame un lot d'URLs de
+    son shard par score décroissant puis profondeur croissante (BFS quand tous les scores sont
+    nuls), et un fichier n'est téléchargé que par le premier worker qui l'enregistre dans la
+    table downloads. Une réservation est un
+    bail daté (colonne claimed): passé lease_seconds sans renouvellement, l'URL d'un worker
+    mort est remise en attente et reprise par un autre.
+    """
+
+    def __init__(self, db_path, lease_seconds=600):
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                root INTEGER NOT NULL,
+                depth INTEGER NOT NULL,
+                shard INTEGER NOT NULL,
+                state INTEGER NOT NULL DEFAULT 0,
+                worker INTEGER,
+                claimed REAL,
+                score REAL NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS downloads (
+                url TEXT PRIMARY KEY,
+                worker INTEGER NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS workers (
+                worker INTEGER PRIMARY KEY,
+                stats TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                url TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL
+            );
+        """)
+        # Base créée avant l'ajout des baux de réservation et des scores
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(urls)")]
+        if 'claimed' not in columns:
+            self.conn.execute("ALTER TABLE urls ADD COLUMN claimed REAL")
+        if 'score' not in columns:
+            self.conn.execute("ALTER TABLE urls ADD COLUMN score REAL NOT NULL DEFAULT 0")
+        self.conn.execute("DROP INDEX IF EXISTS urls_pending")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS urls_claim ON urls (state, shard, score DESC, depth)")
+
+    def add(self, url, root, depth, shard, score=0.0, requeue=False):
+        """Insère une URL jamais vue, ou abaisse la profondeur d'une URL retrouvée moins profonde.
+
+        Avec requeue, une URL déjà explorée à une profondeur supérieure est remise en attente
+        pour explorer ses liens jusqu'à max_depth (comme le DepthMap de la frontière locale).
+        Retourne True si l'URL est nouvelle ou a été mise à jour.
+        """
+        cursor = self.conn.execute(
+            "INSERT INTO urls (url, root, depth, shard, score) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET depth = excluded.depth, score = excluded.score, "
+            "state = CASE WHEN ? AND state = ? THEN ? ELSE state END "
+            "WHERE excluded.depth < urls.depth",
+            (url, root, depth, shard, score, requeue, DONE, PENDING)
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, worker, shards, limit=10, steal=True):
+        """Réserve un lot d'URLs en attente (shard du worker d'abord, sinon celui d'un autre)"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Baux expirés: le worker qui les détenait est mort ou bloqué
+            expired = self.conn.execute(
+                "UPDATE urls SET state = ?, worker = NULL, claimed = NULL WHERE state = ? AND claimed < ?",
+                (PENDING, IN_PROGRESS, now - self.lease_seconds)
+            ).rowcount
+            if expired:
+                logging.warning(f"{expired} URLs réservées par un worker inactif remises en attente")
+            rows = self.conn.execute(
+                "SELECT url, root, depth FROM urls WHERE state = ? AND shard = ? "
+                "ORDER BY score DESC, depth, rowid LIMIT ?",
+                (PENDING, worker % shards, limit)
+            ).fetchall()
+            if not rows and steal:
+                rows = self.conn.execute(
+                    "SELECT url, root, depth FROM urls WHERE state = ? "
+                    "ORDER BY score DESC, depth, rowid LIMIT ?",
+                    (PENDING, limit)
+                ).fetchall()
+            self.conn.executemany(
+                "UPDATE urls SET state = ?, worker = ?, claimed = ? WHERE url = ?",
+                [(IN_PROGRESS, worker, now, url) for url, _, _ in rows]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return rows
+
+    def finish(self, url, state=DONE):
+        self.conn.execute("UPDATE urls SET state = ?, claimed = NULL WHERE url = ?", (state, url))
+
+    def renew(self, urls, worker):
+        """Prolonge le bail des URLs encore réservées par ce worker"""
+        self.conn.executemany(
+            "UPDATE urls SET claimed = ? WHERE url = ? AND state = ? AND worker = ?",
+            [(time.time(), url, IN_PROGRESS, worker) for url in urls]
+        )
+
+    def release(self, urls, worker):
+        """Rend aux autres workers les URLs réservées et non traitées par ce worker"""
+        self.conn.executemany(
+            "UPDATE urls SET state = ?, worker = NULL, claimed = NULL WHERE url = ? AND state = ? AND worker = ?",
+            [(PENDING, url, IN_PROGRESS, worker) for url in urls]
+        )
+
+    def active(self):
+        """Nombre d'URLs en attente ou en cours de traitement"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM urls WHERE state IN (?, ?)", (PENDING, IN_PROGRESS)
+        ).fetchone()[0]
+
+    def requeue_in_progress(self):
+        """Remet en attente les URLs réservées par des workers interrompus"""
+        self.conn.execute(
+            "UPDATE urls SET state = ?, worker = NULL, claimed = NULL WHERE state = ?", (PENDING, IN_PROGRESS)
+        )
+
+    def claim_download(self, url, worker):
+        """Enregistre le téléchargement; False si un autre worker l'a déjà pris en charge"""
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO downloads (url, worker, created) VALUES (?, ?, ?)",
+            (url, worker, time.time())
+        )
+        return cursor.rowcount == 1
+
+    def release_download(self, url):
+        self.conn.execute("DELETE FROM downloads WHERE url = ?", (url,))
+
+    def record_fingerprint(self, url, fingerprint):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO fingerprints (url, fingerprint) VALUES (?, ?)", (url, fingerprint)
+        )
+
+    def fingerprints(self):
+        """Empreintes de contenu relevées par les workers"""
+        return self.conn.execute("SELECT url, fingerprint FROM fingerprints").fetchall()
+
+    def clear_fingerprints(self):
+        self.conn.execute("DELETE FROM fingerprints")
+
+    def record_stats(self, worker, stats):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO workers (worker, stats) VALUES (?, ?)", (worker, json.dumps(stats))
+        )
+
+    def summary(self):
+        """Totaux par état, par shard et par worker"""
+        states = dict(self.conn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state").fetchall())
+        shards = dict(self.conn.execute("SELECT shard, COUNT(*) FROM urls GROUP BY shard").fetchall())
+        downloads = self.conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+        workers = {
+            worker: json.loads(stats)
+            for worker, stats in self.conn.execute("SELECT worker, stats FROM workers").fetchall()
+        }
+        return {"states": states, "shards": shards, "downloads": downloads, "workers": workers}
+
+    def discovered(self):
+        """URLs découvertes, dans l'ordre d'insertion"""
+        for (url,) in self.conn.execute("SELECT url FROM urls ORDER BY rowid"):
+            yield url
+
+    def close(self):
+        self.conn.close()
+
+
+class SharedCrawler(WebCrawler):
+    """WebCrawler dont la frontière et le registre des fichiers sont partagés entre processus.
+
+    Une page est téléchargée une seule fois: visit_url en extrait les liens et extract_content
+    réutilise la même réponse. Le gabarit est appris sur les sample_size premières pages
+    visitées par le worker pour cette racine, puis retiré des pages suivantes. Avec
+    priority_options, chaque URL découverte est insérée avec son score; l'historique des
+    changements est lu par chaque worker et ses nouvelles empreintes passent par la base,
+    le processus parent étant seul à réécrire le fichier.
+    """
+
+    def __init__(self, start_url, root, worker, shards, store, budget=None, **kwargs):
+        self.root = root
+        self.worker = worker
+        self.shards = shards
+        self.store = store
+        self.shared_budget = budget
+        super().__init__(start_url, **kwargs)
+        self.template_fixed = False
+
+    def create_frontier(self):
+        # La frontière locale est remplacée par la table urls de la base partagée
+        return None
+
+    def create_budget(self, crawl_budget):
+        # Un budget par worker, partagé par les crawlers de ses différentes racines
+        return self.shared_budget or super().create_budget(crawl_budget)
+
+    def process(self, url, depth):
+        """Explore une URL réservée puis extrait son contenu depuis la même réponse"""
+        response = self.visit_url(url, depth)
+        if self.boilerplate and not self.template_fixed and not self.boilerplate.learning:
+            self.boilerplate.finalize()
+            self.template_fixed = True
+        if response is not None:
+            self.extract_content(url, response=response)
+
+    def enqueue(self, url, depth, pdf_density=0.0):
+        if depth <= self.max_depth:
+            score = self.scorer.score(url, depth, pdf_density) if self.scorer else 0.0
+            self.store.add(
+                url, self.root, depth, shard_for(url, self.shards), score=score,
+                requeue=depth < self.max_depth
+            )
+
+    def record_change(self, url, fingerprint):
+        """Change détecté contre l'historique chargé; l'empreinte est enregistrée dans la base"""
+        super().record_change(url, fingerprint)
+        if self.history is not None:
+            self.store.record_fingerprint(url, fingerprint)
+
+    def download_file(self, url, file_type):
+        """Un fichier partagé par plusieurs arborescences n'est téléchargé qu'une fois"""
+        if not self.store.claim_download(url, self.worker):
+            logging.info(f"Fichier déjà pris en charge par un autre worker: {url}")
+            self.downloaded_files.add(url)
+            return False
+        downloaded = super().download_file(url, file_type)
+        if not downloaded and url not in self.downloaded_files:
+            self.store.release_download(url)
+        return downloaded
+
+
+def run_worker(worker, shards, db_path, start_urls, base_dir, max_depth, batch_size, poll_interval,
+               crawler_options=None, budget_options=None, lease_seconds=600):
+    """Boucle d'un processus worker: réserve des URLs, les explore et extrait leur contenu.
+
+    budget_options est le budget de ce worker (part du budget global du crawl). Quelle que soit
+    la sortie de la boucle (budget, erreur), les URLs réservées et non traitées sont rendues;
+    si le processus meurt sans passer par là, leur bail expire après lease_seconds.
+    """
+    store = SharedFrontier(db_path, lease_seconds=lease_seconds)
+    crawlers = {}
+    processed = 0
+    budget = CrawlBudget(**(budget_options or {}))
+    claimed = []
+    try:
+        while True:
+            if budget.exhausted():
+                logging.warning(f"Worker {worker}: budget épuisé ({budget.summary()})")
+                break
+            batch = store.claim(worker, shards, limit=batch_size)
+            if not batch:
+                # Plus rien en attente ni en cours ailleurs: le crawl est terminé
+                if store.active() == 0:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            claimed = [url for url, _, _ in batch]
+            for url, root, depth in batch:
+                if budget.exhausted():
+                    break
+                store.renew(claimed, worker)
+                try:
+                    crawler = crawlers.get(root)
+                    if crawler is None:
+                        crawler = SharedCrawler(
+                            start_urls[root], root, worker, shards, store, budget=budget,
+                            max_depth=max_depth, base_dir=base_dir, **(crawler_options or {})
+                        )
+                        crawler.download_store.load()
+                        crawlers[root] = crawler
+                    crawler.process(url, depth)
+                    store.finish(url, DONE)
+                except Exception as e:
+                    logging.error(f"Erreur worker {worker} sur {url}: {str(e)}")
+                    store.finish(url, FAILED)
+                claimed.remove(url)
+                processed += 1
+
+        stats = {"processed": processed, "requests": budget.requests}
+        for crawler in crawlers.values():
+            for key, value in crawler.stats.items():
+                stats[key] = stats.get(key, 0) + value
+        store.record_stats(worker, stats)
+    finally:
+        # URLs réservées non traitées (budget épuisé, erreur inattendue): rendues aux autres workers
+        if claimed:
+            store.release(claimed, worker)
+        store.close()
+
+
+class DistributedCrawler:
+    """Crawl coordonné de plusieurs URLs de départ par un pool de processus.
+
+    Toutes les arborescences (ex. /fr-ca/, /en-ca/, /en-us/, autres domaines) partagent une
+    seule frontière SQLite: une page atteinte depuis deux racines n'est explorée qu'une fois
+    et un PDF commun n'est téléchargé qu'une fois. Les URLs sont réparties par hôte et
+    premier segment de chemin; un worker sans travail dans son shard aide les autres.
+
+    download_options, boilerplate_options et priority_options sont transmis aux crawlers des
+    workers: avec la priorité activée, la frontière partagée sert les URLs par score décroissant
+    au lieu du BFS. Le budget (crawl_budget) est réparti entre workers: chacun dispose de la
+    durée entière et d'une part égale des requêtes. frontier_options ne s'applique pas (la
+    frontière est la base SQLite) et est signalé s'il est fourni. Les URLs d'un worker mort sont
+    reprises par les autres à l'expiration de leur bail (lease_seconds).
+    """
+
+    def __init__(self, start_urls, max_depth=2, base_dir=None, workers=None, batch_size=10,
+                 poll_interval=0.5, download_options=None, boilerplate_options=None,
+                 crawl_budget=None, frontier_options=None, priority_options=None, lease_seconds=600):
+        self.start_urls = list(start_urls)
+        self.max_depth = max_depth
+        self.base_dir = base_dir or f"crawler_output_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.crawler_options = {
+            'download_options': download_options,
+            'boilerplate_options': boilerplate_options,
+            'priority_options': priority_options
+        }
+        self.crawl_budget = crawl_budget or {}
+        self.lease_seconds = lease_seconds
+        self.db_path = os.path.join(self.base_dir, 'logs', 'frontier.sqlite')
+        self.logger = logging.getLogger(__name__)
+
+        # Historique des changements, réécrit par le parent à partir des empreintes des workers
+        self.history_path = None
+        if (priority_options or {}).get('enabled'):
+            self.history_path = priority_options.get('history_path') or os.path.join(
+                self.base_dir, 'logs', 'crawl_history.json'
+            )
+
+        if frontier_options:
+            self.logger.warning(
+                "frontier_options ignorées par le crawl distribué: la frontière est la base SQLite partagée"
+            )
+
+        for directory in ['content', 'PDF', 'Image', 'Doc', 'logs']:
+            os.makedirs(os.path.join(self.base_dir, directory), exist_ok=True)
+
+    def worker_budget(self):
+        """Budget d'un worker: durée entière, part égale des requêtes"""
+        max_requests = self.crawl_budget.get('max_requests')
+        return {
+            'max_seconds': self.crawl_budget.get('max_seconds'),
+            'max_requests': -(-max_requests // self.workers) if max_requests else None
+        }
+
+    def crawl(self):
+        """Amorce la frontière avec les URLs de départ puis lance les workers"""
+        start_time = time.time()
+        store = SharedFrontier(self.db_path)
+        store.requeue_in_progress()
+        for root, url in enumerate(self.start_urls):
+            store.add(url, root, 0, shard_for(url, self.workers))
+        store.close()
+
+        self.logger.info(
+            f"Crawl distribué de {len(self.start_urls)} racines avec {self.workers} workers "
+            f"({'ordre de priorité' if self.history_path else 'BFS'})"
+        )
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(
+                target=run_worker,
+                args=(worker, self.workers, self.db_path, self.start_urls, self.base_dir,
+                      self.max_depth, self.batch_size, self.poll_interval, self.crawler_options,
+                      self.worker_budget(), self.lease_seconds),
+                name=f"crawler-{worker}"
+            )
+            for worker in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            if process.exitcode:
+                self.logger.error(
+                    f"Worker {process.name} arrêté avec le code {process.exitcode}: "
+                    f"ses URLs réservées ont été reprises par les autres workers"
+                )
+
+        if self.history_path:
+            self.save_history()
+        self.generate_report(time.time() - start_time)
+        return self.base_dir
+
+    def save_history(self):
+        """Fusionne les empreintes relevées par les workers dans l'historique des changements"""
+        history = ChangeHistory(self.history_path)
+        store = SharedFrontier(self.db_path)
+        try:
+            for url, fingerprint in store.fingerprints():
+                history.observe(url, fingerprint)
+            history.save()
+            # Empreintes fusionnées: une reprise du crawl ne les compte pas deux fois
+            store.clear_fingerprints()
+        finally:
+            store.close()
+
+    def generate_report(self, duration):
+        """Écrit summary.txt et la liste des URLs découvertes"""
+        store = SharedFrontier(self.db_path)
+        try:
+            summary = store.summary()
+            totals = {}
+            for stats in summary['workers'].values():
+                for key, value in stats.items():
+                    totals[key] = totals.get(key, 0) + value
+
+            with open(os.path.join(self.base_dir, 'logs', 'discovered_urls.txt'), 'w', encoding='utf-8') as f:
+                for url in store.discovered():
+                    f.write(url + '\n')
+
+            report = f"""
+Distributed Crawling Summary
+----------------------------
+Start URLs: {', '.join(self.start_urls)}
+Workers: {self.workers}
+Total URLs: {sum(summary['states'].values())}
+Done: {summary['states'].get(DONE, 0)} | Failed: {summary['states'].get(FAILED, 0)}
+Pages Processed: {totals.get('pages_processed', 0)}
+HTTP Requests: {totals.get('requests', 0)}
+Files Downloaded: {summary['downloads']} (PDF {totals.get('PDF_downloaded', 0)}, Image {totals.get('Image_downloaded', 0)}, Doc {totals.get('Doc_downloaded', 0)})
+URLs per shard: {dict(sorted(summary['shards'].items()))}
+URLs per worker: {{{', '.join(f"{w}: {s.get('processed', 0)}" for w, s in sorted(summary['workers'].items()))}}}
+Duration: {duration:.2f} seconds
+"""
+            with open(os.path.join(self.base_dir, 'summary.txt'), 'w', encoding='utf-8') as f:
+                f.write(report)
+            self.logger.info(report)
+        except Exception as e:
+            self.logger.error(f"Erreur lors de la génération du rapport: {str(e)}")
+        finally:
+            store.close()
+
+
+def main():
+    start_urls = [
+        "https://www.ouellet.com/fr-ca/",
+        "https://www.ouellet.com/en-ca/",
+        "https://www.ouellet.com/en-us/"
+    ]
+    crawler = DistributedCrawler(start_urls, max_depth=2)
+    crawler.crawl()
+
+
+if __name__ == "__main__":
+    main()
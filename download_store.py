@@ -0,0 +1,135 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+
+FILE_TYPES = ['PDF', 'Image', 'Doc']
+
+# Fichiers du store: <nom>_<16 premiers caractères du SHA-256><extension>
+CONTENT_NAME = re.compile(r"_([0-9a-f]{16})\.[A-Za-z0-9]+$")
+
+
+class DownloadStore:
+    """Store des fichiers téléchargés, adressé par contenu.
+
+    Le corps de la réponse est haché pendant son écriture dans un fichier temporaire
+    (logs/partial/), puis déplacé atomiquement dans le dossier de son type sous un nom portant
+    son empreinte. Un contenu déjà stocké n'est pas réécrit: l'URL est seulement associée au
+    fichier existant dans logs/content_map.tsv (URL, SHA-256, taille, chemin), journal en ajout
+    seul partagé par les workers du crawl distribué.
+    """
+
+    def __init__(self, base_dir, buffer_size=1024 * 1024, max_size_mb=None):
+        self.base_dir = Path(base_dir)
+        self.buffer_size = buffer_size
+        self.max_size_mb = max_size_mb or {}
+        self.map_path = self.base_dir / 'logs' / 'content_map.tsv'
+        self.partial_dir = self.base_dir / 'logs' / 'partial'
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+
+        self.urls = {}
+        self.contents = {}
+        self.stats = {"stored": 0, "duplicates": 0, "duplicate_bytes": 0, "too_large": 0}
+
+    def load(self):
+        """Relit le journal URL -> contenu et indexe les fichiers déjà présents dans le store"""
+        for file_type in FILE_TYPES:
+            type_dir = self.base_dir / file_type
+            if not type_dir.is_dir():
+                continue
+            for entry in os.scandir(type_dir):
+                match = CONTENT_NAME.search(entry.name)
+                if match:
+                    self.contents.setdefault(match.group(1), Path(entry.path))
+
+        if self.map_path.exists():
+            with open(self.map_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) == 4:
+                        url, digest, _, path = fields
+                        self.urls[url] = self.base_dir / path
+        self.logger.info(f"Store de téléchargements: {len(self.contents)} fichiers, {len(self.urls)} URLs connues")
+
+    def lookup(self, url):
+        """Fichier déjà associé à une URL (None si l'URL n'a jamais été téléchargée)"""
+        path = self.urls.get(url)
+        return path if path and path.exists() else None
+
+    def max_bytes(self, file_type):
+        limit = self.max_size_mb.get(file_type)
+        return int(limit * 1024 * 1024) if limit else None
+
+    def find(self, digest, file_type):
+        """Fichier du store ayant cette empreinte, y compris écrit par un autre processus"""
+        key = digest[:16]
+        path = self.contents.get(key)
+        if path and path.exists():
+            return path
+        for path in (self.base_dir / file_type).glob(f"*_{key}.*"):
+            self.contents[key] = path
+            return path
+        return None
+
+    def save(self, url, response, file_type, filename):
+        """Écrit le corps d'une réponse en flux; retourne (chemin, statut).
+
+        Le statut vaut 'stored' pour un nouveau contenu, 'duplicate' si le même contenu est
+        déjà stocké (chemin existant) et 'too_large' si la taille dépasse la limite du type
+        (chemin None). filename(digest) donne le nom du fichier pour un nouveau contenu.
+        """
+        limit = self.max_bytes(file_type)
+        declared = int(response.headers.get('Content-Length') or 0)
+        if limit and declared > limit:
+            self.stats['too_large'] += 1
+            return None, 'too_large'
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.partial_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb', buffering=self.buffer_size) as f:
+                for chunk in response.iter_content(chunk_size=self.buffer_size):
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if limit and size > limit:
+                        self.stats['too_large'] += 1
+                        return None, 'too_large'
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            content_hash = digest.hexdigest()
+            existing = self.find(content_hash, file_type)
+            if existing:
+                self.stats['duplicates'] += 1
+                self.stats['duplicate_bytes'] += size
+                self.record(url, content_hash, size, existing)
+                return existing, 'duplicate'
+
+            save_path = self.base_dir / file_type / filename(content_hash)
+            os.replace(tmp_path, save_path)
+            self.contents[content_hash[:16]] = save_path
+            self.stats['stored'] += 1
+            self.record(url, content_hash, size, save_path)
+            return save_path, 'stored'
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def record(self, url, digest, size, path):
+        """Ajoute l'association URL -> contenu au journal"""
+        self.urls[url] = Path(path)
+        relative = Path(path).relative_to(self.base_dir).as_posix()
+        with open(self.map_path, 'a', encoding='utf-8') as f:
+            f.write(f"{url}\t{digest}\t{size}\t{relative}\n")
+
+    def summary(self):
+        return (
+            f"Téléchargements: {self.stats['stored']} fichiers stockés, {self.stats['duplicates']} doublons "
+            f"({self.stats['duplicate_bytes'] / 1024 / 1024:.1f} Mo non réécrits), "
+            f"{self.stats['too_large']} fichiers au-delà de la taille maximale"
+        )
@@ -0,0 +1,125 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import numpy as np
+
+
+class EmbeddingCache:
+    """Cache persistant (SQLite) des contextes et embeddings déjà calculés.
+
+    Les embeddings sont indexés par l'empreinte (modèle + texte complet): un même texte n'est
+    vectorisé qu'une seule fois. Les contextes sont indexés par l'empreinte du chunk brut et le
+    nom du document dont ils ont été rédigés; un chunk présent dans plusieurs documents (table
+    chunk_documents) reçoit un seul contexte indépendant du document (document None), partagé
+    par toutes ses occurrences. Sans chemin, le cache reste en mémoire et sert uniquement à la
+    déduplication au sein d'un run.
+    """
+
+    def __init__(self, path=None, commit_every=100):
+        self.path = str(path) if path else ":memory:"
+        self.commit_every = commit_every
+        self.pending_writes = 0
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS contexts (key TEXT PRIMARY KEY, context TEXT NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_documents "
+            "(chunk_hash TEXT NOT NULL, document TEXT NOT NULL, PRIMARY KEY (chunk_hash, document))"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def embedding_key(text, model):
+        """Clé d'un embedding: dépend du modèle et du texte exact"""
+        return hashlib.sha256(f"{model}\n{text}".encode('utf-8')).hexdigest()
+
+    def get_embedding(self, text, model):
+        """Retourne l'embedding en cache ou None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT vector FROM embeddings WHERE key = ?", (self.embedding_key(text, model),)
+            ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def put_embedding(self, text, model, embedding):
+        """Enregistre un embedding"""
+        vector = np.asarray(embedding, dtype=np.float32).tobytes()
+        self.write(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            (self.embedding_key(text, model), vector)
+        )
+
+    @staticmethod
+    def context_key(chunk_hash, document=None):
+        """Clé d'un contexte: dépend du chunk brut et du document (None: contexte partagé)"""
+        return hashlib.sha256(f"{document or ''}\n{chunk_hash}".encode('utf-8')).hexdigest()
+
+    def get_context(self, chunk_hash, document=None):
+        """Retourne le contexte en cache d'un chunk brut de ce document (None: partagé) ou None"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT context FROM contexts WHERE key = ?", (self.context_key(chunk_hash, document),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put_context(self, chunk_hash, document, context):
+        """Enregistre le contexte d'un chunk brut de ce document (None: partagé)"""
+        self.write(
+            "INSERT OR REPLACE INTO contexts (key, context) VALUES (?, ?)",
+            (self.context_key(chunk_hash, document), context)
+        )
+
+    def add_documents(self, chunk_hashes, document):
+        """Note que ces chunks bruts apparaissent dans ce document"""
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO chunk_documents (chunk_hash, document) VALUES (?, ?)",
+                [(chunk_hash, document) for chunk_hash in set(chunk_hashes)]
+            )
+            self.pending_writes += 1
+            if self.pending_writes >= self.commit_every:
+                self.connection.commit()
+                self.pending_writes = 0
+
+    def is_shared(self, chunk_hash):
+        """Vrai si le chunk brut apparaît dans au moins deux documents"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT 1 FROM chunk_documents WHERE chunk_hash = ? LIMIT 2", (chunk_hash,)
+            ).fetchall()
+        return len(rows) > 1
+
+    def write(self, query, params):
+        """Écriture avec commit groupé"""
+        with self.lock:
+            self.connection.execute(query, params)
+            self.pending_writes += 1
+            if self.pending_writes >= self.commit_every:
+                self.connection.commit()
+                self.pending_writes = 0
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def flush(self):
+        """Valide les écritures en attente"""
+        with self.lock:
+            self.connection.commit()
+            self.pending_writes = 0
+
+    def close(self):
+        """Valide les écritures en attente et ferme la base"""
+        with self.lock:
+            self.connection.commit()
+            self.connection.close()
@@ -1,28 +1,72 @@
 import os
 import json
 import numpy as np
-import requests
 from pathlib import Path
 import logging
 import time
+import hashlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from quantization import export_int8, INT8_FILES
+from lexical_index import export_lexical_index, LEXICAL_FILES
+from embedding_cache import EmbeddingCache
+from dedup import FULL_FILES
+from openai_client import get_client
+from tracing import tracer, traced
 
 class EmbeddingProcessor:
-    def __init__(self, input_dir, output_dir, openai_api_key):
+    def __init__(self, input_dir, output_dir, openai_api_key, options=None, client=None,
+                 base_url=None):
         # Configuration des chemins
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
+        # Options (section "embedding_options" du fichier de configuration)
+        self.options = options or {}
+
         # Initialisation des listes globales pour tous les fichiers
         self.all_embeddings = []
         self.all_metadata = []
+        self.results_lock = threading.Lock()
+
+        # Store existant réutilisé en mode mise à jour (incrémental)
+        self.update_mode = False
+        self.previous_embeddings = None
+        self.previous_metadata = []
+        self.previous_files = {}
+        self.previous_chunks = {}
+
+        # Checkpoints: unités (fichier, chunk) terminées, écrites périodiquement sur disque
+        self.checkpoint_path = self.output_dir / "checkpoint.jsonl"
+        self.checkpoint_every = self.options.get('checkpoint_every', 50)
+        self.checkpoint_buffer = []
+        self.checkpointed = {}
+
+        # Pool des unités en cours (max_in_flight > 1), partagé par tous les fichiers
+        self.executor = None
+        self.slots = None
+
+        # File des chunks en échec, retentés en fin de traitement
+        self.failed_chunks = []
+        self.file_order = {}
+
+        # Statistiques
+        self.stats = defaultdict(int)
 
-        # Configuration OpenAI
+        # Cache des contextes/embeddings (persistant si cache_path est défini)
+        self.embedding_model = self.options.get('model', 'text-embedding-ada-002')
+        self.cache = EmbeddingCache(self.options.get('cache_path'))
+
+        # Verrous des chunks partagés entre documents: une seule contextualisation par chunk,
+        # même quand plusieurs occurrences sont calculées en parallèle
+        self.shared_locks = {}
+
+        # Configuration OpenAI (client HTTP partagé entre les étapes; base_url permet de viser
+        # un serveur compatible, par exemple mock_openai_server.py)
         self.openai_api_key = openai_api_key
-        self.headers = {
-            "Authorization": f"Bearer {openai_api_key}",
-            "Content-Type": "application/json"
-        }
+        self.client = client or get_client(openai_api_key, base_url=base_url)
 
         # Configuration logging
         logging.basicConfig(
@@ -44,19 +88,36 @@ class EmbeddingProcessor:
             chunks.append(chunk)
         return chunks
 
+    @traced('embedding.contextualize')
     def get_contextualized_chunk(self, chunk, full_text):
-        """Demande à GPT-4o-mini de contextualiser chaque chunk."""
+        """Demande à GPT-4o-mini de contextualiser chaque chunk.
+
+        Sans full_text, le chunk est répété dans plusieurs documents: son contexte est rédigé
+        à partir du chunk seul et partagé par toutes ses occurrences.
+        """
+        if full_text is None:
+            return self.request_context(
+                "You are an expert analyst. The following section appears verbatim in several documents "
+                "of the same website (for example a warranty, a safety notice or a contact block). "
+                "Your task is to provide context to this section that holds for every document repeating it.",
+                f"Chunk: {chunk}\n\nPlease provide context for this chunk."
+            )
+        return self.request_context(
+            "You are an expert analyst. The following is an excerpt from a larger document. "
+            "Your task is to provide context to the following section by referencing the content of the entire document. "
+            "Ensure that the context helps understand the chunk more thoroughly.",
+            f"Document: {full_text}\n\nChunk: {chunk}\n\nPlease provide context for this chunk."
+        )
+
+    def request_context(self, system_content, user_content):
+        """Appel de contextualisation à GPT-4o-mini"""
         system_prompt = {
             "role": "system",
-            "content": (
-                "You are an expert analyst. The following is an excerpt from a larger document. "
-                "Your task is to provide context to the following section by referencing the content of the entire document. "
-                "Ensure that the context helps understand the chunk more thoroughly."
-            )
+            "content": system_content
         }
         user_prompt = {
             "role": "user",
-            "content": f"Document: {full_text}\n\nChunk: {chunk}\n\nPlease provide context for this chunk."
+            "content": user_content
         }
         try:
             payload = {
@@ -69,102 +130,502 @@ class EmbeddingProcessor:
                 "presence_penalty": 0
             }
 
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            context = response.json()['choices'][0]['message']['content']
+            response = self.client.chat_completion(payload, timeout=30, priority='contextualization')
+            context = response['choices'][0]['message']['content']
             return context
         except Exception as e:
             self.logger.error(f"Erreur lors de la contextualisation du chunk: {str(e)}")
             return None
 
+    @traced('embedding.embed')
     def get_embedding(self, text):
         """Obtenir l'embedding pour un texte."""
         try:
             payload = {
                 "input": text,
-                "model": "text-embedding-ada-002",
+                "model": self.embedding_model,
                 "encoding_format": "float"
             }
 
-            response = requests.post(
-                'https://api.openai.com/v1/embeddings',
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-            embedding = response.json()['data'][0]['embedding']
+            response = self.client.embeddings(payload, timeout=30)
+            embedding = response['data'][0]['embedding']
             return embedding
         except Exception as e:
             self.logger.error(f"Erreur lors de la récupération de l'embedding: {str(e)}")
             return None
 
+    @staticmethod
+    def hash_text(text):
+        """Empreinte SHA-256 d'un texte"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def load_previous_store(self):
+        """Charge les sorties existantes pour réutiliser les chunks inchangés"""
+        chunks_json_path = self.output_dir / "chunks.json"
+        embeddings_npy_path = self.output_dir / "embeddings.npy"
+        # Store élagué par dedup.py: les chunks retirés sont dans le store complet
+        if all((self.output_dir / name).exists() for name in FULL_FILES.values()):
+            chunks_json_path = self.output_dir / FULL_FILES["chunks.json"]
+            embeddings_npy_path = self.output_dir / FULL_FILES["embeddings.npy"]
+        if not chunks_json_path.exists() or not embeddings_npy_path.exists():
+            self.logger.info("Aucun store existant, traitement complet")
+            return
+
+        with open(chunks_json_path, 'r', encoding='utf-8') as json_file:
+            metadata = json.load(json_file).get('metadata', [])
+        embeddings = np.load(embeddings_npy_path, mmap_mode='r')
+        if len(metadata) != embeddings.shape[0]:
+            self.logger.warning("Store existant incohérent (métadonnées/embeddings), ignoré")
+            return
+
+        self.previous_embeddings = embeddings
+        self.previous_metadata = metadata
+        for row, item in enumerate(metadata):
+            # Les anciens stores n'ont pas d'empreintes: on les recalcule depuis le texte brut
+            chunk_hash = item.get('chunk_hash') or self.hash_text(item['text_raw'])
+            self.previous_chunks.setdefault((item['filename'], chunk_hash), row)
+            if item.get('file_hash'):
+                entry = self.previous_files.setdefault(
+                    item['filename'], {"file_hash": item['file_hash'], "rows": []}
+                )
+                entry['rows'].append(row)
+
+        self.logger.info(
+            f"Store existant chargé: {len(metadata)} chunks, {len(self.previous_files)} fichiers"
+        )
+
+    def reuse_row(self, row, **overrides):
+        """Reprend un chunk du store existant sans appel à l'API"""
+        metadata = dict(self.previous_metadata[row])
+        metadata.update(overrides)
+        metadata.setdefault('chunk_hash', self.hash_text(metadata['text_raw']))
+        self.add_result(np.array(self.previous_embeddings[row], dtype=np.float32), metadata, 'chunks_reused')
+
+    def add_result(self, embedding, metadata, stat):
+        """Ajoute un chunk aux résultats (embeddings et métadonnées restent alignés entre threads)"""
+        with self.results_lock:
+            self.all_embeddings.append(embedding)
+            self.all_metadata.append(metadata)
+            self.stats[stat] += 1
+        tracer.count(f'embedding.{stat}')
+
+    @traced('embedding.file')
     def process_file(self, txt_file_path):
         """Processus pour un fichier texte."""
+        full_text, units = self.plan_file(txt_file_path)
+
+        # Traitement de chaque chunk
+        for unit in units:
+            self.run_unit(unit, full_text)
+
+        self.flush_checkpoint()
+
+    def plan_file(self, txt_file_path):
+        """Découpe un fichier et retourne les chunks à calculer (les chunks repris sont ajoutés directement)"""
         self.logger.info(f"Traitement du fichier: {txt_file_path}")
 
         # Lecture du fichier texte
         with open(txt_file_path, 'r', encoding='utf-8') as file:
             full_text = file.read()
+        file_hash = self.hash_text(full_text)
+        tracer.count('embedding.bytes_in', len(full_text.encode('utf-8')))
+
+        # Fichier inchangé depuis le dernier run: tous ses chunks sont repris tels quels
+        previous_file = self.previous_files.get(txt_file_path.name)
+        if self.update_mode and previous_file and previous_file['file_hash'] == file_hash:
+            for row in previous_file['rows']:
+                self.reuse_row(row)
+            self.count('files_unchanged')
+            self.logger.info(f"Fichier inchangé, {len(previous_file['rows'])} chunks réutilisés")
+            return full_text, []
 
-        # Découpe du texte en chunks
+        # Découpe du texte en chunks (chunk_id = position dans le fichier, quel que soit l'ordre de calcul)
         chunks = self.chunk_text(full_text)
+        chunk_hashes = [self.hash_text(text_raw) for text_raw in chunks]
+        self.cache.add_documents(chunk_hashes, txt_file_path.name)
+        units = []
+        for i, (text_raw, chunk_hash) in enumerate(zip(chunks, chunk_hashes)):
 
-        # Traitement de chaque chunk
-        for i, text_raw in enumerate(chunks):
-            # Contextualiser chaque chunk
+            # Chunk déjà terminé avant l'interruption du run précédent
+            checkpointed = self.checkpointed.get((txt_file_path.name, i))
+            if checkpointed and checkpointed[0]['chunk_hash'] == chunk_hash:
+                self.add_result(checkpointed[1], checkpointed[0], 'chunks_resumed')
+                continue
+
+            # Chunk déjà présent dans le store pour ce document: seul l'emplacement change
+            # (son contexte a été rédigé pour ce document, pas pour un autre qui le répète)
+            if self.update_mode and (txt_file_path.name, chunk_hash) in self.previous_chunks:
+                self.reuse_row(
+                    self.previous_chunks[(txt_file_path.name, chunk_hash)],
+                    filename=txt_file_path.name,
+                    chunk_id=i,
+                    file_hash=file_hash,
+                    chunk_hash=chunk_hash
+                )
+                continue
+
+            units.append({
+                "path": str(txt_file_path),
+                "filename": txt_file_path.name,
+                "chunk_id": i,
+                "text_raw": text_raw,
+                "file_hash": file_hash,
+                "chunk_hash": chunk_hash
+            })
+        return full_text, units
+
+    def run_unit(self, unit, full_text):
+        """Calcule une unité; en cas d'échec elle rejoint la file des chunks à retenter"""
+        try:
+            done = self.embed_unit(
+                unit['filename'], unit['chunk_id'], unit['text_raw'],
+                full_text, unit['file_hash'], unit['chunk_hash']
+            )
+        except Exception as e:
+            self.logger.error(f"Erreur lors du traitement du chunk {unit['chunk_id']} de {unit['filename']}: {str(e)}")
+            done = False
+        if not done:
+            with self.results_lock:
+                self.failed_chunks.append(unit)
+
+    def process_concurrently(self, txt_files, max_in_flight):
+        """Calcule les chunks de tous les fichiers avec au plus max_in_flight unités en cours.
+
+        Les fichiers sont découpés au fil de l'eau: un fichier n'est lu que lorsqu'une place se
+        libère, et les chunks d'un fichier suivant partent pendant que ceux du précédent attendent
+        encore l'API. L'ordre des résultats est rétabli par save_results (fichier, chunk_id).
+        """
+        total_files = len(txt_files)
+        self.start_pool(max_in_flight)
+        for i, txt_file_path in enumerate(txt_files, 1):
+            self.logger.info(f"Traitement du fichier {i}/{total_files}: {txt_file_path.name}")
+            self.submit_file(txt_file_path)
+        self.drain_pool()
+
+    def start_pool(self, max_in_flight):
+        """Pool partagé par les fichiers: au plus max_in_flight unités en cours"""
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def submit_file(self, txt_file_path):
+        """Découpe un fichier et soumet ses chunks au pool (bloque tant que le pool est plein)"""
+        full_text, units = self.plan_file(txt_file_path)
+        for unit in units:
+            self.slots.acquire()
+            future = self.executor.submit(self.run_unit, unit, full_text)
+            future.add_done_callback(lambda _: self.slots.release())
+
+    def drain_pool(self):
+        """Attend la fin des unités soumises et ferme le pool"""
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        self.flush_checkpoint()
+
+    def embed_unit(self, filename, chunk_id, text_raw, full_text, file_hash, chunk_hash):
+        """Traite une unité (fichier, chunk) et l'ajoute aux résultats et au checkpoint"""
+        result = self.process_chunk(text_raw, full_text, chunk_hash, filename)
+        if not result:
+            return False
+
+        context, text, embedding = result
+        metadata = {
+            "filename": filename,
+            "chunk_id": chunk_id,
+            "text_raw": text_raw,
+            "context": context,
+            "text": text,
+            "file_hash": file_hash,
+            "chunk_hash": chunk_hash
+        }
+        self.add_result(embedding, metadata, 'chunks_embedded')
+
+        with self.results_lock:
+            self.checkpoint_buffer.append({"metadata": metadata, "embedding": embedding})
+            pending = len(self.checkpoint_buffer)
+        if pending >= self.checkpoint_every:
+            self.flush_checkpoint()
+        return True
+
+    def flush_checkpoint(self):
+        """Ajoute les unités terminées au fichier de checkpoint"""
+        with self.results_lock:
+            units, self.checkpoint_buffer = self.checkpoint_buffer, []
+            if not units:
+                return
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint_file:
+                for unit in units:
+                    checkpoint_file.write(json.dumps(unit, ensure_ascii=False) + '\n')
+                checkpoint_file.flush()
+                os.fsync(checkpoint_file.fileno())
+        self.logger.info(f"Checkpoint: {len(units)} chunks sauvegardés")
+
+    def load_checkpoint(self):
+        """Charge les unités terminées d'un run interrompu"""
+        if not self.checkpoint_path.exists():
+            self.logger.info("Aucun checkpoint trouvé, démarrage complet")
+            return
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as checkpoint_file:
+            for line in checkpoint_file:
+                try:
+                    unit = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal
+                    continue
+                metadata = unit['metadata']
+                self.checkpointed[(metadata['filename'], metadata['chunk_id'])] = (metadata, unit['embedding'])
+        self.logger.info(f"Reprise: {len(self.checkpointed)} chunks chargés depuis {self.checkpoint_path}")
+
+    def retry_failed_chunks(self):
+        """Retente les chunks en échec, puis enregistre ceux qui échouent encore"""
+        passes = self.options.get('retry_failed_passes', 2)
+        retry_delay = self.options.get('retry_delay', 30)
+        failed_chunks_path = self.output_dir / "failed_chunks.json"
+
+        for attempt in range(1, passes + 1):
+            if not self.failed_chunks:
+                break
+            self.logger.info(
+                f"Nouvelle tentative pour {len(self.failed_chunks)} chunks en échec (passe {attempt}/{passes})"
+            )
+            time.sleep(retry_delay * attempt)
+
+            pending, self.failed_chunks = self.failed_chunks, []
+            full_texts = {}
+            for unit in pending:
+                if unit['path'] not in full_texts:
+                    with open(unit['path'], 'r', encoding='utf-8') as file:
+                        full_texts[unit['path']] = file.read()
+                self.run_unit(unit, full_texts[unit['path']])
+            self.flush_checkpoint()
+
+        if self.failed_chunks:
+            with open(failed_chunks_path, 'w', encoding='utf-8') as json_file:
+                json.dump({"failed": self.failed_chunks}, json_file, ensure_ascii=False, indent=4)
+            self.logger.error(f"{len(self.failed_chunks)} chunks en échec définitif: {failed_chunks_path}")
+        else:
+            failed_chunks_path.unlink(missing_ok=True)
+
+    def register_chunks(self, txt_files):
+        """Note les chunks bruts de chaque fichier avant le calcul, pour reconnaître dès la
+        première occurrence ceux que plusieurs documents répètent"""
+        for txt_file_path in txt_files:
+            with open(txt_file_path, 'r', encoding='utf-8') as file:
+                chunks = self.chunk_text(file.read())
+            self.cache.add_documents([self.hash_text(text_raw) for text_raw in chunks], txt_file_path.name)
+
+    @traced('embedding.chunk')
+    def process_chunk(self, text_raw, full_text, chunk_hash, filename):
+        """Contextualise et vectorise un chunk en consultant d'abord le cache.
+
+        Un chunk répété dans plusieurs documents (garantie, avertissements...) est calculé une
+        seule fois, avec un contexte indépendant du document; ses autres occurrences reprennent
+        ce contexte et son embedding depuis le cache.
+        """
+        if self.cache.is_shared(chunk_hash):
+            with self.results_lock:
+                lock = self.shared_locks.setdefault(chunk_hash, threading.Lock())
+            with lock:
+                result = self.compute_chunk(text_raw, None, chunk_hash, None)
+            if result:
+                self.count('shared_chunks')
+            return result
+        return self.compute_chunk(text_raw, full_text, chunk_hash, filename)
+
+    def compute_chunk(self, text_raw, full_text, chunk_hash, document):
+        """Contexte et embedding d'un chunk, pour un document (None: contexte partagé)"""
+        calls = 0
+
+        # Contextualiser le chunk (un chunk identique déjà vu réutilise son contexte)
+        context = self.cache.get_context(chunk_hash, document)
+        if context is not None:
+            self.count('contexts_cached')
+        else:
+            calls += 1
             context = self.get_contextualized_chunk(text_raw, full_text)
             if context:
-                # Créer le texte complet (text_raw + context)
-                text = f"{context}\n\nContext:\n{text_raw}"
+                self.cache.put_context(chunk_hash, document, context)
+
+        text = embedding = None
+        if context:
+            # Créer le texte complet (text_raw + context)
+            text = f"{context}\n\nContext:\n{text_raw}"
 
-                # Récupérer l'embedding pour le texte complet
+            # Récupérer l'embedding pour le texte complet
+            self.count('embedding_lookups')
+            embedding = self.cache.get_embedding(text, self.embedding_model)
+            if embedding is not None:
+                self.count('embedding_cache_hits')
+            else:
+                calls += 1
                 embedding = self.get_embedding(text)
                 if embedding:
-                    self.all_embeddings.append(embedding)
-                    self.all_metadata.append({
-                        "filename": txt_file_path.name,
-                        "chunk_id": i,
-                        "text_raw": text_raw,
-                        "context": context,
-                        "text": text
-                    })
-
-            # Pause pour éviter les limites de taux de l'API
+                    self.cache.put_embedding(text, self.embedding_model, embedding)
+
+        self.count('api_calls', calls)
+
+        # Pause pour éviter les limites de taux de l'API (inutile si tout vient du cache
+        # ou si l'ordonnanceur du client régule déjà le débit)
+        if calls and not self.client.scheduler:
             time.sleep(1)
 
-    def process_all_files(self):
-        """Processus pour tous les fichiers dans le dossier d'entrée."""
+        if not embedding:
+            return None
+        return context, text, embedding
+
+    def count(self, stat, value=1):
+        """Incrémente une statistique (appelé depuis plusieurs threads)"""
+        with self.results_lock:
+            self.stats[stat] += value
+
+    def log_cache_stats(self):
+        """Journalise le taux de succès du cache et les appels API évités"""
+        lookups = self.stats['embedding_lookups']
+        hit_rate = self.stats['embedding_cache_hits'] / lookups if lookups else 0.0
+        avoided = self.stats['embedding_cache_hits'] + self.stats['contexts_cached']
+        self.logger.info(
+            f"Cache: {self.stats['embedding_cache_hits']}/{lookups} embeddings trouvés "
+            f"({hit_rate:.1%}), {self.stats['contexts_cached']} contextes réutilisés, "
+            f"{avoided} appels API évités, {self.stats['api_calls']} appels effectués; "
+            f"{self.stats['shared_chunks']} chunks répétés entre documents servis par un contexte partagé"
+        )
+
+    def process_all_files(self, update=None, resume=None):
+        """Processus pour tous les fichiers dans le dossier d'entrée.
+
+        En mode mise à jour, seuls les chunks nouveaux ou modifiés sont envoyés à l'API;
+        les chunks des fichiers supprimés disparaissent du store réécrit. Avec resume, les
+        chunks enregistrés dans le checkpoint d'un run interrompu ne sont pas recalculés.
+        """
         txt_files = list(self.input_dir.glob('*.txt'))
         total_files = len(txt_files)
+        self.file_order = {path.name: i for i, path in enumerate(txt_files)}
 
-        self.logger.info(f"Début du traitement de {total_files} fichiers")
+        self.begin(update=update, resume=resume)
+        if self.update_mode:
+            self.count_removed_files(txt_files)
+        self.register_chunks(txt_files)
 
-        for i, txt_file_path in enumerate(txt_files, 1):
-            self.logger.info(f"Traitement du fichier {i}/{total_files}: {txt_file_path.name}")
-            self.process_file(txt_file_path)
+        max_in_flight = self.options.get('max_in_flight', 1)
+        self.logger.info(f"Début du traitement de {total_files} fichiers ({max_in_flight} requêtes en vol au plus)")
+
+        if max_in_flight > 1:
+            self.process_concurrently(txt_files, max_in_flight)
+        else:
+            for i, txt_file_path in enumerate(txt_files, 1):
+                self.logger.info(f"Traitement du fichier {i}/{total_files}: {txt_file_path.name}")
+                self.process_file(txt_file_path)
+
+        self.finalize()
+
+    def begin(self, update=None, resume=None):
+        """Prépare un run: reprise du checkpoint (ou remise à zéro) et store existant en mode mise à jour"""
+        resume = self.options.get('resume', False) if resume is None else resume
+        if resume:
+            self.load_checkpoint()
+        else:
+            self.checkpoint_path.unlink(missing_ok=True)
+
+        self.update_mode = self.options.get('incremental', False) if update is None else update
+        if self.update_mode:
+            self.load_previous_store()
+
+    def count_removed_files(self, txt_files):
+        """Fichiers du store existant absents des fichiers traités"""
+        current_names = {path.name for path in txt_files}
+        self.stats['files_removed'] = len(set(self.previous_files) - current_names)
+
+    def finalize(self):
+        """Termine un run: retry des échecs, sauvegarde et statistiques"""
+        # Chunks en échec (erreurs API, coupures réseau) retentés une fois le reste terminé
+        self.retry_failed_chunks()
 
         # Sauvegarde de tous les résultats à la fin
+        self.save_results()
+        self.cache.flush()
+        self.checkpoint_path.unlink(missing_ok=True)
+        self.log_cache_stats()
+        self.client.log_metrics()
+
+        if self.update_mode:
+            self.logger.info(
+                f"Mise à jour: {self.stats['chunks_embedded']} chunks calculés, "
+                f"{self.stats['chunks_reused']} réutilisés, "
+                f"{self.stats['files_unchanged']} fichiers inchangés, "
+                f"{self.stats['files_removed']} fichiers supprimés"
+            )
+        self.logger.info("Traitement terminé")
+
+    def write_atomic(self, path, write):
+        """Écrit un fichier via un fichier temporaire remplacé atomiquement"""
+        tmp_path = path.with_name(path.name + '.tmp')
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    @traced('embedding.save')
+    def save_results(self):
+        """Sauvegarde les embeddings et métadonnées accumulés"""
         if self.all_embeddings:
+            # Ordre stable (fichier, chunk_id), quel que soit l'ordre de reprise ou de retry
+            def sort_key(row):
+                metadata = self.all_metadata[row]
+                return (
+                    self.file_order.get(metadata['filename'], len(self.file_order)),
+                    metadata['filename'],
+                    metadata['chunk_id']
+                )
+
+            order = sorted(range(len(self.all_metadata)), key=sort_key)
+            self.all_metadata = [self.all_metadata[row] for row in order]
+            self.all_embeddings = [self.all_embeddings[row] for row in order]
+
             # Sauvegarde du fichier JSON unique
             chunks_json_path = self.output_dir / "chunks.json"
-            with open(chunks_json_path, 'w', encoding='utf-8') as json_file:
-                json.dump({
-                    "metadata": self.all_metadata
-                }, json_file, ensure_ascii=False, indent=4)
+
+            def write_json(path):
+                with open(path, 'w', encoding='utf-8') as json_file:
+                    json.dump({
+                        "metadata": self.all_metadata
+                    }, json_file, ensure_ascii=False, indent=4)
+
+            self.write_atomic(chunks_json_path, write_json)
             self.logger.info(f"Fichier JSON créé: {chunks_json_path}")
 
-            # Sauvegarde du fichier .npy unique
+            # Sauvegarde du fichier .npy unique (float32: précision native des embeddings OpenAI)
+            embeddings = np.array(self.all_embeddings, dtype=np.float32)
             embeddings_npy_path = self.output_dir / "embeddings.npy"
-            np.save(embeddings_npy_path, np.array(self.all_embeddings))
+
+            def write_npy(path):
+                with open(path, 'wb') as npy_file:
+                    np.save(npy_file, embeddings)
+
+            self.write_atomic(embeddings_npy_path, write_npy)
             self.logger.info(f"Fichier NPY créé: {embeddings_npy_path}")
 
-        self.logger.info("Traitement terminé")
+            # Un store complet laissé par un dédoublonnage précédent est désormais périmé
+            for name in list(FULL_FILES.values()) + ["dedup_report.json"]:
+                (self.output_dir / name).unlink(missing_ok=True)
+
+            # Export quantifié optionnel (codes int8 + paramètres de calibration); sans
+            # quantification, un export d'un run précédent ne correspondrait plus à chunks.json
+            if self.options.get('quantization') == 'int8':
+                codes_path = export_int8(embeddings, self.output_dir)
+                self.logger.info(f"Fichier NPY quantifié créé: {codes_path}")
+            else:
+                for name in INT8_FILES:
+                    (self.output_dir / name).unlink(missing_ok=True)
+
+            # Index inversé BM25 (recherche des références produit et des valeurs exactes)
+            if self.options.get('lexical_index', True):
+                index_path = export_lexical_index(
+                    [metadata['text'] for metadata in self.all_metadata], self.output_dir
+                )
+                self.logger.info(f"Index lexical créé: {index_path}")
+
+        elif self.update_mode and self.previous_metadata:
+            # Tous les fichiers ont été supprimés: le store est vidé
+            for name in ["chunks.json", "embeddings.npy", "dedup_report.json"] + list(FULL_FILES.values()) + LEXICAL_FILES + INT8_FILES:
+                (self.output_dir / name).unlink(missing_ok=True)
+            self.logger.info("Aucun chunk restant, store supprimé")
 
 def main():
     # Configuration
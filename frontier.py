@@ -0,0 +1,533 @@
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import time
+from array import array
+from collections import deque
+from pathlib import Path
+
+
+def url_fingerprint(url):
+    """Empreinte 64 bits d'une URL (0 est réservé aux cases vides)"""
+    value = int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value or 1
+
+
+class FingerprintSet:
+    """Ensemble d'empreintes 64 bits en adressage ouvert (8 octets par case, charge ≤ 1/2).
+
+    Remplace un set de chaînes: 16 à 32 octets par URL au lieu de plus de 100. Deux URLs
+    distinctes n'ont la même empreinte qu'avec une probabilité ~n²/2^65.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        size = 1 << max(4, math.ceil(math.log2(max(capacity, 1) * 2)))
+        self.slots = array('Q', bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def find(self, fingerprint):
+        """Index de la case contenant l'empreinte, ou de la case vide où l'insérer"""
+        index = fingerprint & self.mask
+        while self.slots[index] not in (0, fingerprint):
+            index = (index + 1) & self.mask
+        return index
+
+    def add(self, url):
+        """Ajoute l'URL; retourne False si elle était déjà présente"""
+        fingerprint = url_fingerprint(url)
+        index = self.find(fingerprint)
+        if self.slots[index]:
+            return False
+        self.slots[index] = fingerprint
+        self.count += 1
+        if self.count * 2 > len(self.slots):
+            self.grow()
+        return True
+
+    def __contains__(self, url):
+        return bool(self.slots[self.find(url_fingerprint(url))])
+
+    def grow(self):
+        old_slots = self.slots
+        self.slots = array('Q', bytes(16 * len(old_slots)))
+        self.mask = len(self.slots) - 1
+        for fingerprint in old_slots:
+            if fingerprint:
+                self.slots[self.find(fingerprint)] = fingerprint
+
+    @property
+    def nbytes(self):
+        return self.slots.itemsize * len(self.slots)
+
+
+class DepthMap(FingerprintSet):
+    """FingerprintSet qui garde pour chaque URL sa profondeur minimale connue (1 octet par case).
+
+    Les deux bits de poids fort de l'octet indiquent si l'URL a une entrée vivante dans la file
+    (QUEUED) et si elle a déjà été servie (SERVED); les six autres portent la profondeur.
+    """
+
+    QUEUED = 0x40
+    SERVED = 0x80
+    MAX_DEPTH = 0x3f
+
+    def __init__(self, capacity=1 << 16):
+        super().__init__(capacity)
+        self.values = array('B', bytes(len(self.slots)))
+
+    def add(self, url):
+        return self.lower(url, self.MAX_DEPTH) == (True, 0)
+
+    def lower(self, url, depth):
+        """Enregistre une découverte à depth.
+
+        Retourne None si l'URL est déjà connue à une profondeur inférieure ou égale, sinon
+        (nouvelle, drapeaux précédents QUEUED/SERVED).
+        """
+        depth = min(depth, self.MAX_DEPTH)
+        fingerprint = url_fingerprint(url)
+        index = self.find(fingerprint)
+        if self.slots[index]:
+            value = self.values[index]
+            if depth >= value & self.MAX_DEPTH:
+                return None
+            self.values[index] = (value & ~self.MAX_DEPTH) | depth
+            return False, value & ~self.MAX_DEPTH
+        self.slots[index] = fingerprint
+        self.values[index] = depth
+        self.count += 1
+        if self.count * 2 > len(self.slots):
+            self.grow()
+        return True, 0
+
+    def get(self, url):
+        """Octet de l'URL (profondeur et drapeaux), 0 si elle est inconnue"""
+        index = self.find(url_fingerprint(url))
+        return self.values[index] if self.slots[index] else 0
+
+    def set_flags(self, url, set_mask=0, clear_mask=0):
+        index = self.find(url_fingerprint(url))
+        if self.slots[index]:
+            self.values[index] = (self.values[index] | set_mask) & ~clear_mask & 0xff
+
+    def grow(self):
+        old_slots, old_values = self.slots, self.values
+        self.slots = array('Q', bytes(16 * len(old_slots)))
+        self.values = array('B', bytes(len(self.slots)))
+        self.mask = len(self.slots) - 1
+        for fingerprint, value in zip(old_slots, old_values):
+            if fingerprint:
+                index = self.find(fingerprint)
+                self.slots[index] = fingerprint
+                self.values[index] = value
+
+    @property
+    def nbytes(self):
+        return super().nbytes + len(self.values)
+
+
+class BloomFilter:
+    """Filtre de Bloom dimensionné pour expected_items et error_rate (faux positifs possibles)"""
+
+    def __init__(self, expected_items=10_000_000, error_rate=0.001):
+        bits = max(64, int(-expected_items * math.log(error_rate) / math.log(2) ** 2))
+        self.bits = bytearray((bits + 7) // 8)
+        self.size = len(self.bits) * 8
+        self.hashes = max(1, round(self.size / max(expected_items, 1) * math.log(2)))
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def positions(self, url):
+        # Double hachage: h1 + i*h2 sur deux moitiés d'un condensat 128 bits
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, url):
+        """Ajoute l'URL; retourne False si elle était (probablement) déjà présente"""
+        new = False
+        for position in self.positions(url):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, url):
+        return all(self.bits[p // 8] & (1 << (p % 8)) for p in self.positions(url))
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+class SpillingQueue:
+    """File FIFO de (url, profondeur) qui déborde sur disque au-delà de max_in_memory éléments.
+
+    La tête de file reste en mémoire; les éléments suivants sont écrits dans des segments
+    texte relus dans l'ordre quand la tête est vide, ce qui conserve l'ordre BFS.
+    """
+
+    def __init__(self, spill_dir, max_in_memory=100_000):
+        self.spill_dir = Path(spill_dir)
+        self.max_in_memory = max(1, max_in_memory)
+        self.head = deque()
+        self.segments = deque()
+        self.writer = None
+        self.writer_path = None
+        self.writer_count = 0
+        self.segment_id = 0
+        self.count = 0
+        self.spilled = 0
+
+    def __len__(self):
+        return self.count
+
+    def push(self, url, depth):
+        if not self.segments and self.writer is None and len(self.head) < self.max_in_memory:
+            self.head.append((url, depth))
+        else:
+            self.spill(url, depth)
+        self.count += 1
+
+    def spill(self, url, depth):
+        """Écrit un élément dans le segment courant (un segment = max_in_memory éléments)"""
+        if self.writer is None:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self.writer_path = self.spill_dir / f"segment_{self.segment_id:06d}.txt"
+            self.segment_id += 1
+            self.writer = open(self.writer_path, 'w', encoding='utf-8')
+            self.writer_count = 0
+        self.writer.write(f"{depth}\t{url}\n")
+        self.writer_count += 1
+        self.spilled += 1
+        if self.writer_count >= self.max_in_memory:
+            self.close_writer()
+
+    def close_writer(self):
+        self.writer.close()
+        self.segments.append(self.writer_path)
+        self.writer = None
+
+    def pop(self):
+        if not self.head:
+            if not self.segments and self.writer is not None:
+                self.close_writer()
+            if self.segments:
+                path = self.segments.popleft()
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        depth, url = line.rstrip('\n').split('\t', 1)
+                        self.head.append((url, int(depth)))
+                os.remove(path)
+        self.count -= 1
+        return self.head.popleft()
+
+    def close(self):
+        """Supprime les segments restants"""
+        if self.writer is not None:
+            self.close_writer()
+        for path in self.segments:
+            Path(path).unlink(missing_ok=True)
+        self.segments.clear()
+
+
+class PriorityQueue:
+    """File de priorité de (url, profondeur) aux mêmes garanties mémoire que SpillingQueue.
+
+    Les scores sont arrondis à resolution près; chaque niveau est une SpillingQueue (ordre
+    BFS entre URLs de même niveau) et le niveau le plus élevé non vide est servi en premier.
+    """
+
+    def __init__(self, spill_dir, max_in_memory=100_000, resolution=0.5):
+        self.spill_dir = Path(spill_dir)
+        self.max_in_memory = max_in_memory
+        self.resolution = resolution
+        self.levels = {}
+        self.heap = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def head(self):
+        return [item for queue in self.levels.values() for item in queue.head]
+
+    @property
+    def spilled(self):
+        return sum(queue.spilled for queue in self.levels.values())
+
+    def push(self, url, depth, score=0.0):
+        level = math.floor(score / self.resolution)
+        queue = self.levels.get(level)
+        if queue is None:
+            queue = SpillingQueue(self.spill_dir / f"level_{level}", self.max_in_memory)
+            self.levels[level] = queue
+            heapq.heappush(self.heap, -level)
+        queue.push(url, depth)
+        self.count += 1
+
+    def pop(self):
+        while not len(self.levels[-self.heap[0]]):
+            self.levels.pop(-heapq.heappop(self.heap)).close()
+        self.count -= 1
+        return self.levels[-self.heap[0]].pop()
+
+    def close(self):
+        for queue in self.levels.values():
+            queue.close()
+
+
+class ChangeHistory:
+    """Empreintes du contenu de chaque URL d'un crawl à l'autre (url -> [vérifications, changements, empreinte])"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                logging.getLogger(__name__).warning(f"Historique des changements illisible, ignoré: {self.path}")
+
+    def change_rate(self, url):
+        """Proportion lissée des crawls où le contenu a changé (0.5 pour une URL inconnue)"""
+        checks, changes, _ = self.entries.get(url, (0, 0, None))
+        return (changes + 1) / (checks + 2)
+
+    def observe(self, url, fingerprint):
+        """Enregistre l'empreinte du contenu observé; retourne True s'il est nouveau ou a changé"""
+        checks, changes, previous = self.entries.get(url, (0, 0, None))
+        changed = fingerprint != previous
+        self.entries[url] = [checks + 1, changes + changed, fingerprint]
+        return changed
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+
+class UrlScorer:
+    """Priorité d'une URL découverte (les scores élevés sont visités d'abord).
+
+    Somme des poids des motifs (regex) présents dans l'URL, moins depth_weight par niveau de
+    profondeur, plus pdf_density_weight fois la proportion de liens PDF de la page parente et
+    change_weight fois le taux de changement de l'URL dans l'historique.
+    """
+
+    def __init__(self, patterns=None, depth_weight=1.0, pdf_density_weight=4.0, change_weight=3.0,
+                 history=None):
+        self.patterns = [(re.compile(pattern, re.IGNORECASE), weight) for pattern, weight in (patterns or {}).items()]
+        self.depth_weight = depth_weight
+        self.pdf_density_weight = pdf_density_weight
+        self.change_weight = change_weight
+        self.history = history
+
+    def score(self, url, depth, pdf_density=0.0):
+        score = sum(weight for pattern, weight in self.patterns if pattern.search(url))
+        score -= self.depth_weight * depth
+        score += self.pdf_density_weight * pdf_density
+        if self.history is not None:
+            score += self.change_weight * self.history.change_rate(url)
+        return score
+
+
+class CrawlBudget:
+    """Budget d'un crawl: durée maximale (secondes) et/ou nombre maximal de requêtes HTTP.
+
+    La phase d'exploration s'arrête à exploration_share du budget pour laisser à la phase
+    d'extraction de quoi rafraîchir les pages les plus prioritaires.
+    """
+
+    def __init__(self, max_seconds=None, max_requests=None, exploration_share=0.7):
+        self.max_seconds = max_seconds
+        self.max_requests = max_requests
+        self.exploration_share = exploration_share
+        self.started = time.monotonic()
+        self.requests = 0
+
+    def start(self):
+        self.started = time.monotonic()
+        self.requests = 0
+
+    def count_request(self, *args, **kwargs):
+        """Hook requests: compte chaque réponse HTTP"""
+        self.requests += 1
+
+    def used(self):
+        """Part du budget consommée (la plus grande des deux limites)"""
+        shares = [0.0]
+        if self.max_seconds:
+            shares.append((time.monotonic() - self.started) / self.max_seconds)
+        if self.max_requests:
+            shares.append(self.requests / self.max_requests)
+        return max(shares)
+
+    def exhausted(self, share=1.0):
+        return self.used() >= share
+
+    def summary(self):
+        limits = []
+        if self.max_seconds:
+            limits.append(f"{time.monotonic() - self.started:.0f}/{self.max_seconds} s")
+        if self.max_requests:
+            limits.append(f"{self.requests}/{self.max_requests} requêtes")
+        return f"Budget: {', '.join(limits) if limits else 'illimité'}"
+
+
+class CrawlFrontier:
+    """Frontière de crawl compacte: URLs déjà vues, file d'attente et journal des URLs découvertes.
+
+    seen='fingerprint' (exact à la collision 64 bits près) ou 'bloom' (taille fixe,
+    error_rate de faux positifs: une URL nouvelle peut être ignorée). Chaque URL découverte
+    est ajoutée à urls_log, relu en flux par le rapport. Sans scorer la file est BFS; avec un
+    UrlScorer, les URLs sont servies par priorité décroissante. Chaque URL servie est ajoutée à
+    order_log, l'ordre de visite suivi par la phase d'extraction.
+
+    En ordre BFS, une URL est toujours découverte d'abord à sa profondeur minimale. En ordre de
+    priorité ce n'est plus le cas: l'ensemble des URLs vues est alors un DepthMap (exact, seen
+    est ignoré), et une URL retrouvée moins profonde est remise en file à cette profondeur;
+    son entrée plus profonde, périmée, est ignorée au moment d'être servie.
+    """
+
+    def __init__(self, spill_dir, urls_log, max_in_memory=100_000, seen='fingerprint',
+                 expected_urls=10_000_000, error_rate=0.001, scorer=None, order_log=None):
+        self.logger = logging.getLogger(__name__)
+        self.scorer = scorer
+        self.depths = None
+        if scorer:
+            if seen == 'bloom':
+                self.logger.info("Frontière par priorité: profondeurs minimales suivies par empreintes exactes, seen='bloom' ignoré")
+            self.seen = self.depths = DepthMap()
+            self.queue = PriorityQueue(spill_dir, max_in_memory)
+        elif seen == 'bloom':
+            self.seen = BloomFilter(expected_urls, error_rate)
+            self.queue = SpillingQueue(spill_dir, max_in_memory)
+        else:
+            self.seen = FingerprintSet()
+            self.queue = SpillingQueue(spill_dir, max_in_memory)
+        # Entrées périmées encore en file et URLs remises en file moins profondes
+        self.stale = 0
+        self.requeued = 0
+        self.urls_log = Path(urls_log)
+        self.urls_log.parent.mkdir(parents=True, exist_ok=True)
+        self.log = open(self.urls_log, 'w', encoding='utf-8')
+        self.order_log = Path(order_log) if order_log else self.urls_log.with_name('crawl_order.txt')
+        self.order = open(self.order_log, 'w', encoding='utf-8')
+
+    def __len__(self):
+        return len(self.queue) - self.stale
+
+    @property
+    def seen_count(self):
+        return len(self.seen)
+
+    def add(self, url, depth, pdf_density=0.0):
+        """Met l'URL en file si elle n'a jamais été vue (ou, par priorité, si elle est retrouvée
+        moins profonde); retourne True si elle est nouvelle"""
+        if self.depths is not None:
+            found = self.depths.lower(url, depth)
+            if found is None:
+                return False
+            new, flags = found
+            if flags & DepthMap.QUEUED:
+                self.stale += 1
+            if not new:
+                self.requeued += 1
+            self.depths.set_flags(url, DepthMap.QUEUED)
+        elif self.seen.add(url):
+            new = True
+        else:
+            return False
+
+        if self.scorer:
+            self.queue.push(url, depth, self.scorer.score(url, depth, pdf_density))
+        else:
+            self.queue.push(url, depth)
+        if new:
+            self.log.write(url + '\n')
+        return new
+
+    def __contains__(self, url):
+        return url in self.seen
+
+    def pop(self):
+        """Prochaine (url, profondeur): ordre BFS, ou priorité décroissante avec un scorer"""
+        url, depth, _ = self.next_entry()
+        return url, depth
+
+    def next_entry(self):
+        """Prochaine (url, profondeur, première visite), entrées périmées ignorées.
+
+        Seule la première visite d'une URL est ajoutée à order_log: une URL revisitée moins
+        profonde n'est extraite qu'une fois en phase 2.
+        """
+        while True:
+            url, depth = self.queue.pop()
+            if self.depths is None:
+                self.order.write(url + '\n')
+                return url, depth, True
+            value = self.depths.get(url)
+            if min(depth, DepthMap.MAX_DEPTH) > value & DepthMap.MAX_DEPTH:
+                self.stale -= 1
+                continue
+            first = not value & DepthMap.SERVED
+            self.depths.set_flags(url, DepthMap.SERVED, DepthMap.QUEUED)
+            if first:
+                self.order.write(url + '\n')
+            return url, depth, first
+
+    def discovered(self):
+        """Itère sur les URLs découvertes, dans l'ordre de découverte"""
+        if not self.log.closed:
+            self.log.flush()
+        with open(self.urls_log, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip('\n')
+
+    def visit_order(self):
+        """Itère sur les URLs servies, puis sur celles restées en file (arrêt sur budget)"""
+        self.order.flush()
+        with open(self.order_log, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip('\n')
+        while len(self):
+            url, _, first = self.next_entry()
+            if first:
+                yield url
+
+    def memory_bytes(self):
+        """Estimation de la mémoire occupée (ensemble des URLs vues + tête de file)"""
+        head = sum(len(url) + 80 for url, _ in self.queue.head)
+        return self.seen.nbytes + head
+
+    def summary(self):
+        return (
+            f"Frontière: {self.seen_count} URLs vues, {len(self)} en file, "
+            f"{self.requeued} remises en file moins profondes, "
+            f"{self.queue.spilled} débordées sur disque, "
+            f"mémoire ~{self.memory_bytes() / 1024 / 1024:.1f} Mo"
+        )
+
+    def close(self):
+        self.queue.close()
+        self.log.close()
+        self.order.close()
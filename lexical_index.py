@@ -0,0 +1,310 @@
+import json
+import logging
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from pathlib import Path
+import numpy as np
+from text_utils import fold
+from vector_search import VectorIndex, normalize_rows, top_k, format_results
+
+# Un terme est une suite de lettres/chiffres, éventuellement reliée par - _ / . (références
+# produit comme ORF-R020, cotes comme 2.5, 120/240): le terme composé est indexé tel quel,
+# avec ses parties et, s'il contient un chiffre, sa forme sans séparateurs (ORFR020)
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_/.][^\W_]+)*")
+SEPARATORS = re.compile(r"[-_/.]")
+
+# Fichiers de l'index écrits à côté de chunks.json
+LEXICAL_FILES = [
+    'lexical_index.json', 'lexical_offsets.npy', 'lexical_postings.npy',
+    'lexical_tf.npy', 'lexical_doc_lengths.npy'
+]
+
+
+def tokenize(text):
+    """Termes d'un texte, en conservant les références produit intactes"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(fold(text)):
+        token = match.group()
+        tokens.append(token)
+        parts = SEPARATORS.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+            if any(char.isdigit() for char in token):
+                tokens.append(''.join(parts))
+    return tokens
+
+
+class LexicalIndex:
+    """Index inversé BM25 sur le texte des chunks.
+
+    Les listes de postings (numéro de chunk croissant, fréquence du terme) sont stockées dans
+    des fichiers .npy lus en mémoire mappée; seul le dictionnaire des termes est chargé.
+    """
+
+    def __init__(self, terms, offsets, postings, tf, doc_lengths, k1=1.2, b=0.75):
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.tf = tf
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.logger = logging.getLogger(__name__)
+
+        self.num_docs = len(doc_lengths)
+        average_length = float(np.mean(doc_lengths)) if self.num_docs else 0.0
+        # Normalisation de longueur de chaque chunk, précalculée une fois
+        self.doc_norm = (
+            k1 * (1 - b + b * np.asarray(doc_lengths, dtype=np.float32) / max(average_length, 1.0))
+        ).astype(np.float32)
+
+    def __len__(self):
+        return self.num_docs
+
+    @classmethod
+    def build(cls, texts, k1=1.2, b=0.75):
+        """Construit l'index en mémoire à partir des textes des chunks (dans l'ordre des lignes)"""
+        terms = {}
+        term_ids = array('I')
+        doc_ids = array('I')
+        frequencies = array('H')
+        doc_lengths = array('I')
+
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text or ''))
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                term_ids.append(terms.setdefault(term, len(terms)))
+                doc_ids.append(doc_id)
+                frequencies.append(min(count, 65535))
+
+        # Regroupement par terme; le tri stable conserve l'ordre croissant des chunks
+        term_ids = np.frombuffer(term_ids, dtype=np.uint32)
+        order = np.argsort(term_ids, kind='stable')
+        counts = np.bincount(term_ids, minlength=len(terms))
+        return cls(
+            terms=terms,
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            postings=np.frombuffer(doc_ids, dtype=np.uint32)[order],
+            tf=np.frombuffer(frequencies, dtype=np.uint16)[order],
+            doc_lengths=np.frombuffer(doc_lengths, dtype=np.uint32).copy(),
+            k1=k1,
+            b=b
+        )
+
+    def save(self, output_dir):
+        """Écrit l'index (fichiers temporaires remplacés atomiquement, JSON en dernier)"""
+        output_dir = Path(output_dir)
+        arrays = {
+            'lexical_offsets.npy': self.offsets,
+            'lexical_postings.npy': self.postings,
+            'lexical_tf.npy': self.tf,
+            'lexical_doc_lengths.npy': self.doc_lengths
+        }
+        for name, values in arrays.items():
+            tmp_path = output_dir / name.replace('.npy', '.tmp.npy')
+            np.save(tmp_path, values)
+            os.replace(tmp_path, output_dir / name)
+
+        # Termes dans l'ordre de leur identifiant
+        terms = [None] * len(self.terms)
+        for term, term_id in self.terms.items():
+            terms[term_id] = term
+        params_path = output_dir / 'lexical_index.json'
+        tmp_path = params_path.with_name(params_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"k1": self.k1, "b": self.b, "num_docs": self.num_docs, "terms": terms}, f,
+                      ensure_ascii=False)
+        os.replace(tmp_path, params_path)
+        return params_path
+
+    @classmethod
+    def load(cls, output_dir):
+        """Charge un index sauvegardé (postings en mémoire mappée)"""
+        output_dir = Path(output_dir)
+        with open(output_dir / 'lexical_index.json', 'r', encoding='utf-8') as f:
+            params = json.load(f)
+        return cls(
+            terms={term: term_id for term_id, term in enumerate(params['terms'])},
+            offsets=np.load(output_dir / 'lexical_offsets.npy'),
+            postings=np.load(output_dir / 'lexical_postings.npy', mmap_mode='r'),
+            tf=np.load(output_dir / 'lexical_tf.npy', mmap_mode='r'),
+            doc_lengths=np.load(output_dir / 'lexical_doc_lengths.npy'),
+            k1=params['k1'],
+            b=params['b']
+        )
+
+    def query_terms(self, query):
+        """Identifiants des termes connus de la requête (un terme répété compte une fois)"""
+        return sorted({self.terms[token] for token in tokenize(query) if token in self.terms})
+
+    def idf(self, term_id):
+        df = int(self.offsets[term_id + 1] - self.offsets[term_id])
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def term_scores(self, term_id, docs, tf):
+        tf = np.asarray(tf, dtype=np.float32)
+        return self.idf(term_id) * tf * (self.k1 + 1) / (tf + self.doc_norm[docs])
+
+    def search(self, query, k=10, max_df=0.1):
+        """Top-k BM25 d'une requête texte: (indices, scores), triés par score décroissant.
+
+        Les termes présents dans plus de max_df des chunks (ex. le préfixe ORF des références)
+        ne servent pas à sélectionner les candidats, mais comptent dans leur score final; un
+        chunk qui ne contient que ces termes fréquents n'est retourné que s'ils sont seuls.
+        """
+        term_ids = self.query_terms(query)
+        selective = [
+            term_id for term_id in term_ids
+            if self.offsets[term_id + 1] - self.offsets[term_id] <= max_df * self.num_docs
+        ]
+        all_docs, all_scores = [], []
+        for term_id in selective or term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = np.asarray(self.postings[start:end], dtype=np.int64)
+            all_docs.append(docs)
+            all_scores.append(self.term_scores(term_id, docs, self.tf[start:end]))
+        if not all_docs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        docs, inverse = np.unique(np.concatenate(all_docs), return_inverse=True)
+        if selective and len(selective) < len(term_ids):
+            scores = self.score_docs(query, docs)
+        else:
+            scores = np.bincount(inverse, weights=np.concatenate(all_scores)).astype(np.float32)
+        ids, best = top_k(scores[np.newaxis, :], k)
+        return docs[ids[0]], best[0]
+
+    def score_docs(self, query, doc_ids):
+        """Scores BM25 de chunks donnés (recherche dichotomique dans les postings triés)"""
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        scores = np.zeros(len(doc_ids), dtype=np.float32)
+        for term_id in self.query_terms(query):
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            postings = self.postings[start:end]
+            positions = np.searchsorted(postings, doc_ids)
+            found = positions < len(postings)
+            found[found] = postings[positions[found]] == doc_ids[found]
+            if found.any():
+                scores[found] += self.term_scores(
+                    term_id, doc_ids[found], self.tf[start:end][positions[found]]
+                )
+        return scores
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in [self.offsets, self.postings, self.tf, self.doc_lengths])
+
+
+def export_lexical_index(texts, output_dir, k1=1.2, b=0.75):
+    """Construit et écrit l'index lexical des chunks à côté de chunks.json"""
+    index = LexicalIndex.build(texts, k1=k1, b=b)
+    return index.save(output_dir)
+
+
+class HybridIndex:
+    """Recherche hybride: fusion des scores BM25 et cosinus sur les sorties de l'EmbeddingProcessor.
+
+    Les candidats des deux recherches sont réunis puis rescorés des deux côtés; chaque score est
+    ramené entre 0 et 1 sur les candidats et combiné: alpha * cosinus + (1 - alpha) * BM25.
+    """
+
+    def __init__(self, embeddings_dir, alpha=0.5, candidates=100, block_size=65536):
+        self.embeddings_dir = Path(embeddings_dir)
+        self.alpha = alpha
+        self.candidates = candidates
+        self.logger = logging.getLogger(__name__)
+
+        self.vector_index = VectorIndex(embeddings_dir, block_size=block_size)
+        self.metadata = self.vector_index.metadata
+        self.lexical_index = self.load_lexical_index()
+
+    def load_lexical_index(self):
+        """Charge l'index lexical, ou le reconstruit s'il est absent ou antérieur aux chunks"""
+        params_path = self.embeddings_dir / 'lexical_index.json'
+        chunks_path = self.embeddings_dir / 'chunks.json'
+        if params_path.exists() and (
+            not chunks_path.exists() or os.path.getmtime(params_path) >= os.path.getmtime(chunks_path)
+        ):
+            return LexicalIndex.load(self.embeddings_dir)
+
+        self.logger.info(f"Construction de l'index lexical sur {len(self.metadata)} chunks")
+        export_lexical_index(
+            [metadata.get('text', metadata.get('text_raw', '')) for metadata in self.metadata],
+            self.embeddings_dir
+        )
+        return LexicalIndex.load(self.embeddings_dir)
+
+    @staticmethod
+    def rescale(scores):
+        """Ramène des scores entre 0 et 1 (min-max sur les candidats)"""
+        if scores.size == 0:
+            return scores
+        low, high = float(scores.min()), float(scores.max())
+        if high - low < 1e-12:
+            return np.ones_like(scores) if high > 0 else np.zeros_like(scores)
+        return (scores - low) / (high - low)
+
+    def search_ids(self, query, query_vector=None, k=10, alpha=None, approximate=False, vector_ids=None):
+        """Indices et scores fusionnés (BM25 seul si aucun vecteur de requête n'est fourni).
+
+        vector_ids: candidats cosinus déjà calculés (recherche vectorielle faite pour un lot)
+        """
+        alpha = self.alpha if alpha is None else alpha
+        candidates = max(k, self.candidates)
+        lexical_ids, _ = self.lexical_index.search(query, k=candidates)
+
+        if query_vector is None:
+            candidate_ids = lexical_ids
+            cosine = np.zeros(len(candidate_ids), dtype=np.float32)
+            alpha = 0.0
+        else:
+            query_vector = normalize_rows(query_vector)
+            if vector_ids is None:
+                vector_ids, _ = self.vector_index.search_vectors(
+                    query_vector, k=candidates, approximate=approximate
+                )
+                vector_ids = vector_ids[0]
+            vector_ids = vector_ids[vector_ids >= 0]
+            candidate_ids = np.union1d(lexical_ids, vector_ids).astype(np.int64)
+            cosine = np.asarray(self.vector_index.vectors[candidate_ids], dtype=np.float32) @ query_vector[0]
+
+        bm25 = self.lexical_index.score_docs(query, candidate_ids)
+        fused = alpha * self.rescale(cosine) + (1 - alpha) * self.rescale(bm25)
+        order, best = top_k(fused[np.newaxis, :], k)
+        order = order[0]
+        return candidate_ids[order], best[0], bm25[order], cosine[order]
+
+    def search(self, query, query_vector=None, k=10, alpha=None, approximate=False, vector_ids=None):
+        """Top-k d'une requête texte avec les métadonnées et les scores BM25/cosinus des chunks"""
+        ids, scores, bm25, cosine = self.search_ids(
+            query, query_vector=query_vector, k=k, alpha=alpha, approximate=approximate,
+            vector_ids=vector_ids
+        )
+        hits = format_results(self.metadata, [ids], [scores])[0]
+        for hit, bm25_score, cosine_score in zip(hits, bm25, cosine):
+            hit['bm25'] = float(bm25_score)
+            hit['cosine'] = float(cosine_score)
+        return hits
+
+
+def main():
+    # Configuration
+    embeddings_directory = "output"
+    query = "ORF-R020"
+
+    try:
+        index = HybridIndex(embeddings_directory)
+        for hit in index.search(query, k=5):
+            print(f"{hit['score']:.4f} (bm25 {hit['bm25']:.2f}) {hit.get('filename')} #{hit.get('chunk_id')}")
+
+    except Exception as e:
+        logging.error(f"Erreur principale: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
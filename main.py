@@ -18,23 +18,33 @@ def main():
     parser.add_argument('--config', default='config.json', help='Chemin du fichier de configuration')
     parser.add_argument('--output-dir', default='pipeline_output', help='Dossier de sortie')
     parser.add_argument('--debug', action='store_true', help='Active le mode debug')
+    parser.add_argument('--api-base-url', help="URL d'une API compatible OpenAI (ex: mock_openai_server.py)")
+    parser.add_argument('--trace', nargs='?', const=True, default=None,
+                        help='Enregistre une trace JSON des étapes (logs/trace.json par défaut)')
+    parser.add_argument('--profile', action='store_true', help='Profile chaque étape avec cProfile (logs/<étape>.prof)')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Élague les chunks quasi identiques après les embeddings (dedup_options)')
     
     # Sous-parsers pour les différentes commandes
     subparsers = parser.add_subparsers(dest='command', help='Commande à exécuter')
     
     # Parser pour le pipeline complet
     pipeline_parser = subparsers.add_parser('pipeline', help='Exécute le pipeline complet')
-    pipeline_parser.add_argument('--start-url', required=True, help='URL de départ')
+    pipeline_parser.add_argument('--start-url', required=True, nargs='+', help='URL(s) de départ')
     pipeline_parser.add_argument('--openai-key', required=True, help='Clé API OpenAI')
     pipeline_parser.add_argument('--max-depth', type=int, default=2, help='Profondeur max du crawling')
+    pipeline_parser.add_argument('--workers', type=int, default=1, help='Processus de crawl (frontière partagée)')
     pipeline_parser.add_argument('--skip-crawling', action='store_true')
     pipeline_parser.add_argument('--skip-pdf', action='store_true')
+    pipeline_parser.add_argument('--skip-office', action='store_true')
     pipeline_parser.add_argument('--skip-embedding', action='store_true')
+    pipeline_parser.add_argument('--streaming', action='store_true', help='Chevauche les étapes (files bornées entre étapes)')
     
     # Parser pour le crawler seul
     crawler_parser = subparsers.add_parser('crawl', help='Exécute uniquement le crawler')
-    crawler_parser.add_argument('--start-url', required=True, help='URL de départ')
+    crawler_parser.add_argument('--start-url', required=True, nargs='+', help='URL(s) de départ')
     crawler_parser.add_argument('--max-depth', type=int, default=2)
+    crawler_parser.add_argument('--workers', type=int, default=1, help='Processus de crawl (frontière partagée)')
     
     # Parser pour le traitement PDF seul
     pdf_parser = subparsers.add_parser('pdf', help='Exécute uniquement le traitement PDF')
@@ -42,12 +52,24 @@ def main():
     pdf_parser.add_argument('--output-dir', required=True, help='Dossier de sortie')
     pdf_parser.add_argument('--openai-key', required=True, help='Clé API OpenAI')
     
+    # Parser pour l'extraction Office seule
+    office_parser = subparsers.add_parser('office', help='Exécute uniquement l\'extraction des fichiers Office')
+    office_parser.add_argument('--input-dir', required=True, help='Dossier contenant les fichiers Office')
+    office_parser.add_argument('--output-dir', required=True, help='Dossier de sortie')
+    
     # Parser pour l'embedding seul
     embedding_parser = subparsers.add_parser('embed', help='Exécute uniquement la création d\'embeddings')
     embedding_parser.add_argument('--input-dir', required=True, help='Dossier contenant les fichiers texte')
     embedding_parser.add_argument('--output-dir', required=True, help='Dossier de sortie')
     embedding_parser.add_argument('--openai-key', required=True, help='Clé API OpenAI')
+    embedding_parser.add_argument('--update', action='store_true', help='Ne recalcule que les chunks nouveaux ou modifiés')
+    embedding_parser.add_argument('--resume', action='store_true', help='Reprend un run interrompu depuis son checkpoint')
     
+    # Sous-commande pour le service de recherche
+    serve_parser = subparsers.add_parser('serve', help='Sert la recherche sur les embeddings du dernier run')
+    serve_parser.add_argument('--embeddings-dir', help='Dossier embeddings (par défaut: dernier run de --output-dir)')
+    serve_parser.add_argument('--openai-key', help='Clé API OpenAI pour vectoriser les requêtes (sinon BM25 seul)')
+
     args = parser.parse_args()
     
     # Configuration du logging
@@ -58,29 +80,47 @@ def main():
     
     # Chargement de la configuration
     config = load_config(args.config)
+    if args.api_base_url:
+        config['api_options'] = {**(config.get('api_options') or {}), 'base_url': args.api_base_url}
+    if args.trace:
+        config['trace'] = args.trace
+    if args.profile:
+        config['profile'] = True
+    if args.dedup:
+        config['dedup_options'] = {**(config.get('dedup_options') or {}), 'enabled': True}
     
     try:
         if args.command == 'pipeline':
             # Exécution du pipeline complet
             pipeline = Pipeline(
-                start_url=args.start_url,
+                start_url=args.start_url[0],
                 openai_api_key=args.openai_key,
                 options={
                     'max_depth': args.max_depth,
                     'output_dir': args.output_dir,
+                    'start_urls': args.start_url[1:],
+                    'crawl_workers': args.workers,
                     **config
                 }
             )
             pipeline.run(
                 skip_crawling=args.skip_crawling,
                 skip_pdf=args.skip_pdf,
-                skip_embedding=args.skip_embedding
+                skip_embedding=args.skip_embedding,
+                streaming=args.streaming,
+                skip_office=args.skip_office
             )
             
         elif args.command == 'crawl':
             # Exécution du crawler seul
-            pipeline = Pipeline(options={'output_dir': args.output_dir, **config})
-            pipeline.run_crawler(custom_start_url=args.start_url)
+            pipeline = Pipeline(options={
+                'max_depth': args.max_depth,
+                'output_dir': args.output_dir,
+                'start_urls': args.start_url[1:],
+                'crawl_workers': args.workers,
+                **config
+            })
+            pipeline.run_crawler(custom_start_url=args.start_url[0])
             
         elif args.command == 'pdf':
             # Exécution du traitement PDF seul
@@ -93,6 +133,14 @@ def main():
                 output_dir=args.output_dir
             )
             
+        elif args.command == 'office':
+            # Exécution de l'extraction Office seule
+            pipeline = Pipeline(options={'output_dir': args.output_dir, **config})
+            pipeline.run_office_processor(
+                input_dir=args.input_dir,
+                output_dir=args.output_dir
+            )
+            
         elif args.command == 'embed':
             # Exécution de l'embedding seul
             pipeline = Pipeline(
@@ -101,8 +149,25 @@ def main():
             )
             pipeline.run_embedding(
                 input_dir=args.input_dir,
-                output_dir=args.output_dir
+                output_dir=args.output_dir,
+                update=args.update or None,
+                resume=args.resume or None
+            )
+            
+        elif args.command == 'serve':
+            # Service de recherche (rechargé à chaque nouveau run)
+            from search_server import SearchServer
+            client = None
+            if args.openai_key:
+                from openai_client import get_client
+                client = get_client(args.openai_key, **(config.get('api_options') or {}))
+            server = SearchServer(
+                args.embeddings_dir or args.output_dir,
+                client=client,
+                model=(config.get('embedding_options') or {}).get('model', 'text-embedding-ada-002'),
+                **(config.get('search_options') or {})
             )
+            server.run()
             
         else:
             parser.print_help()
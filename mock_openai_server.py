@@ -0,0 +1,243 @@
+import argparse
+import hashlib
+import json
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Serveur local compatible OpenAI pour /v1/chat/completions et /v1/embeddings.
+
+    Les réponses sont déterministes (dérivées d'un hash de l'entrée), la latence est
+    simulée, et des 429 peuvent être injectés aléatoirement ou par dépassement des
+    limites requêtes/tokens par minute, avec les mêmes en-têtes que l'API réelle.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.2, jitter=0.05, embedding_latency=None,
+                 error_rate=0.0, requests_per_minute=None, tokens_per_minute=None,
+                 max_context_tokens=None, dim=1536, seed=0):
+        super().__init__((host, port), MockOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.embedding_latency = latency / 4 if embedding_latency is None else embedding_latency
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_context_tokens = max_context_tokens
+        self.dim = dim
+        self.random = random.Random(seed)
+        self.logger = logging.getLogger(__name__)
+
+        # Fenêtre glissante d'une minute: (instant, tokens) des requêtes acceptées
+        self.lock = threading.Lock()
+        self.window = deque()
+        self.stats = {'requests': 0, 'rate_limited': 0, 'injected_errors': 0, 'tokens': 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Démarre le serveur dans un thread d'arrière-plan"""
+        thread = threading.Thread(target=self.serve_forever, name='mock-openai', daemon=True)
+        thread.start()
+        return self
+
+    def admit(self, tokens):
+        """Applique les limites par minute; retourne (accepté, délai, en-têtes x-ratelimit)"""
+        with self.lock:
+            now = time.monotonic()
+            while self.window and now - self.window[0][0] >= 60:
+                self.window.popleft()
+            used_requests = len(self.window)
+            used_tokens = sum(count for _, count in self.window)
+            self.stats['requests'] += 1
+
+            injected = self.error_rate and self.random.random() < self.error_rate
+            over_requests = self.requests_per_minute and used_requests + 1 > self.requests_per_minute
+            over_tokens = self.tokens_per_minute and used_tokens + tokens > self.tokens_per_minute
+            accepted = not (injected or over_requests or over_tokens)
+            if accepted:
+                self.window.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+                self.stats['tokens'] += tokens
+            elif injected:
+                self.stats['injected_errors'] += 1
+            else:
+                self.stats['rate_limited'] += 1
+
+            delay = 0.0 if injected or not self.window else max(0.0, 60 - (now - self.window[0][0]))
+            headers = {}
+            if self.requests_per_minute:
+                headers['x-ratelimit-limit-requests'] = str(self.requests_per_minute)
+                headers['x-ratelimit-remaining-requests'] = str(max(0, self.requests_per_minute - used_requests))
+                headers['x-ratelimit-reset-requests'] = f"{delay:.3f}s"
+            if self.tokens_per_minute:
+                headers['x-ratelimit-limit-tokens'] = str(self.tokens_per_minute)
+                headers['x-ratelimit-remaining-tokens'] = str(max(0, self.tokens_per_minute - used_tokens))
+                headers['x-ratelimit-reset-tokens'] = f"{delay:.3f}s"
+            if not accepted:
+                headers['retry-after-ms'] = str(int((delay or self.random.uniform(0.1, 0.5)) * 1000))
+            return accepted, headers
+
+    def sleep(self, base):
+        """Latence simulée de traitement"""
+        time.sleep(max(0.0, base + self.random.uniform(-self.jitter, self.jitter)))
+
+    def chat_completion(self, payload):
+        """Réponse déterministe: résumé haché du dernier message"""
+        messages = payload.get('messages', [])
+        content = str(messages[-1].get('content', '')) if messages else ''
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+        prompt_tokens = count_tokens(''.join(str(m.get('content', '')) for m in messages))
+        reply = f"Réponse simulée {digest}: {content[:200]}"
+        completion_tokens = count_tokens(reply)
+        return {
+            "id": f"chatcmpl-{digest}",
+            "object": "chat.completion",
+            "model": payload.get('model', 'mock'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": reply},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }
+
+    def embeddings(self, payload):
+        """Vecteurs unitaires déterministes dérivés du texte"""
+        inputs = payload.get('input', [])
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        data = [
+            {"object": "embedding", "index": i, "embedding": fake_embedding(str(text), self.dim)}
+            for i, text in enumerate(inputs)
+        ]
+        tokens = sum(count_tokens(str(text)) for text in inputs)
+        return {
+            "object": "list",
+            "model": payload.get('model', 'mock'),
+            "data": data,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """Routage des requêtes vers MockOpenAIServer"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Sans TCP_NODELAY, Nagle et l'ACK retardé ajoutent ~40 ms aux réponses keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self.send_json(400, error("Corps JSON invalide", 'invalid_request_error'))
+
+        if self.path.rstrip('/').endswith('/chat/completions'):
+            handler, latency = self.server.chat_completion, self.server.latency
+            text = ''.join(str(m.get('content', '')) for m in payload.get('messages', []))
+        elif self.path.rstrip('/').endswith('/embeddings'):
+            handler, latency = self.server.embeddings, self.server.embedding_latency
+            inputs = payload.get('input', '')
+            text = ''.join(inputs) if isinstance(inputs, list) else str(inputs)
+        else:
+            return self.send_json(404, error(f"Chemin inconnu: {self.path}", 'invalid_request_error'))
+
+        tokens = count_tokens(text) + payload.get('max_tokens', 0)
+        if self.server.max_context_tokens and count_tokens(text) > self.server.max_context_tokens:
+            return self.send_json(400, error(
+                f"Contexte de {count_tokens(text)} tokens au-delà de {self.server.max_context_tokens}",
+                'context_length_exceeded'
+            ))
+
+        accepted, headers = self.server.admit(tokens)
+        if not accepted:
+            return self.send_json(429, error("Limite de débit atteinte", 'rate_limit_exceeded'), headers)
+
+        self.server.sleep(latency)
+        self.send_json(200, handler(payload), headers)
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        self.server.logger.debug(format % args)
+
+
+def count_tokens(text):
+    """Approximation du nombre de tokens (≈ 4 caractères par token)"""
+    return len(text) // 4 + 1
+
+
+def fake_embedding(text, dim):
+    """Vecteur unitaire pseudo-aléatoire, identique pour un même texte"""
+    seed = struct.unpack('<Q', hashlib.sha256(text.encode('utf-8')).digest()[:8])[0]
+    generator = random.Random(seed)
+    vector = [generator.gauss(0, 1) for _ in range(dim)]
+    norm = sum(value * value for value in vector) ** 0.5 or 1.0
+    return [value / norm for value in vector]
+
+
+def error(message, code):
+    return {"error": {"message": message, "type": code, "code": code}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur local compatible OpenAI pour tests et benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help='Latence chat (s)')
+    parser.add_argument('--embedding-latency', type=float, default=None, help='Latence embeddings (s)')
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Proportion de 429 injectés')
+    parser.add_argument('--rpm', type=int, default=None, help='Limite de requêtes par minute')
+    parser.add_argument('--tpm', type=int, default=None, help='Limite de tokens par minute')
+    parser.add_argument('--max-context-tokens', type=int, default=None)
+    parser.add_argument('--dim', type=int, default=1536)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    server = MockOpenAIServer(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        embedding_latency=args.embedding_latency, error_rate=args.error_rate,
+        requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+        max_context_tokens=args.max_context_tokens, dim=args.dim
+    )
+    logging.info(f"Serveur OpenAI simulé sur {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info(f"Statistiques: {server.stats}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
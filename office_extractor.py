@@ -0,0 +1,291 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# Les bibliothèques Office (python-docx, openpyxl, python-pptx, xlrd) sont optionnelles et
+# importées par l'extracteur du format concerné; les formats binaires anciens (.doc, .ppt)
+# passent par une conversion LibreOffice si `soffice` est disponible.
+OFFICE_EXTENSIONS = {'.docx', '.xlsx', '.pptx', '.doc', '.xls', '.ppt'}
+
+
+def table_to_markdown(rows):
+    """Convertit une liste de lignes (listes de cellules) en tableau Markdown"""
+    rows = [
+        ['' if cell is None else str(cell).replace('\n', ' ').replace('|', '/').strip() for cell in row]
+        for row in rows
+    ]
+    rows = [row for row in rows if any(row)]
+    if not rows:
+        return ''
+    width = max(len(row) for row in rows)
+    rows = [row + [''] * (width - len(row)) for row in rows]
+    lines = ['| ' + ' | '.join(rows[0]) + ' |', '|' + '---|' * width]
+    lines.extend('| ' + ' | '.join(row) + ' |' for row in rows[1:])
+    return '\n'.join(lines)
+
+
+def extract_docx(path):
+    """Paragraphes (titres en Markdown) et tableaux dans l'ordre du document; une seule page"""
+    import docx
+    from docx.table import Table
+    from docx.text.paragraph import Paragraph
+
+    document = docx.Document(path)
+    parts = []
+    for element in document.element.body.iterchildren():
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag == 'p':
+            paragraph = Paragraph(element, document)
+            text = paragraph.text.strip()
+            if not text:
+                continue
+            style = paragraph.style.name if paragraph.style is not None else ''
+            if style.startswith('Heading') and style[-1:].isdigit():
+                parts.append('#' * int(style[-1]) + ' ' + text)
+            elif style.startswith('List'):
+                parts.append('- ' + text)
+            else:
+                parts.append(text)
+        elif tag == 'tbl':
+            table = Table(element, document)
+            parts.append(table_to_markdown([[cell.text for cell in row.cells] for row in table.rows]))
+    return ['\n\n'.join(part for part in parts if part)]
+
+
+def extract_xlsx(path):
+    """Une page par feuille, lue en flux (read_only)"""
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        pages = []
+        for sheet in workbook.worksheets:
+            table = table_to_markdown(sheet.iter_rows(values_only=True))
+            if table:
+                pages.append(f"# {sheet.title}\n\n{table}")
+        return pages
+    finally:
+        workbook.close()
+
+
+def extract_xls(path):
+    """Classeurs Excel 97-2003 (xlrd); une page par feuille"""
+    import xlrd
+
+    workbook = xlrd.open_workbook(path, on_demand=True)
+    pages = []
+    for sheet in workbook.sheets():
+        table = table_to_markdown(sheet.row_values(i) for i in range(sheet.nrows))
+        if table:
+            pages.append(f"# {sheet.name}\n\n{table}")
+    return pages
+
+
+def extract_pptx(path):
+    """Une page par diapositive: textes, tableaux et notes"""
+    from pptx import Presentation
+
+    pages = []
+    for slide in Presentation(path).slides:
+        parts = []
+        for shape in slide.shapes:
+            if shape.has_text_frame and shape.text_frame.text.strip():
+                parts.append(shape.text_frame.text.strip())
+            if getattr(shape, 'has_table', False) and shape.has_table:
+                parts.append(table_to_markdown(
+                    [[cell.text for cell in row.cells] for row in shape.table.rows]
+                ))
+        if slide.has_notes_slide and slide.notes_slide.notes_text_frame.text.strip():
+            parts.append("Notes: " + slide.notes_slide.notes_text_frame.text.strip())
+        if parts:
+            pages.append('\n\n'.join(parts))
+    return pages
+
+
+def extract_legacy(path):
+    """Convertit .doc/.ppt (et .xls sans xlrd) au format OOXML avec LibreOffice"""
+    soffice = shutil.which('soffice') or shutil.which('libreoffice')
+    if not soffice:
+        raise RuntimeError(f"LibreOffice (soffice) requis pour convertir {Path(path).suffix}")
+    target = {'.doc': 'docx', '.ppt': 'pptx', '.xls': 'xlsx'}[Path(path).suffix.lower()]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        subprocess.run(
+            [soffice, '--headless', '--convert-to', target, '--outdir', tmp_dir, str(path)],
+            check=True, capture_output=True, timeout=300
+        )
+        converted = Path(tmp_dir) / f"{Path(path).stem}.{target}"
+        return EXTRACTORS[f".{target}"](converted)
+
+
+def extract_xls_any(path):
+    try:
+        return extract_xls(path)
+    except ImportError:
+        return extract_legacy(path)
+
+
+EXTRACTORS = {
+    '.docx': extract_docx,
+    '.xlsx': extract_xlsx,
+    '.pptx': extract_pptx,
+    '.xls': extract_xls_any,
+    '.doc': extract_legacy,
+    '.ppt': extract_legacy,
+}
+
+
+def extract_file(path):
+    """Exécuté dans un processus du pool: retourne (chemin, pages, erreur)"""
+    try:
+        return str(path), EXTRACTORS[Path(path).suffix.lower()](path), None
+    except Exception as e:
+        return str(path), None, str(e)
+
+
+class OfficeExtractor:
+    """Extraction du texte et des tableaux des fichiers Office téléchargés (dossier Doc/).
+
+    Les fichiers sont traités dans un pool de processus; chaque page (diapositive, feuille,
+    document Word) est écrite comme les pages PDF: `<nom>_page_<n>.txt` précédé de
+    "Document ID". Un manifeste (office_manifest.json) mémorise l'empreinte de chaque fichier
+    pour ne pas retraiter un fichier inchangé.
+    """
+
+    def __init__(self, input_dir, output_dir, workers=None, on_page_saved=None):
+        self.input_dir = Path(input_dir)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.on_page_saved = on_page_saved
+        self.manifest_path = self.output_dir / "office_manifest.json"
+        self.manifest = self.load_manifest()
+        self.manifest_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def load_manifest(self):
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save_manifest(self):
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def list_files(self):
+        return sorted(
+            path for path in self.input_dir.glob('*') if path.suffix.lower() in OFFICE_EXTENSIONS
+        )
+
+    def is_unchanged(self, path, file_hash):
+        entry = self.manifest.get(path.name)
+        return bool(entry) and entry['hash'] == file_hash and all(
+            (self.output_dir / name).exists() for name in entry['outputs']
+        )
+
+    def write_pages(self, path, file_hash, pages):
+        """Écrit les pages d'un fichier et met à jour le manifeste"""
+        document_name = path.stem
+        outputs = []
+        for page_num, content in enumerate(pages, 1):
+            if not content.strip():
+                continue
+            output_file_name = self.output_dir / f"{document_name}_page_{page_num}.txt"
+            # Écriture atomique: le fichier peut être relié à un artefact d'un run précédent
+            tmp_file_name = output_file_name.with_name(output_file_name.name + '.tmp')
+            with open(tmp_file_name, 'w', encoding='utf-8') as f:
+                f.write(f"Document ID: {document_name}\n\n{content}")
+            os.replace(tmp_file_name, output_file_name)
+            outputs.append(output_file_name)
+            if self.on_page_saved:
+                self.on_page_saved(output_file_name)
+
+        # Pages d'une version précédente plus longue du fichier
+        previous = self.manifest.get(path.name, {}).get('outputs', [])
+        for name in set(previous) - {output.name for output in outputs}:
+            (self.output_dir / name).unlink(missing_ok=True)
+
+        self.manifest[path.name] = {"hash": file_hash, "outputs": [output.name for output in outputs]}
+        self.logger.info(f"{path.name}: {len(outputs)} pages extraites")
+        return outputs
+
+    def process_file(self, path):
+        """Traite un fichier dans le processus courant (mode flux); retourne les pages écrites"""
+        path = Path(path)
+        file_hash = self.hash_file(path)
+        if self.is_unchanged(path, file_hash):
+            return [self.output_dir / name for name in self.manifest[path.name]['outputs']]
+        _, pages, error = extract_file(path)
+        if error:
+            self.logger.error(f"Erreur extraction {path.name}: {error}")
+            return []
+        # Plusieurs workers du mode flux partagent le manifeste
+        with self.manifest_lock:
+            outputs = self.write_pages(path, file_hash, pages)
+            self.save_manifest()
+        return outputs
+
+    def process_all_files(self):
+        """Traite tous les fichiers Office modifiés dans un pool de processus"""
+        files = self.list_files()
+        hashes = {}
+        pending = []
+        for path in files:
+            hashes[path] = self.hash_file(path)
+            if not self.is_unchanged(path, hashes[path]):
+                pending.append(path)
+
+        self.logger.info(
+            f"Fichiers Office: {len(pending)} à traiter, {len(files) - len(pending)} inchangés"
+        )
+        successful = 0
+        if pending:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(pending))) as executor:
+                futures = [executor.submit(extract_file, path) for path in pending]
+                for future in as_completed(futures):
+                    path, pages, error = future.result()
+                    path = Path(path)
+                    if error:
+                        self.logger.error(f"Erreur extraction {path.name}: {error}")
+                        continue
+                    self.write_pages(path, hashes[path], pages)
+                    successful += 1
+            self.save_manifest()
+
+        self.logger.info(f"Terminé. {successful}/{len(pending)} fichiers Office traités")
+        return successful
+
+
+def main():
+    # Configuration
+    input_directory = "Doc"
+    output_directory = "output"
+
+    try:
+        extractor = OfficeExtractor(input_directory, output_directory)
+        extractor.process_all_files()
+
+    except Exception as e:
+        logging.error(f"Erreur principale: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
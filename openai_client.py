@@ -0,0 +1,218 @@
+import asyncio
+import email.utils
+import functools
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, deque
+import requests
+from requests.adapters import HTTPAdapter
+from rate_limiter import RateLimitScheduler
+from tracing import tracer
+
+# Statuts pour lesquels une nouvelle tentative a du sens
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULT_BASE_URL = 'https://api.openai.com/v1'
+
+
+class OpenAIClient:
+    """Client HTTP partagé pour l'API OpenAI.
+
+    Une seule session requests avec un pool de connexions keep-alive sert toutes les étapes
+    (structuration PDF, contextualisation, embeddings): plus de connexion TCP+TLS par appel.
+    Les erreurs 429/5xx et les coupures réseau sont retentées avec un délai aléatoire
+    (jitter) qui respecte l'en-tête Retry-After quand il est présent. Sauf si rate_limits
+    vaut False, chaque appel passe par un RateLimitScheduler commun qui répartit les quotas
+    RPM/TPM de l'organisation entre les étapes. Les percentiles de latence portent sur les
+    latency_window derniers appels de chaque endpoint; nombre d'appels, moyenne et maximum sur tous.
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, pool_size=20,
+                 connect_timeout=10, read_timeout=60, max_retries=5, backoff_factor=1.0,
+                 max_backoff=60, rate_limits=None, latency_window=10000):
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.logger = logging.getLogger(__name__)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        })
+
+        # Métriques par endpoint
+        self.metrics_lock = threading.Lock()
+        self.latencies = defaultdict(lambda: deque(maxlen=latency_window))
+        self.latency_totals = defaultdict(float)
+        self.latency_max = defaultdict(float)
+        self.counters = defaultdict(int)
+
+        # Limites inconnues (None) = apprises depuis les en-têtes x-ratelimit-*
+        self.scheduler = None
+        if rate_limits is not False:
+            self.scheduler = RateLimitScheduler(**(rate_limits or {}))
+
+    def post(self, path, payload, timeout=None, priority=None):
+        """POST JSON avec retries; lève une exception si toutes les tentatives échouent"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        timeout = (self.connect_timeout, timeout or self.read_timeout)
+        estimated = self.scheduler.estimate_tokens(payload) if self.scheduler else 0
+
+        for attempt in range(self.max_retries + 1):
+            if self.scheduler:
+                with tracer.span('api.rate_limit_wait', priority=priority):
+                    self.scheduler.acquire(priority, estimated)
+            start = time.perf_counter()
+            try:
+                response = self.session.post(url, json=payload, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.record(path, time.perf_counter() - start, 'network_errors')
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_delay(attempt)
+                self.logger.warning(f"Erreur réseau sur {path} ({str(e)}), nouvelle tentative dans {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            self.record(path, time.perf_counter() - start, f"status_{response.status_code}")
+            if self.scheduler:
+                self.scheduler.update_from_headers(response.headers)
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self.retry_delay(attempt, response)
+                self.logger.warning(
+                    f"Statut {response.status_code} sur {path}, nouvelle tentative dans {delay:.1f}s"
+                )
+                with self.metrics_lock:
+                    self.counters[f"{path}:retries"] += 1
+                if self.scheduler and response.status_code == 429:
+                    # Tous les appels en attente reculent, pas seulement celui-ci
+                    self.scheduler.pause(delay)
+                    continue
+                time.sleep(delay)
+                continue
+
+            response.raise_for_status()
+            result = response.json()
+            if self.scheduler:
+                self.scheduler.reconcile(estimated, result.get('usage', {}).get('total_tokens'))
+            return result
+
+    def retry_delay(self, attempt, response=None):
+        """Délai avant nouvelle tentative: Retry-After si fourni, sinon backoff exponentiel avec jitter"""
+        if response is not None:
+            retry_after_ms = response.headers.get('retry-after-ms')
+            if retry_after_ms:
+                try:
+                    return float(retry_after_ms) / 1000
+                except ValueError:
+                    pass
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return float(retry_after)
+                except ValueError:
+                    try:
+                        retry_date = email.utils.parsedate_to_datetime(retry_after)
+                        return max(0.0, retry_date.timestamp() - time.time())
+                    except (TypeError, ValueError):
+                        pass
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    def record(self, path, latency, outcome):
+        """Enregistre la latence d'un appel et son résultat"""
+        with self.metrics_lock:
+            self.latencies[path].append(latency)
+            self.latency_totals[path] += latency
+            self.latency_max[path] = max(self.latency_max[path], latency)
+            self.counters[f"{path}:calls"] += 1
+            self.counters[f"{path}:{outcome}"] += 1
+        tracer.add_span(f"api.{path}", time.perf_counter() - latency, latency, outcome=outcome)
+
+    def chat_completion(self, payload, timeout=None, priority=None):
+        """Appel /chat/completions"""
+        return self.post('chat/completions', payload, timeout=timeout, priority=priority)
+
+    def embeddings(self, payload, timeout=None, priority='embedding'):
+        """Appel /embeddings"""
+        return self.post('embeddings', payload, timeout=timeout, priority=priority)
+
+    async def achat_completion(self, payload, timeout=None, priority=None):
+        """Version asynchrone de chat_completion (exécutée dans le pool de threads par défaut)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.chat_completion, payload, timeout, priority)
+        )
+
+    async def aembeddings(self, payload, timeout=None, priority='embedding'):
+        """Version asynchrone de embeddings"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.embeddings, payload, timeout, priority)
+        )
+
+    def metrics(self):
+        """Statistiques de latence (secondes) et compteurs par endpoint"""
+        with self.metrics_lock:
+            summary = {}
+            for path, values in self.latencies.items():
+                ordered = sorted(values)
+                calls = self.counters[f"{path}:calls"]
+                summary[path] = {
+                    "calls": calls,
+                    "mean": self.latency_totals[path] / calls,
+                    "p50": ordered[len(ordered) // 2],
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "max": self.latency_max[path],
+                    **{
+                        key.split(':', 1)[1]: count
+                        for key, count in self.counters.items()
+                        if key.startswith(f"{path}:") and key != f"{path}:calls"
+                    }
+                }
+            return summary
+
+    def log_metrics(self):
+        """Journalise les statistiques de latence"""
+        for path, stats in self.metrics().items():
+            self.logger.info(
+                f"API {path}: {stats['calls']} appels, moyenne {stats['mean'] * 1000:.0f}ms, "
+                f"p50 {stats['p50'] * 1000:.0f}ms, p95 {stats['p95'] * 1000:.0f}ms, "
+                f"retries {stats.get('retries', 0)}"
+            )
+        if self.scheduler:
+            self.scheduler.log_summary()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key, **options):
+    """Retourne le client partagé pour une clé API et des options (URL, pool, timeouts, retries...).
+
+    Les mêmes options donnent le même client; d'autres options donnent un autre client, avec
+    son propre pool de connexions et son propre ordonnanceur de quotas.
+    """
+    options = {name: value for name, value in options.items() if value is not None}
+    key = (api_key, json.dumps(options, sort_keys=True, default=str))
+    with _clients_lock:
+        if key not in _clients:
+            base_url = (options.get('base_url') or DEFAULT_BASE_URL).rstrip('/')
+            if any(client_key == api_key and client.base_url == base_url
+                   for (client_key, _), client in _clients.items()):
+                logging.getLogger(__name__).warning(
+                    f"Client OpenAI supplémentaire pour {base_url} avec d'autres options: "
+                    f"les quotas ne sont pas partagés avec le client existant"
+                )
+            _clients[key] = OpenAIClient(api_key, **options)
+        return _clients[key]
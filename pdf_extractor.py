@@ -7,22 +7,35 @@ import numpy as np
 import cv2
 from PIL import Image
 import pypdf
-import requests
 import time
+import threading
+from openai_client import get_client
+from table_extractor import TableExtractor, words_from_pypdf, words_from_ocr
+from tracing import tracer, traced
 
 class PDFExtractor:
-    def __init__(self, input_dir, output_dir, openai_api_key):
+    def __init__(self, input_dir, output_dir, openai_api_key, on_page_saved=None, client=None,
+                 base_url=None, options=None):
         # Configuration des chemins
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        # Callback appelé avec le chemin de chaque page structurée écrite (mode flux)
+        self.on_page_saved = on_page_saved
         
-        # Configuration OpenAI
+        # Configuration OpenAI (client HTTP partagé entre les étapes; base_url permet de viser
+        # un serveur compatible, par exemple mock_openai_server.py)
         self.openai_api_key = openai_api_key
-        self.headers = {
-            "Authorization": f"Bearer {openai_api_key}",
-            "Content-Type": "application/json"
-        }
+        self.client = client or get_client(openai_api_key, base_url=base_url)
+
+        # Options (section "pdf_options"); les pages de tableaux de spécifications sont
+        # structurées sans GPT quand l'extraction déterministe est fiable
+        self.options = options or {}
+        table_options = dict(self.options.get('table_extraction') or {})
+        self.table_extractor = None
+        if table_options.pop('enabled', True):
+            self.table_extractor = TableExtractor(**table_options)
         
         # Dossier temporaire
         self.temp_dir = Path("temp_images")
@@ -58,26 +71,31 @@ class PDFExtractor:
         )
         return binary
 
-    def extract_text_with_ocr(self, pdf_path):
-        """Extraction texte par OCR"""
+    @traced('pdf.ocr')
+    def extract_text_with_ocr(self, pdf_path, ocr_words=None, word_pages=None):
+        """Extraction texte par OCR (ocr_words: dict à remplir avec les boîtes des mots des
+        pages word_pages, ou de toutes les pages si word_pages est None)"""
         try:
-            images = convert_from_path(pdf_path)
+            with tracer.span('pdf.rasterize', pdf=pdf_path):
+                images = convert_from_path(pdf_path)
             ocr_texts = []
 
             for i, image in enumerate(images, 1):
                 self.logger.info(f"OCR page {i}/{len(images)}")
                 
-                temp_path = self.temp_dir / f"temp_{i}.png"
+                # Nom propre au thread: plusieurs PDFs peuvent être traités en parallèle
+                temp_path = self.temp_dir / f"temp_{threading.get_ident()}_{i}.png"
                 image.save(temp_path)
                 
                 img = cv2.imread(str(temp_path))
                 processed_img = self.preprocess_image(img)
                 
-                text = pytesseract.image_to_string(
-                    processed_img,
-                    lang='fra+eng',
-                    config='--psm 1'
-                )
+                with tracer.span('pdf.tesseract', page=i):
+                    text = pytesseract.image_to_string(
+                        processed_img,
+                        lang='fra+eng',
+                        config='--psm 1'
+                    )
                 
                 if len(text.strip()) < 100:
                     text = pytesseract.image_to_string(
@@ -87,6 +105,9 @@ class PDFExtractor:
                     )
                 
                 ocr_texts.append(text)
+                if ocr_words is not None and (word_pages is None or i - 1 in word_pages):
+                    with tracer.span('pdf.tesseract_words', page=i):
+                        ocr_words[i - 1] = words_from_ocr(processed_img)
                 temp_path.unlink(missing_ok=True)
 
             return ocr_texts
@@ -94,20 +115,26 @@ class PDFExtractor:
             self.logger.error(f"Erreur OCR: {str(e)}")
             return None
 
-    def extract_text_with_pypdf(self, pdf_path):
-        """Extraction texte avec PyPDF"""
+    @traced('pdf.text_layer')
+    def extract_text_with_pypdf(self, pdf_path, page_words=None):
+        """Extraction texte avec PyPDF (page_words: liste à remplir avec les mots positionnés)"""
         try:
             text_content = []
             with open(pdf_path, 'rb') as file:
                 reader = pypdf.PdfReader(file)
                 for page in reader.pages:
-                    text = page.extract_text() or ''
+                    if page_words is not None:
+                        text, words = words_from_pypdf(page)
+                        page_words.append(words)
+                    else:
+                        text = page.extract_text() or ''
                     text_content.append(text)
             return text_content
         except Exception as e:
             self.logger.error(f"Erreur PyPDF: {str(e)}")
             return None
 
+    @traced('pdf.structuring')
     def process_with_gpt(self, content):
         """Traitement du contenu avec GPT-4 pour structurer le texte en Markdown"""
         system_prompt = {
@@ -170,31 +197,57 @@ class PDFExtractor:
                 "presence_penalty": 0
             }
 
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers=self.headers,
-                json=payload,
-                timeout=60
-            )
-            response.raise_for_status()
-            processed_content = response.json()['choices'][0]['message']['content']
+            response = self.client.chat_completion(payload, timeout=60, priority='structuring')
+            processed_content = response['choices'][0]['message']['content']
             
-            time.sleep(1)
+            # Sans ordonnanceur, pause fixe pour éviter les limites de taux de l'API
+            if not self.client.scheduler:
+                time.sleep(1)
             
             return processed_content
         except Exception as e:
             self.logger.error(f"Erreur GPT: {str(e)}")
             return None
 
+    @traced('pdf.tables')
+    def extract_tables(self, words, document_name):
+        """Structure une page de tableaux sans GPT; None si l'extraction n'est pas fiable"""
+        try:
+            return self.table_extractor.extract_page(words, title=document_name)
+        except Exception as e:
+            self.logger.error(f"Erreur extraction des tableaux: {str(e)}")
+            return None
+
+    @traced('pdf.file')
     def process_pdf(self, pdf_path):
         """Traitement complet d'un PDF"""
         document_name = pdf_path.stem
         
         self.logger.info(f"Traitement de {pdf_path}")
+        tracer.count('pdf.files')
+        tracer.count('pdf.bytes_in', pdf_path.stat().st_size)
         
-        # Extraction de texte (OCR + PyPDF)
-        ocr_texts = self.extract_text_with_ocr(pdf_path) or []
-        pypdf_texts = self.extract_text_with_pypdf(pdf_path) or []
+        # Extraction de texte (PyPDF puis OCR), avec les positions des mots si les tableaux
+        # sont extraits sans GPT
+        page_words = [] if self.table_extractor else None
+        pypdf_texts = self.extract_text_with_pypdf(pdf_path, page_words) or []
+        tables = {}
+        if self.table_extractor:
+            for page_num, words in enumerate(page_words):
+                tables[page_num] = self.extract_tables(words, document_name)
+
+        # L'OCR n'est utile que si une page n'a pas été structurée depuis la couche texte;
+        # les pages sans couche texte sont aussi tentées sur les boîtes des mots OCR
+        ocr_texts = []
+        if not pypdf_texts or not all(tables.get(page_num) for page_num in range(len(pypdf_texts))):
+            ocr_words = {} if self.table_extractor else None
+            word_pages = None
+            if pypdf_texts and self.table_extractor:
+                word_pages = {page_num for page_num, words in enumerate(page_words) if not words}
+            ocr_texts = self.extract_text_with_ocr(pdf_path, ocr_words, word_pages) or []
+            for page_num, words in (ocr_words or {}).items():
+                if not tables.get(page_num):
+                    tables[page_num] = self.extract_tables(words, document_name)
         
         # Déterminer le nombre de pages
         num_pages = max(len(ocr_texts), len(pypdf_texts))
@@ -202,24 +255,37 @@ class PDFExtractor:
         # Pour chaque page, combiner OCR et PyPDF
         for page_num in range(num_pages):
             self.logger.info(f"Traitement de la page {page_num + 1}")
-            
-            # Combiner les textes des deux méthodes
-            page_text = ""
-            if page_num < len(ocr_texts):
-                page_text += ocr_texts[page_num] + "\n\n"
-            if page_num < len(pypdf_texts):
-                page_text += pypdf_texts[page_num]
-            
-            # Traiter le texte avec GPT
-            processed_content = self.process_with_gpt(page_text)
+
+            if tables.get(page_num):
+                # Tableau de spécifications structuré directement, sans appel à GPT
+                processed_content = tables[page_num]
+                tracer.count('pdf.pages_table')
+                self.logger.info(f"Page {page_num + 1} structurée depuis ses tableaux")
+            else:
+                # Combiner les textes des deux méthodes
+                page_text = ""
+                if page_num < len(ocr_texts):
+                    page_text += ocr_texts[page_num] + "\n\n"
+                if page_num < len(pypdf_texts):
+                    page_text += pypdf_texts[page_num]
+
+                # Traiter le texte avec GPT
+                processed_content = self.process_with_gpt(page_text)
             
             if processed_content:
                 # Sauvegarder le résultat
                 output_file_name = self.output_dir / f"{document_name}_page_{page_num + 1}.txt"
                 try:
-                    with open(output_file_name, 'w', encoding='utf-8') as f:
+                    # Écriture atomique: le fichier peut être relié à un artefact d'un run précédent
+                    tmp_file_name = output_file_name.with_name(output_file_name.name + '.tmp')
+                    with open(tmp_file_name, 'w', encoding='utf-8') as f:
                         f.write(f"Document ID: {document_name}\n\n{processed_content}")
+                    os.replace(tmp_file_name, output_file_name)
+                    tracer.count('pdf.pages')
+                    tracer.count('pdf.bytes_out', output_file_name.stat().st_size)
                     self.logger.info(f"Fichier créé: {output_file_name}")
+                    if self.on_page_saved:
+                        self.on_page_saved(output_file_name)
                 except Exception as e:
                     self.logger.error(f"Erreur sauvegarde page {page_num + 1}: {str(e)}")
         
@@ -238,9 +304,11 @@ class PDFExtractor:
             if self.process_pdf(pdf_path):
                 successful += 1
             
-            time.sleep(2)
+            if not self.client.scheduler:
+                time.sleep(2)
         
         self.logger.info(f"Terminé. {successful}/{total_files} fichiers traités")
+        self.client.log_metrics()
 
 def main():
     # Configuration
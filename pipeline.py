@@ -1,13 +1,36 @@
 import os
+import functools
+from contextlib import ExitStack
 from datetime import datetime
-from crawler import WebCrawler
-from pdf_extractor import PDFExtractor
-from embedding_processor import EmbeddingProcessor
+from pathlib import Path
+from artifact_store import ArtifactStore, collect_outputs
+from tracing import tracer, profile
 import logging
 
+# Les modules des étapes (crawler, pdf_extractor, embedding_processor) et leurs dépendances
+# lourdes (cv2, pytesseract, numpy, BeautifulSoup...) sont importés uniquement par l'étape
+# qui les utilise, pour qu'une commande partielle ou --help démarre rapidement.
+
+
+def pipeline_stage(name):
+    """Décorateur d'étape: span de trace, profil cProfile optionnel et export de la trace"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with ExitStack() as stack:
+                stack.enter_context(tracer.span(f"pipeline.{name}"))
+                if self.options.get('profile'):
+                    stack.enter_context(profile(name, self.dirs['logs']))
+                try:
+                    return method(self, *args, **kwargs)
+                finally:
+                    self.save_trace()
+        return wrapper
+    return decorator
+
 
 class Pipeline:
-    def __init__(self, start_url, openai_api_key, options=None):
+    def __init__(self, start_url=None, openai_api_key=None, options=None):
         self.start_url = start_url
         self.openai_api_key = openai_api_key
         self.options = options or {}
@@ -22,9 +45,23 @@ class Pipeline:
         # Création des sous-dossiers
         self.create_directories()
 
+        # Store d'artefacts partagé entre les runs (réutilisation des étapes inchangées)
+        self.artifacts = None
+        if self.options.get('artifact_reuse', True):
+            self.artifacts = ArtifactStore(
+                os.path.join(self.options.get('output_dir', 'pipeline_output'), 'artifacts')
+            )
+
         # Configuration du logging
         self.setup_logging()
 
+        # Trace des étapes (True: <logs>/trace.json, ou chemin explicite)
+        self.trace_path = None
+        if self.options.get('trace'):
+            trace = self.options['trace']
+            self.trace_path = trace if isinstance(trace, str) else os.path.join(self.dirs['logs'], 'trace.json')
+            tracer.enable()
+
     def create_directories(self):
         """Crée la structure de dossiers nécessaire"""
         self.dirs = {
@@ -49,52 +86,417 @@ class Pipeline:
             ]
         )
 
-    def run(self, skip_crawling=False, skip_pdf=False, skip_embedding=False):
-        """Exécute le pipeline complet avec options pour sauter des étapes"""
+    def save_trace(self):
+        """Écrit la trace collectée jusqu'ici (réécrite à la fin de chaque étape)"""
+        if not self.trace_path:
+            return
         try:
-            crawler_pdf_dir = None
-            crawler_content_dir = None
+            tracer.save(self.trace_path)
+            tracer.log_summary()
+            logging.info(f"Trace enregistrée: {self.trace_path}")
+        except Exception as e:
+            logging.error(f"Erreur lors de l'écriture de la trace: {str(e)}")
+
+    def api_client(self):
+        """Client OpenAI partagé par toutes les étapes du run"""
+        from openai_client import get_client
+        return get_client(self.openai_api_key, **(self.options.get('api_options') or {}))
+
+    def embedding_options(self):
+        """Options d'embedding, avec un cache partagé entre les runs"""
+        options = dict(self.options.get('embedding_options') or {})
+        # "cache_path": null dans la configuration vaut absence de chemin, pas cache en mémoire
+        if not options.get('cache_path'):
+            options['cache_path'] = os.path.join(
+                self.options.get('output_dir', 'pipeline_output'), 'embedding_cache.sqlite'
+            )
+        return options
+
+    def priority_options(self):
+        """Options de priorité du crawl, avec un historique des changements partagé entre les runs"""
+        options = dict(self.options.get('priority_options') or {})
+        # Sans chemin, le crawler écrirait l'historique dans le dossier du run, neuf à chaque fois
+        if not options.get('history_path'):
+            options['history_path'] = os.path.join(
+                self.options.get('output_dir', 'pipeline_output'), 'crawl_history.json'
+            )
+        return options
+
+    def boilerplate_options(self):
+        """Options du gabarit, avec un fichier de gabarits partagé entre les runs"""
+        options = dict(self.options.get('boilerplate_options') or {})
+        if not options.get('template_path'):
+            options['template_path'] = os.path.join(
+                self.options.get('output_dir', 'pipeline_output'), 'boilerplate.json'
+            )
+        return options
+
+    @pipeline_stage('streaming')
+    def run_streaming(self):
+        """Exécute les étapes en flux, reliées par des files bornées"""
+        from streaming import StreamingPipeline
+        try:
+            StreamingPipeline(self).run()
+        except Exception as e:
+            logging.error(f"Erreur dans le pipeline en flux: {str(e)}")
+            raise
+
+    def crawl_key(self):
+        """Clé d'artefact du crawl: URL de départ et paramètres d'exploration"""
+        return self.artifacts.key('crawl', [self.start_url] + self.options.get('start_urls', []), {
+            'max_depth': self.options.get('max_depth', 2),
+            'crawler_options': self.options.get('crawler_options'),
+            'excluded_paths': self.options.get('excluded_paths'),
+            'boilerplate_options': self.options.get('boilerplate_options'),
+            'download_options': self.options.get('download_options'),
+            'priority_options': self.options.get('priority_options'),
+            'crawl_budget': self.options.get('crawl_budget')
+        })
+
+    def reuse_previous_crawl(self):
+        """Relie dans ce run la sortie du dernier crawl de la même URL.
+
+        La clé ne dépend que de l'URL et des options: un crawl plus ancien que crawl_max_age_days
+        (null: sans limite) n'est pas réutilisé, le site ayant pu changer depuis.
+        """
+        manifest = self.artifacts.lookup('crawl', self.crawl_key()) if self.artifacts else None
+        if not manifest:
+            logging.warning("Aucun crawl précédent trouvé pour cette URL, dossier de crawl vide.")
+            return
+        created = datetime.strptime(manifest['created'], '%Y-%m-%d %H:%M:%S')
+        age_days = (datetime.now() - created).total_seconds() / 86400
+        max_age_days = self.options.get('crawl_max_age_days')
+        if max_age_days is not None and age_days > max_age_days:
+            logging.warning(
+                f"Crawl du {manifest['created']} trop ancien ({age_days:.1f} jours, maximum "
+                f"{max_age_days}): non réutilisé, dossier de crawl vide. Relancez sans --skip-crawling."
+            )
+            return
+        self.artifacts.materialize(manifest, self.dirs['crawler'])
+        logging.info(
+            f"Crawl du {manifest['created']} ({age_days:.1f} jours) réutilisé: "
+            f"{len(manifest['outputs'])} fichiers reliés"
+        )
+
+    def pdf_key(self, pdf_path):
+        """Clé d'artefact d'un PDF: son contenu et les options d'extraction"""
+        return self.artifacts.key('pdf', [self.artifacts.hash_file(pdf_path)], self.options.get('pdf_options'))
+
+    def office_key(self, file_hash):
+        """Clé d'artefact d'un fichier Office: son empreinte et les options d'extraction"""
+        return self.artifacts.key('office', [file_hash], self.options.get('office_options') or {})
+
+    @staticmethod
+    def embedding_config(options):
+        """Options qui déterminent le contenu du store (hors chemin du cache, reprise et mode)"""
+        return {k: v for k, v in options.items() if k not in ('cache_path', 'resume', 'incremental')}
+
+    def embedding_key(self, content_dir, options):
+        """Clé d'artefact des embeddings: pages de contenu et options"""
+        inputs = [
+            [path.name, self.artifacts.hash_file(path)] for path in sorted(Path(content_dir).glob('*.txt'))
+        ]
+        return self.artifacts.key('embedding', inputs, self.embedding_config(options))
+
+    def embedding_lineage(self, content_dir, options):
+        """Source d'un store d'embeddings: URLs de départ du site (ou dossier d'entrée de la
+        commande embed) et options; seul le dernier store de la même source sert de base"""
+        if self.start_url:
+            sources = [self.start_url] + self.options.get('start_urls', [])
+        else:
+            sources = [str(Path(content_dir).resolve())]
+        return self.artifacts.key('embedding-lineage', sources, self.embedding_config(options))
+
+    def record_crawl(self, crawler_dir, content_pages=None):
+        """Enregistre la sortie d'un crawl dans le store d'artefacts.
+
+        content_pages restreint le contenu aux pages écrites par le crawler (mode flux, où les
+        extracteurs écrivent dans le même dossier pendant le crawl).
+        """
+        outputs = {}
+        for directory in ['content', 'PDF', 'Image', 'Doc']:
+            outputs.update({
+                f"{directory}/{name}": path
+                for name, path in collect_outputs(os.path.join(crawler_dir, directory)).items()
+            })
+        if content_pages is not None:
+            outputs = {name: path for name, path in outputs.items() if not name.startswith('content/')}
+            outputs.update({f"content/{Path(page).name}": page for page in content_pages if Path(page).exists()})
+        self.artifacts.record('crawl', self.crawl_key(), outputs)
+
+    def record_embeddings(self, key, output_dir, lineage=None):
+        """Enregistre le store d'embeddings complet (avant dédoublonnage) dans le store d'artefacts"""
+        from lexical_index import LEXICAL_FILES
+        from quantization import INT8_FILES
+        outputs = {
+            name: Path(output_dir) / name
+            for name in ['chunks.json', 'embeddings.npy'] + INT8_FILES + LEXICAL_FILES
+            if (Path(output_dir) / name).exists()
+        }
+        if outputs:
+            self.artifacts.record('embedding', key, outputs, lineage=lineage)
+
+    def previous_embeddings(self, output_dir, lineage):
+        """Base du mode mise à jour: relie dans output_dir le dernier store de la même source.
+
+        Un dossier de sortie qui n'est pas vide n'est jamais modifié: son propre store (s'il
+        en a un) sert de base. Retourne True si un store a été relié.
+        """
+        output_dir = Path(output_dir)
+        if output_dir.exists() and any(path.name != 'checkpoint.jsonl' for path in output_dir.iterdir()):
+            return False
+        previous = self.artifacts.latest('embedding', lineage) if self.artifacts else None
+        if not previous:
+            return False
+        self.artifacts.materialize(previous, output_dir)
+        logging.info(f"Store d'embeddings du {previous['created']} relié comme base de la mise à jour")
+        return True
+
+    def process_pdfs(self, pdf_dir, content_dir):
+        """Traite les PDFs en réutilisant les pages structurées des PDFs déjà vus"""
+        from pdf_extractor import PDFExtractor
+
+        pages = []
+        pdf_extractor = PDFExtractor(
+            input_dir=pdf_dir,
+            output_dir=content_dir,
+            openai_api_key=self.openai_api_key,
+            on_page_saved=pages.append,
+            client=self.api_client(),
+            options=self.options.get('pdf_options')
+        )
+        if not self.artifacts:
+            pdf_extractor.process_all_pdfs()
+            return
+
+        reused = 0
+        pdf_files = sorted(Path(pdf_dir).glob('*.pdf'))
+        for pdf_path in pdf_files:
+            key = self.pdf_key(pdf_path)
+            manifest = self.artifacts.lookup('pdf', key)
+            if manifest:
+                self.artifacts.materialize(manifest, content_dir)
+                reused += 1
+                continue
 
+            pages.clear()
+            pdf_extractor.process_pdf(pdf_path)
+            if pages:
+                self.artifacts.record('pdf', key, {Path(page).name: page for page in pages})
+
+        logging.info(f"PDFs: {reused}/{len(pdf_files)} réutilisés depuis les runs précédents")
+
+    def process_office(self, doc_dir, content_dir):
+        """Extrait les fichiers Office en réutilisant les pages des fichiers déjà vus"""
+        from office_extractor import OfficeExtractor
+
+        office_options = self.options.get('office_options') or {}
+        office_extractor = OfficeExtractor(
+            input_dir=doc_dir,
+            output_dir=content_dir,
+            workers=office_options.get('workers')
+        )
+        if not self.artifacts:
+            office_extractor.process_all_files()
+            return
+
+        # Les fichiers déjà extraits dans un run précédent sont reliés; les autres passent
+        # par le pool de processus de l'extracteur
+        keys = {}
+        files = office_extractor.list_files()
+        for path in files:
+            file_hash = self.artifacts.hash_file(path)
+            key = self.office_key(file_hash)
+            manifest = self.artifacts.lookup('office', key)
+            if manifest:
+                self.artifacts.materialize(manifest, content_dir)
+                office_extractor.manifest[path.name] = {
+                    "hash": file_hash, "outputs": sorted(manifest['outputs'])
+                }
+            else:
+                keys[path.name] = key
+
+        reused = len(files) - len(keys)
+        office_extractor.process_all_files()
+        for name, key in keys.items():
+            entry = office_extractor.manifest.get(name)
+            if entry and entry['outputs']:
+                self.artifacts.record('office', key, {
+                    output: Path(content_dir) / output for output in entry['outputs']
+                })
+        logging.info(f"Fichiers Office: {reused} réutilisés depuis les runs précédents")
+
+    def create_embeddings(self, content_dir, output_dir, update=None, resume=None):
+        """Crée les embeddings, en ne recalculant que les chunks dont le contenu a changé"""
+        from embedding_processor import EmbeddingProcessor
+
+        options = self.embedding_options()
+        embedding_processor = EmbeddingProcessor(
+            input_dir=content_dir,
+            output_dir=output_dir,
+            openai_api_key=self.openai_api_key,
+            options=options,
+            client=self.api_client()
+        )
+        if not self.artifacts:
+            embedding_processor.process_all_files(update=update, resume=resume)
+            return
+
+        key = self.embedding_key(content_dir, options)
+        manifest = self.artifacts.lookup('embedding', key)
+        if manifest:
+            self.artifacts.materialize(manifest, output_dir)
+            logging.info("Contenu inchangé depuis un run précédent, embeddings réutilisés.")
+            return
+
+        # En mode mise à jour (incremental ou --update), le dernier store de la même source sert
+        # de base: seuls les chunks nouveaux ou modifiés sont calculés
+        lineage = self.embedding_lineage(content_dir, options)
+        if update is None:
+            update = options.get('incremental', False)
+        if update:
+            self.previous_embeddings(output_dir, lineage)
+        embedding_processor.process_all_files(update=update, resume=resume)
+        self.record_embeddings(key, output_dir, lineage=lineage)
+
+    @pipeline_stage('crawl')
+    def run_crawler(self, custom_start_url=None):
+        """Étape 1: crawl du site et enregistrement de sa sortie dans le store d'artefacts"""
+        from crawler import WebCrawler
+
+        if custom_start_url:
+            self.start_url = custom_start_url
+        if not self.start_url:
+            raise ValueError("Aucune URL de départ fournie pour le crawling")
+
+        logging.info("Démarrage du crawling...")
+        start_urls = [self.start_url] + self.options.get('start_urls', [])
+        workers = self.options.get('crawl_workers', 1)
+        if len(start_urls) > 1 or workers > 1:
+            # Plusieurs racines ou workers: frontière partagée entre processus
+            from distributed_crawler import DistributedCrawler
+            crawler = DistributedCrawler(
+                start_urls,
+                max_depth=self.options.get('max_depth', 2),
+                base_dir=self.dirs['crawler'],
+                workers=workers,
+                download_options=self.options.get('download_options'),
+                boilerplate_options=self.boilerplate_options(),
+                crawl_budget=self.options.get('crawl_budget'),
+                frontier_options=self.options.get('frontier_options'),
+                priority_options=self.priority_options()
+            )
+        else:
+            crawler = WebCrawler(
+                start_url=self.start_url,
+                max_depth=self.options.get('max_depth', 2),
+                base_dir=self.dirs['crawler'],
+                frontier_options=self.options.get('frontier_options'),
+                boilerplate_options=self.boilerplate_options(),
+                download_options=self.options.get('download_options'),
+                priority_options=self.priority_options(),
+                crawl_budget=self.options.get('crawl_budget')
+            )
+        crawler.crawl()
+
+        if self.artifacts:
+            self.record_crawl(crawler.base_dir)
+        return crawler.base_dir
+
+    @pipeline_stage('pdf')
+    def run_pdf_processor(self, input_dir=None, output_dir=None):
+        """Étape 2: extraction et structuration des PDFs"""
+        input_dir = input_dir or os.path.join(self.dirs['crawler'], 'PDF')
+        output_dir = output_dir or os.path.join(self.dirs['crawler'], 'content')
+        if not os.path.exists(input_dir):
+            logging.info(f"Aucun dossier PDF trouvé: {input_dir}")
+            return output_dir
+
+        logging.info("Démarrage du traitement des PDFs...")
+        self.process_pdfs(input_dir, output_dir)
+        return output_dir
+
+    @pipeline_stage('office')
+    def run_office_processor(self, input_dir=None, output_dir=None):
+        """Étape 2 bis: extraction des fichiers Office (Doc/)"""
+        input_dir = input_dir or os.path.join(self.dirs['crawler'], 'Doc')
+        output_dir = output_dir or os.path.join(self.dirs['crawler'], 'content')
+        if not os.path.exists(input_dir):
+            logging.info(f"Aucun dossier Doc trouvé: {input_dir}")
+            return output_dir
+
+        logging.info("Démarrage de l'extraction des fichiers Office...")
+        self.process_office(input_dir, output_dir)
+        return output_dir
+
+    @pipeline_stage('embedding')
+    def run_embedding(self, input_dir=None, output_dir=None, update=None, resume=None):
+        """Étape 3: création des embeddings"""
+        input_dir = input_dir or os.path.join(self.dirs['crawler'], 'content')
+        output_dir = output_dir or self.dirs['embeddings']
+        if not os.path.exists(input_dir):
+            logging.info(f"Aucun dossier de contenu trouvé: {input_dir}")
+            return output_dir
+
+        logging.info("Démarrage de la création des embeddings...")
+        self.create_embeddings(input_dir, output_dir, update=update, resume=resume)
+        self.run_dedup(output_dir)
+        return output_dir
+
+    @pipeline_stage('dedup')
+    def run_dedup(self, embeddings_dir=None):
+        """Étape 4: élagage des chunks quasi identiques (après l'enregistrement de l'artefact complet)"""
+        dedup_options = dict(self.options.get('dedup_options') or {})
+        if not dedup_options.pop('enabled', False):
+            return None
+        from dedup import Deduplicator
+        try:
+            return Deduplicator(**dedup_options).deduplicate(embeddings_dir or self.dirs['embeddings'])
+        except Exception as e:
+            logging.error(f"Erreur lors du dédoublonnage des embeddings: {str(e)}")
+            return None
+
+    def run(self, skip_crawling=False, skip_pdf=False, skip_embedding=False, streaming=False,
+            skip_office=False):
+        """Exécute le pipeline complet avec options pour sauter des étapes"""
+        if streaming:
+            if skip_crawling or skip_pdf or skip_embedding or skip_office:
+                logging.warning("Mode flux ignoré: une étape sautée impose l'exécution séquentielle.")
+            else:
+                # Le crawler du mode flux appelle les étapes suivantes depuis son processus:
+                # le crawl distribué (plusieurs racines ou workers) n'y a pas sa place
+                if self.options.get('start_urls') or self.options.get('crawl_workers', 1) > 1:
+                    raise ValueError(
+                        "Le mode flux (--streaming) accepte une seule URL de départ et un seul worker de "
+                        "crawl; relancez sans --streaming pour un crawl distribué."
+                    )
+                return self.run_streaming()
+
+        try:
             # Étape 1: Crawling
             if not skip_crawling:
-                logging.info("Démarrage du crawling...")
-                crawler = WebCrawler(
-                    start_url=self.start_url,
-                    max_depth=self.options.get('max_depth', 2)
-                )
-                crawler.crawl()
-
-                # Récupération du dossier de sortie du crawler
-                crawler_pdf_dir = os.path.join(crawler.base_dir, 'PDF')
-                crawler_content_dir = os.path.join(crawler.base_dir, 'content')
+                self.run_crawler()
             else:
                 logging.info("Étape de crawling sautée.")
-                crawler_pdf_dir = os.path.join(self.dirs['crawler'], 'PDF')
-                crawler_content_dir = os.path.join(self.dirs['crawler'], 'content')
+                self.reuse_previous_crawl()
 
             # Étape 2: Traitement des PDFs
-            if not skip_pdf and crawler_pdf_dir and os.path.exists(crawler_pdf_dir):
-                logging.info("Démarrage du traitement des PDFs...")
-                pdf_extractor = PDFExtractor(
-                    input_dir=crawler_pdf_dir,
-                    output_dir=crawler_content_dir,
-                    openai_api_key=self.openai_api_key
-                )
-                pdf_extractor.process_all_pdfs()
+            if not skip_pdf:
+                self.run_pdf_processor()
+            else:
+                logging.info("Étape de traitement PDF sautée.")
+
+            # Étape 2 bis: Extraction des fichiers Office
+            if not skip_office:
+                self.run_office_processor()
             else:
-                logging.info("Étape de traitement PDF sautée ou aucun PDF trouvé.")
+                logging.info("Étape d'extraction Office sautée.")
 
             # Étape 3: Création des embeddings
-            if not skip_embedding and crawler_content_dir and os.path.exists(crawler_content_dir):
-                logging.info("Démarrage de la création des embeddings...")
-                embedding_processor = EmbeddingProcessor(
-                    input_dir=crawler_content_dir,
-                    output_dir=self.dirs['embeddings'],
-                    openai_api_key=self.openai_api_key
-                )
-                embedding_processor.process_all_files()
+            if not skip_embedding:
+                self.run_embedding()
             else:
-                logging.info("Étape de création d'embeddings sautée ou aucun contenu trouvé.")
+                logging.info("Étape de création d'embeddings sautée.")
 
             logging.info("Pipeline terminé avec succès!")
 
@@ -102,7 +504,6 @@ class Pipeline:
             logging.error(f"Erreur dans le pipeline: {str(e)}")
             raise
 
-
 if __name__ == "__main__":
     # Configuration pour test direct
     start_url = "https://www.ouellet.com/fr-ca/"
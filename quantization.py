@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+from pathlib import Path
+import numpy as np
+from vector_search import normalize_rows, top_k, merge_top_k, format_results
+
+# Fichiers de l'export int8 écrits à côté de embeddings.npy
+INT8_FILES = ['embeddings_int8.npy', 'quantization.json']
+
+
+class ScalarQuantizer:
+    """Quantification scalaire int8 par dimension (x ≈ offset + scale * code)"""
+
+    def __init__(self, scale=None, offset=None):
+        self.scale = scale
+        self.offset = offset
+
+    def fit(self, vectors, block_size=65536):
+        """Calibre les bornes min/max de chaque dimension"""
+        minimum = np.full(vectors.shape[1], np.inf, dtype=np.float32)
+        maximum = np.full(vectors.shape[1], -np.inf, dtype=np.float32)
+        for start in range(0, vectors.shape[0], block_size):
+            block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+            minimum = np.minimum(minimum, block.min(axis=0))
+            maximum = np.maximum(maximum, block.max(axis=0))
+
+        self.scale = np.maximum(maximum - minimum, 1e-12) / 255.0
+        self.offset = minimum + 128.0 * self.scale
+        return self
+
+    def encode(self, vectors):
+        """Convertit des vecteurs float en codes int8"""
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes):
+        """Reconstruit des vecteurs float32 approximatifs"""
+        return self.offset + self.scale * np.asarray(codes, dtype=np.float32)
+
+    def save(self, output_dir):
+        """Sauvegarde les paramètres de calibration"""
+        params_path = Path(output_dir) / "quantization.json"
+        tmp_path = params_path.with_name(params_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "method": "int8",
+                "normalized": True,
+                "dim": int(self.scale.shape[0]),
+                "scale": self.scale.tolist(),
+                "offset": self.offset.tolist()
+            }, f)
+        os.replace(tmp_path, params_path)
+        return params_path
+
+    @classmethod
+    def load(cls, output_dir):
+        """Charge les paramètres de calibration"""
+        with open(Path(output_dir) / "quantization.json", 'r', encoding='utf-8') as f:
+            params = json.load(f)
+        return cls(
+            scale=np.array(params['scale'], dtype=np.float32),
+            offset=np.array(params['offset'], dtype=np.float32)
+        )
+
+
+def export_int8(embeddings, output_dir, block_size=65536):
+    """Écrit embeddings_int8.npy et quantization.json à partir des embeddings float"""
+    output_dir = Path(output_dir)
+    normalized = normalize_rows(embeddings)
+    quantizer = ScalarQuantizer().fit(normalized, block_size=block_size)
+
+    # Écriture dans un fichier temporaire: la sortie précédente peut être un lien vers un artefact
+    codes_path = output_dir / "embeddings_int8.npy"
+    tmp_path = output_dir / "embeddings_int8.tmp.npy"
+    codes = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.int8, shape=normalized.shape)
+    for start in range(0, normalized.shape[0], block_size):
+        codes[start:start + block_size] = quantizer.encode(normalized[start:start + block_size])
+    codes.flush()
+    del codes
+    os.replace(tmp_path, codes_path)
+
+    quantizer.save(output_dir)
+    return codes_path
+
+
+class QuantizedIndex:
+    """Recherche cosinus sur les codes int8 (quantization.json + embeddings_int8.npy).
+
+    Le gain porte sur le stockage et les lectures: les codes sont mappés (1 octet par valeur,
+    4 fois moins que float32 sur disque et en cache de pages). Le calcul, lui, n'est pas fait en
+    entiers: numpy n'a pas de produit matriciel entier accéléré (BLAS), si bien que chaque bloc
+    de block_size lignes est élargi en float32 juste avant le produit. Un petit bloc garde cette
+    copie temporaire en cache (block_size × dim × 4 octets).
+    """
+
+    def __init__(self, embeddings_dir, block_size=4096):
+        self.embeddings_dir = Path(embeddings_dir)
+        self.block_size = block_size
+        self.logger = logging.getLogger(__name__)
+
+        self.quantizer = ScalarQuantizer.load(self.embeddings_dir)
+        self.codes = np.load(self.embeddings_dir / "embeddings_int8.npy", mmap_mode='r')
+
+        chunks_json_path = self.embeddings_dir / "chunks.json"
+        self.metadata = []
+        if chunks_json_path.exists():
+            with open(chunks_json_path, 'r', encoding='utf-8') as f:
+                self.metadata = json.load(f).get('metadata', [])
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    def search_vectors(self, queries, k=10):
+        """Top-k sur les codes: q·x ≈ q·offset + (q*scale)·code, par blocs élargis en float32"""
+        queries = normalize_rows(queries)
+        scaled = queries * self.quantizer.scale
+        bias = queries @ self.quantizer.offset
+
+        best_ids = np.empty((queries.shape[0], 0), dtype=np.int64)
+        best_scores = np.empty((queries.shape[0], 0), dtype=np.float32)
+        for start in range(0, self.codes.shape[0], self.block_size):
+            block = np.asarray(self.codes[start:start + self.block_size], dtype=np.float32)
+            scores = scaled @ block.T + bias[:, np.newaxis]
+            ids, block_scores = top_k(scores, k)
+            best_ids, best_scores = merge_top_k(best_ids, best_scores, ids + start, block_scores, k)
+        return best_ids, best_scores
+
+    def search(self, queries, k=10):
+        """Recherche top-k avec les métadonnées des chunks"""
+        ids, scores = self.search_vectors(queries, k=k)
+        return format_results(self.metadata, ids, scores)
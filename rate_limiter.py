@@ -0,0 +1,186 @@
+import heapq
+import itertools
+import logging
+import re
+import threading
+import time
+
+# Priorités par défaut (plus petit = servi en premier)
+DEFAULT_PRIORITIES = {
+    'structuring': 0,
+    'contextualization': 1,
+    'embedding': 2,
+}
+
+
+def parse_reset(value):
+    """Convertit une durée d'en-tête OpenAI ("1s", "6m0s", "20ms") en secondes"""
+    if not value:
+        return None
+    seconds = 0.0
+    for amount, unit in re.findall(r'([\d.]+)(ms|h|m|s)', value):
+        seconds += float(amount) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+    return seconds
+
+
+class TokenBucket:
+    """Budget par minute rechargé en continu; capacité inconnue = illimité"""
+
+    def __init__(self, per_minute=None):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        if self.capacity is not None:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def available(self, amount):
+        return self.capacity is None or self.level >= min(amount, self.capacity)
+
+    def wait_time(self, amount):
+        """Temps avant que amount soit disponible"""
+        if self.available(amount):
+            return 0.0
+        return (min(amount, self.capacity) - self.level) * 60.0 / self.capacity
+
+    def consume(self, amount):
+        if self.capacity is not None:
+            self.level -= amount
+
+    def set_limit(self, per_minute):
+        if per_minute and per_minute != self.capacity:
+            if self.capacity is None:
+                self.level = per_minute
+            self.capacity = per_minute
+            self.level = min(self.level, per_minute)
+
+    def set_remaining(self, remaining):
+        if self.capacity is not None and remaining is not None:
+            self.level = min(self.level, remaining)
+
+
+class RateLimitScheduler:
+    """Ordonnanceur global des appels API (requêtes/minute et tokens/minute).
+
+    Toutes les étapes partagent le quota de l'organisation: chaque appel estime ses tokens,
+    attend son tour dans une file de priorité (structuration, contextualisation, embedding),
+    puis le budget restant est recalé sur les en-têtes x-ratelimit-* des réponses. Un appel
+    qui attend depuis longtemps gagne en priorité (aging) pour éviter la famine.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, priorities=None,
+                 aging_seconds=30):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.priorities = {**DEFAULT_PRIORITIES, **(priorities or {})}
+        self.aging_seconds = aging_seconds
+        self.paused_until = 0.0
+
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.logger = logging.getLogger(__name__)
+
+        # Statistiques
+        self.granted = {}
+        self.wait_time = {}
+
+    @staticmethod
+    def estimate_tokens(payload):
+        """Estimation des tokens comptés par l'API (≈ 4 caractères par token + max_tokens)"""
+        text = ''
+        if 'messages' in payload:
+            text = ''.join(str(message.get('content', '')) for message in payload['messages'])
+        elif 'input' in payload:
+            inputs = payload['input']
+            text = ''.join(inputs) if isinstance(inputs, list) else str(inputs)
+        return len(text) // 4 + 1 + payload.get('max_tokens', 0)
+
+    def effective_priority(self, priority, enqueued, now):
+        return self.priorities.get(priority, len(self.priorities)) - (now - enqueued) / self.aging_seconds
+
+    def acquire(self, priority, tokens):
+        """Bloque jusqu'à ce que l'appel soit le plus prioritaire et que le budget le permette"""
+        enqueued = time.monotonic()
+        entry = [0, next(self.sequence), enqueued, priority]
+        with self.condition:
+            self.waiting.append(entry)
+            while True:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+
+                for waiting in self.waiting:
+                    waiting[0] = self.effective_priority(waiting[3], waiting[2], now)
+                heapq.heapify(self.waiting)
+
+                if self.waiting[0] is entry and now >= self.paused_until:
+                    delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if delay == 0:
+                        heapq.heappop(self.waiting)
+                        self.requests.consume(1)
+                        self.tokens.consume(tokens)
+                        self.granted[priority] = self.granted.get(priority, 0) + 1
+                        self.wait_time[priority] = self.wait_time.get(priority, 0.0) + now - enqueued
+                        self.condition.notify_all()
+                        return
+                else:
+                    delay = max(0.0, self.paused_until - now) or 0.5
+                self.condition.wait(timeout=min(delay, 1.0))
+
+    def reconcile(self, estimated, actual):
+        """Corrige le budget avec les tokens réellement consommés (champ usage)"""
+        if actual is None:
+            return
+        with self.condition:
+            self.tokens.consume(actual - estimated)
+
+    def update_from_headers(self, headers):
+        """Recale limites et budget restant sur les en-têtes x-ratelimit-*"""
+        def header_int(name):
+            try:
+                return int(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+
+        remaining_requests = header_int('x-ratelimit-remaining-requests')
+        with self.condition:
+            self.requests.set_limit(header_int('x-ratelimit-limit-requests'))
+            self.tokens.set_limit(header_int('x-ratelimit-limit-tokens'))
+            self.requests.set_remaining(remaining_requests)
+            self.tokens.set_remaining(header_int('x-ratelimit-remaining-tokens'))
+            self.condition.notify_all()
+
+        # Quota de requêtes épuisé côté serveur: attendre sa réinitialisation
+        if remaining_requests == 0:
+            reset = parse_reset(headers.get('x-ratelimit-reset-requests'))
+            if reset:
+                self.pause(reset)
+
+    def pause(self, seconds):
+        """Suspend tous les appels (après un 429) pour éviter une rafale de rejets"""
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.condition.notify_all()
+        self.logger.warning(f"Appels API suspendus pendant {seconds:.1f}s (limite de débit)")
+
+    def log_summary(self):
+        """Journalise l'attente moyenne par priorité"""
+        for priority, stats in self.summary().items():
+            self.logger.info(
+                f"Ordonnanceur {priority}: {stats['granted']} appels, "
+                f"attente moyenne {stats['mean_wait']:.2f}s"
+            )
+
+    def summary(self):
+        """Résumé par priorité: appels accordés et attente moyenne"""
+        with self.condition:
+            return {
+                priority: {
+                    "granted": count,
+                    "mean_wait": self.wait_time[priority] / count
+                }
+                for priority, count in self.granted.items()
+            }
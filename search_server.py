@@ -0,0 +1,418 @@
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import numpy as np
+from lexical_index import HybridIndex
+
+
+def find_outputs(path):
+    """Dossier à servir: path s'il contient embeddings.npy, sinon le dossier embeddings du dernier run"""
+    path = Path(path)
+    if (path / 'embeddings.npy').exists():
+        return path
+    runs = sorted(path.glob('run_*/embeddings/embeddings.npy'))
+    return runs[-1].parent if runs else None
+
+
+def outputs_signature(directory):
+    """Version des sorties d'un dossier (tailles et dates de chunks.json et embeddings.npy)"""
+    stats = [os.stat(Path(directory) / name) for name in ['chunks.json', 'embeddings.npy']]
+    return (str(directory),) + tuple((stat.st_size, stat.st_mtime_ns) for stat in stats)
+
+
+class LRUCache:
+    """Cache LRU borné, partagé entre threads"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def summary(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class MicroBatcher:
+    """Regroupe les requêtes concurrentes en lots traités par un seul thread.
+
+    La première requête d'un lot attend au plus max_wait secondes que d'autres arrivent
+    (au plus max_batch); process reçoit la liste des éléments et retourne leurs résultats.
+    """
+
+    def __init__(self, process, max_batch=64, max_wait=0.005):
+        self.process = process
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        self.largest = 0
+        self.thread = threading.Thread(target=self.run, name='search-batcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, item, timeout=None):
+        """Ajoute un élément au prochain lot et attend son résultat"""
+        future = Future()
+        self.queue.put((item, future))
+        return future.result(timeout)
+
+    def run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    entry = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self.queue.put(None)
+                    break
+                batch.append(entry)
+
+            try:
+                results = self.process([item for item, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.items += len(batch)
+            self.largest = max(self.largest, len(batch))
+
+    def close(self):
+        self.queue.put(None)
+
+    def summary(self):
+        return {
+            "batches": self.batches,
+            "queries": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.largest
+        }
+
+
+class SearchServer(ThreadingHTTPServer):
+    """Service HTTP local de recherche sur les sorties de l'EmbeddingProcessor.
+
+    Les sorties (embeddings en mémoire mappée, métadonnées, index BM25) sont chargées une fois
+    et rechargées quand un nouveau run apparaît. Les requêtes concurrentes sont regroupées en
+    lots: un seul appel d'embeddings pour les textes absents du cache et un seul produit
+    matriciel pour tout le lot. Embeddings des requêtes et résultats sont mis en cache (LRU).
+    Sans client OpenAI, la recherche est uniquement lexicale (BM25).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, embeddings_dir, host='127.0.0.1', port=8090, client=None,
+                 model='text-embedding-ada-002', k=10, alpha=0.5, max_batch=64, max_wait_ms=5,
+                 cache_size=1024, reload_interval=5):
+        super().__init__((host, port), SearchHandler)
+        self.embeddings_dir = Path(embeddings_dir)
+        self.client = client
+        self.model = model
+        self.k = k
+        self.alpha = alpha
+        self.reload_interval = reload_interval
+        self.logger = logging.getLogger(__name__)
+
+        self.query_embeddings = LRUCache(cache_size)
+        self.results = LRUCache(cache_size)
+        self.counters_lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+        # Sorties servies; remplacées d'un bloc lors d'un rechargement
+        self.index = None
+        self.directory = None
+        self.signature = None
+        self.pending_signature = None
+        self.generation = 0
+        self.reload()
+
+        self.batcher = MicroBatcher(self.process_batch, max_batch=max_batch, max_wait=max_wait_ms / 1000)
+        self.stopped = threading.Event()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Démarre le serveur et la surveillance des sorties dans des threads d'arrière-plan"""
+        threading.Thread(target=self.serve_forever, name='search-server', daemon=True).start()
+        threading.Thread(target=self.watch, name='search-reload', daemon=True).start()
+        return self
+
+    def run(self):
+        """Sert les requêtes jusqu'à l'interruption (Ctrl+C)"""
+        self.logger.info(f"Service de recherche sur {self.url}")
+        threading.Thread(target=self.watch, name='search-reload', daemon=True).start()
+        try:
+            self.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.logger.info(f"Statistiques: {self.summary()}")
+            self.server_close()
+
+    def stop(self):
+        self.stopped.set()
+        self.batcher.close()
+        self.shutdown()
+        self.server_close()
+
+    def watch(self):
+        """Vérifie périodiquement si de nouvelles sorties sont disponibles"""
+        while not self.stopped.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                self.logger.error(f"Erreur rechargement des sorties: {str(e)}")
+
+    def reload(self):
+        """Charge les sorties du dernier run si elles ont changé et n'ont pas bougé depuis le
+        contrôle précédent (un run en cours d'écriture n'est pas chargé)"""
+        directory = find_outputs(self.embeddings_dir)
+        if directory is None:
+            if self.index is None:
+                self.logger.warning(f"Aucune sortie d'embeddings dans {self.embeddings_dir}")
+            return False
+        try:
+            signature = outputs_signature(directory)
+        except FileNotFoundError:
+            return False
+        if signature == self.signature:
+            return False
+        if signature != self.pending_signature and self.index is not None:
+            self.pending_signature = signature
+            return False
+
+        index = HybridIndex(directory, alpha=self.alpha)
+        if len(index.metadata) != len(index.vector_index):
+            self.logger.warning(
+                f"Sorties incohérentes dans {directory}: {len(index.metadata)} métadonnées, "
+                f"{len(index.vector_index)} vecteurs"
+            )
+            return False
+
+        self.index, self.directory, self.signature = index, directory, signature
+        self.generation += 1
+        self.results.clear()
+        self.logger.info(f"Sorties chargées: {directory} ({len(index.metadata)} chunks)")
+        return True
+
+    def embed_queries(self, texts):
+        """Embeddings des textes: cache LRU, puis un seul appel API pour les textes manquants"""
+        vectors = {text: self.query_embeddings.get((self.model, text)) for text in texts}
+        missing = [text for text, vector in vectors.items() if vector is None]
+        if missing:
+            try:
+                response = self.client.embeddings({"model": self.model, "input": missing})
+                for data in response['data']:
+                    vector = np.asarray(data['embedding'], dtype=np.float32)
+                    self.query_embeddings.put((self.model, missing[data['index']]), vector)
+                    vectors[missing[data['index']]] = vector
+            except Exception as e:
+                # Les requêtes du lot sont servies en BM25 seul plutôt qu'en erreur
+                self.logger.error(f"Erreur embeddings des requêtes: {str(e)}")
+        return vectors
+
+    def process_batch(self, items):
+        """Traite un lot de requêtes avec une seule recherche vectorielle.
+
+        Chaque résultat est un couple (hits, vectoriel): vectoriel est faux quand la requête a été
+        servie en BM25 seul.
+        """
+        index = self.index
+        vectors = [item.get('vector') for item in items]
+        if self.client:
+            embedded = self.embed_queries({item['query'] for item, vector in zip(items, vectors) if vector is None})
+            vectors = [embedded.get(item['query']) if vector is None else vector for item, vector in zip(items, vectors)]
+
+        rows = [i for i, vector in enumerate(vectors) if vector is not None]
+        vector_ids = {}
+        if rows:
+            candidates = max(max(items[i]['k'] for i in rows), index.candidates)
+            ids, _ = index.vector_index.search_vectors(np.stack([vectors[i] for i in rows]), k=candidates)
+            vector_ids = dict(zip(rows, ids))
+
+        return [
+            (
+                index.search(
+                    item['query'], query_vector=vectors[i], k=item['k'], alpha=item['alpha'],
+                    vector_ids=vector_ids.get(i)
+                ),
+                vectors[i] is not None
+            )
+            for i, item in enumerate(items)
+        ]
+
+    def search(self, query, k=None, alpha=None, vector=None):
+        """Recherche d'une requête (résultat en cache ou passage par le prochain lot)"""
+        k = min(int(k or self.k), 100)
+        alpha = self.alpha if alpha is None else float(alpha)
+        key = (self.generation, query, k, alpha)
+        if vector is None:
+            cached = self.results.get(key)
+            if cached is not None:
+                return cached, True
+        if self.index is None:
+            raise LookupError("Aucune sortie d'embeddings chargée")
+        if vector is not None and vector.shape != (self.index.vector_index.vectors.shape[1],):
+            raise ValueError(f"Vecteur de dimension {vector.shape} au lieu de {self.index.vector_index.vectors.shape[1]}")
+
+        hits, vectorial = self.batcher.submit({"query": query, "k": k, "alpha": alpha, "vector": vector}, timeout=60)
+        # Un repli en BM25 seul (échec de l'appel d'embeddings) n'est pas mis en cache: la même
+        # requête doit retrouver la recherche hybride dès que l'API répond de nouveau
+        if vector is None and (vectorial or not self.client):
+            self.results.put(key, hits)
+        return hits, False
+
+    def count(self, name):
+        """Incrémente un compteur (requests, errors) partagé par les threads des requêtes"""
+        with self.counters_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def summary(self):
+        return {
+            "directory": str(self.directory) if self.directory else None,
+            "generation": self.generation,
+            "chunks": len(self.index.metadata) if self.index else 0,
+            "requests": self.requests,
+            "errors": self.errors,
+            "batcher": self.batcher.summary(),
+            "query_embedding_cache": self.query_embeddings.summary(),
+            "result_cache": self.results.summary()
+        }
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    """POST /search {"query", "k", "alpha", "vector"}; GET /stats"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # En-têtes et corps sont écrits séparément: sans TCP_NODELAY, Nagle et l'ACK retardé
+        # du client ajoutent ~40 ms à chaque réponse d'une connexion keep-alive
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def do_GET(self):
+        if self.path.rstrip('/') in ('/stats', '/health'):
+            return self.send_json(200, self.server.summary())
+        self.send_json(404, {"error": f"Chemin inconnu: {self.path}"})
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/search':
+            return self.send_json(404, {"error": f"Chemin inconnu: {self.path}"})
+        start = time.perf_counter()
+        self.server.count('requests')
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            query = str(payload.get('query') or '')
+            vector = payload.get('vector')
+            if vector is not None:
+                vector = np.asarray(vector, dtype=np.float32)
+            if not query and vector is None:
+                return self.send_json(400, {"error": "Champ 'query' ou 'vector' requis"})
+        except ValueError:
+            return self.send_json(400, {"error": "Corps JSON invalide"})
+
+        try:
+            hits, cached = self.server.search(query, k=payload.get('k'), alpha=payload.get('alpha'), vector=vector)
+        except LookupError as e:
+            return self.send_json(503, {"error": str(e)})
+        except ValueError as e:
+            return self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            self.server.count('errors')
+            self.server.logger.error(f"Erreur recherche '{query}': {str(e)}")
+            return self.send_json(500, {"error": str(e)})
+
+        self.send_json(200, {
+            "results": hits,
+            "cached": cached,
+            "generation": self.server.generation,
+            "took_ms": round((time.perf_counter() - start) * 1000, 3)
+        })
+
+    def send_json(self, status, body):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        self.server.logger.debug(format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service local de recherche sur les embeddings")
+    parser.add_argument('--embeddings-dir', default='pipeline_output',
+                        help="Dossier embeddings, ou dossier de sortie du pipeline (dernier run)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--openai-key', default=os.environ.get('OPENAI_API_KEY'),
+                        help="Clé API pour vectoriser les requêtes (sinon BM25 seul)")
+    parser.add_argument('--api-base-url', help="URL d'une API compatible OpenAI")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    client = None
+    if args.openai_key:
+        from openai_client import get_client
+        client = get_client(args.openai_key, base_url=args.api_base_url)
+
+    server = SearchServer(args.embeddings_dir, host=args.host, port=args.port, client=client)
+    server.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import logging
+import queue
+import threading
+import time
+from pathlib import Path
+
+_STOP = object()
+
+
+class Stage:
+    """Étape de traitement alimentée par une file bornée et servie par un pool de workers.
+
+    submit() bloque quand la file est pleine: une étape lente ralentit naturellement celle
+    qui l'alimente (backpressure) au lieu d'accumuler des éléments en mémoire.
+    """
+
+    def __init__(self, name, handler, workers=1, queue_size=100):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.threads = []
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+        # Statistiques
+        self.processed = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.blocked_time = 0.0
+
+    def start(self):
+        """Démarre les workers"""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def submit(self, item):
+        """Ajoute un élément, en attendant si la file est pleine"""
+        start = time.perf_counter()
+        self.queue.put(item)
+        with self.lock:
+            self.blocked_time += time.perf_counter() - start
+
+    def work(self):
+        """Boucle d'un worker"""
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            start = time.perf_counter()
+            try:
+                self.handler(item)
+                with self.lock:
+                    self.processed += 1
+            except Exception as e:
+                self.logger.error(f"Erreur dans l'étape {self.name} pour {item}: {str(e)}")
+                with self.lock:
+                    self.failed += 1
+            finally:
+                with self.lock:
+                    self.busy_time += time.perf_counter() - start
+
+    def close(self):
+        """Attend la fin de tous les éléments en file puis arrête les workers"""
+        for _ in self.threads:
+            self.queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+
+    def summary(self):
+        """Résumé des statistiques de l'étape"""
+        return (
+            f"Étape {self.name}: {self.processed} traités, {self.failed} en échec, "
+            f"{self.workers} workers, occupation {self.busy_time:.1f}s, "
+            f"attente en entrée {self.blocked_time:.1f}s"
+        )
+
+
+class StreamingPipeline:
+    """Exécution en flux: crawl, extraction PDF et embeddings se chevauchent.
+
+    Un PDF part à l'OCR dès que le crawler l'a téléchargé, et une page de contenu (HTML
+    ou PDF structuré) est découpée et vectorisée dès son écriture. Comme en mode séquentiel,
+    les PDFs et fichiers Office déjà vus sont reliés depuis le store d'artefacts, les
+    embeddings partent du dernier store de la même source en mode mise à jour, et le crawl,
+    les pages et les embeddings sont enregistrés comme artefacts.
+    """
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.options = pipeline.options.get('streaming_options') or {}
+        self.artifacts = pipeline.artifacts
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.reused = {"pdf": 0, "office": 0}
+        # Pages écrites par le crawler (le dossier de contenu reçoit aussi les pages des extracteurs)
+        self.crawled_pages = []
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, update=None, resume=None):
+        """Exécute les trois étapes connectées par des files bornées"""
+        from crawler import WebCrawler
+        from pdf_extractor import PDFExtractor
+        from embedding_processor import EmbeddingProcessor
+        from office_extractor import OfficeExtractor
+
+        start_time = time.time()
+        queue_size = self.options.get('queue_size', 100)
+
+        crawler = WebCrawler(
+            start_url=self.pipeline.start_url,
+            max_depth=self.pipeline.options.get('max_depth', 2),
+            on_file_saved=self.on_file_saved,
+            base_dir=self.pipeline.dirs['crawler'],
+            frontier_options=self.pipeline.options.get('frontier_options'),
+            boilerplate_options=self.pipeline.boilerplate_options(),
+            download_options=self.pipeline.options.get('download_options'),
+            priority_options=self.pipeline.priority_options(),
+            crawl_budget=self.pipeline.options.get('crawl_budget')
+        )
+        self.content_dir = Path(crawler.base_dir) / 'content'
+        embeddings_dir = self.pipeline.dirs['embeddings']
+
+        embedding_options = self.pipeline.embedding_options()
+        self.embedding_processor = EmbeddingProcessor(
+            input_dir=self.content_dir,
+            output_dir=embeddings_dir,
+            openai_api_key=self.pipeline.openai_api_key,
+            options=embedding_options,
+            client=self.pipeline.api_client()
+        )
+        self.pdf_extractor = PDFExtractor(
+            input_dir=Path(crawler.base_dir) / 'PDF',
+            output_dir=self.content_dir,
+            openai_api_key=self.pipeline.openai_api_key,
+            on_page_saved=self.on_page_saved,
+            client=self.pipeline.api_client(),
+            options=self.pipeline.options.get('pdf_options')
+        )
+
+        self.office_extractor = OfficeExtractor(
+            input_dir=Path(crawler.base_dir) / 'Doc',
+            output_dir=self.content_dir,
+            on_page_saved=self.on_page_saved
+        )
+
+        # Comme create_embeddings: en mode mise à jour, le dernier store de la même source sert
+        # de base et seuls les chunks nouveaux ou modifiés sont calculés; le checkpoint est
+        # repris ou remis à zéro
+        lineage = self.pipeline.embedding_lineage(self.content_dir, embedding_options) if self.artifacts else None
+        if update is None:
+            update = embedding_options.get('incremental', False)
+        if update and self.artifacts:
+            self.pipeline.previous_embeddings(embeddings_dir, lineage)
+        self.embedding_processor.begin(update=update, resume=resume)
+
+        # Avec max_in_flight > 1, les workers de l'étape découpent les fichiers et les chunks
+        # partent dans le pool partagé de l'EmbeddingProcessor
+        max_in_flight = embedding_options.get('max_in_flight', 1)
+        embed = self.embedding_processor.process_file
+        if max_in_flight > 1:
+            self.embedding_processor.start_pool(max_in_flight)
+            embed = self.embedding_processor.submit_file
+
+        self.embedding_stage = Stage(
+            'embedding', embed,
+            workers=self.options.get('embedding_workers', 4), queue_size=queue_size
+        ).start()
+        self.pdf_stage = Stage(
+            'pdf', self.process_pdf,
+            workers=self.options.get('pdf_workers', 2), queue_size=queue_size
+        ).start()
+        self.office_stage = Stage(
+            'office', self.process_office,
+            workers=self.options.get('office_workers', 2), queue_size=queue_size
+        ).start()
+
+        try:
+            logging.info("Démarrage du pipeline en flux...")
+            crawler.crawl()
+        finally:
+            # Vidage dans l'ordre du flux: les PDFs alimentent encore les embeddings
+            self.pdf_stage.close()
+            self.office_stage.close()
+            self.embedding_stage.close()
+            if self.embedding_processor.executor:
+                self.embedding_processor.drain_pool()
+
+        if self.artifacts:
+            self.pipeline.record_crawl(crawler.base_dir, content_pages=self.crawled_pages)
+
+        if self.embedding_processor.update_mode:
+            self.embedding_processor.count_removed_files(list(self.content_dir.glob('*.txt')))
+        self.embedding_processor.finalize()
+        if self.artifacts:
+            self.pipeline.record_embeddings(
+                self.pipeline.embedding_key(self.content_dir, embedding_options), embeddings_dir,
+                lineage=lineage
+            )
+        self.pipeline.run_dedup()
+
+        for stage in [self.pdf_stage, self.office_stage, self.embedding_stage]:
+            logging.info(stage.summary())
+        logging.info(
+            f"Artefacts réutilisés: {self.reused['pdf']} PDFs, {self.reused['office']} fichiers Office"
+        )
+        logging.info(f"Pipeline en flux terminé en {time.time() - start_time:.1f}s")
+
+    def process_pdf(self, path):
+        """Étape PDF: pages reliées depuis un run précédent, sinon extraction et enregistrement"""
+        if not self.artifacts:
+            self.pdf_extractor.process_pdf(path)
+            return
+        key = self.pipeline.pdf_key(path)
+        manifest = self.artifacts.lookup('pdf', key)
+        if manifest:
+            self.submit_reused('pdf', manifest)
+            return
+        self.local.pages = []
+        try:
+            self.pdf_extractor.process_pdf(path)
+            if self.local.pages:
+                self.artifacts.record('pdf', key, {page.name: page for page in self.local.pages})
+        finally:
+            self.local.pages = None
+
+    def process_office(self, path):
+        """Étape Office: pages reliées depuis un run précédent, sinon extraction et enregistrement"""
+        if not self.artifacts:
+            self.office_extractor.process_file(path)
+            return
+        key = self.pipeline.office_key(self.artifacts.hash_file(path))
+        manifest = self.artifacts.lookup('office', key)
+        if manifest:
+            self.submit_reused('office', manifest)
+            return
+        outputs = self.office_extractor.process_file(path)
+        if outputs:
+            self.artifacts.record('office', key, {output.name: output for output in outputs})
+
+    def submit_reused(self, stage, manifest):
+        """Relie les pages d'un artefact dans le dossier de contenu et les envoie à l'embedding"""
+        for page in self.artifacts.materialize(manifest, self.content_dir):
+            self.embedding_stage.submit(page)
+        with self.lock:
+            self.reused[stage] += 1
+
+    def on_file_saved(self, file_type, path):
+        """Callback du crawler: route chaque fichier vers l'étape suivante"""
+        if file_type == 'PDF':
+            self.pdf_stage.submit(Path(path))
+        elif file_type == 'Doc':
+            self.office_stage.submit(Path(path))
+        elif file_type == 'content':
+            self.crawled_pages.append(Path(path))
+            self.embedding_stage.submit(Path(path))
+
+    def on_page_saved(self, path):
+        """Callback des extracteurs: une page écrite part directement à l'embedding"""
+        pages = getattr(self.local, 'pages', None)
+        if pages is not None:
+            pages.append(Path(path))
+        self.embedding_stage.submit(Path(path))
@@ -0,0 +1,291 @@
+import logging
+import math
+import re
+from statistics import median
+from text_utils import fold
+
+# Une référence produit contient lettres et chiffres, sans espace (ORF-R020, 2500W-240)
+SKU_PATTERN = re.compile(r"^(?=.*\d)(?=.*[A-Za-z])[A-Za-z0-9][A-Za-z0-9\-/.]{2,}$")
+
+# Clés du gabarit Ouellet reconnues dans les en-têtes (texte sans accents, en minuscules)
+HEADER_KEYS = [
+    ('model', ['modele', 'model', 'numero', 'produit', 'catalogue', 'sku', 'no', '#']),
+    ('price', ['prix', 'price', '$']),
+    ('length', ['longueur', 'length', 'long']),
+    ('watts', ['watts', 'watt', 'puissance', 'w']),
+    ('voltage', ['voltage', 'tension', 'volts', 'volt', 'v']),
+    ('amperage', ['amperage', 'amperes', 'amps', 'amp', 'a']),
+]
+
+TEMPLATE_ORDER = {key: order for order, (key, _) in enumerate(HEADER_KEYS)}
+
+
+def words_from_pypdf(page):
+    """Texte d'une page pypdf et ses mots positionnés (un seul passage sur le flux de la page).
+
+    Chaque mot est un dict x0/x1/top/bottom/text, en points, l'axe vertical orienté vers le bas;
+    la largeur des mots est estimée à un demi-corps par caractère.
+    """
+    words = []
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        if not text.strip():
+            return
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        size = (font_size or 10) * (math.hypot(tm[0], tm[1]) or 1) * (math.hypot(cm[0], cm[1]) or 1)
+        char_width = size * 0.5
+        for line_num, line in enumerate(text.split('\n')):
+            top = -y + line_num * size * 1.2
+            for match in re.finditer(r"\S+", line):
+                words.append({
+                    "x0": x + match.start() * char_width,
+                    "x1": x + match.end() * char_width,
+                    "top": top - size,
+                    "bottom": top,
+                    "text": match.group()
+                })
+
+    text = page.extract_text(visitor_text=visitor) or ''
+    return text, words
+
+
+def words_from_ocr(image, lang='fra+eng', config='--psm 6'):
+    """Mots reconnus par Tesseract avec leur boîte (pixels) et leur confiance"""
+    import pytesseract
+
+    data = pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+    words = []
+    for i, text in enumerate(data['text']):
+        confidence = float(data['conf'][i])
+        if not text.strip() or confidence < 0:
+            continue
+        words.append({
+            "x0": data['left'][i],
+            "x1": data['left'][i] + data['width'][i],
+            "top": data['top'][i],
+            "bottom": data['top'][i] + data['height'][i],
+            "text": text.strip(),
+            "conf": confidence
+        })
+    return words
+
+
+def normalize_price(value):
+    """63,00 $ -> 63.00"""
+    cleaned = re.sub(r"[^\d,.]", '', value)
+    if ',' in cleaned and '.' not in cleaned:
+        cleaned = cleaned.replace(',', '.')
+    return cleaned.replace(',', '') or value
+
+
+def header_key(header):
+    """Clé du gabarit pour un en-tête de colonne (texte de l'en-tête si aucune ne correspond)"""
+    tokens = re.findall(r"[a-z0-9#$]+|[#$]", fold(header))
+    for key, keywords in HEADER_KEYS:
+        for keyword in keywords:
+            if keyword in tokens or (len(keyword) >= 4 and any(t.startswith(keyword) for t in tokens)):
+                return key
+    return header.strip().lower()
+
+
+class TableExtractor:
+    """Extraction déterministe des tableaux de spécifications et de prix d'une page.
+
+    Les mots positionnés (couche texte PDF ou boîtes OCR) sont groupés en lignes puis en
+    cellules; une suite de lignes dont les cellules s'alignent sur les mêmes colonnes forme un
+    tableau. Chaque ligne dont la colonne modèle contient une référence produit devient une
+    entrée `# [Model Number]` du gabarit. La page n'est retenue que si le résultat est fiable;
+    sinon elle est confiée à GPT.
+    """
+
+    def __init__(self, min_confidence=0.8, min_rows=2, min_columns=3, min_coverage=0.6,
+                 min_ocr_confidence=60):
+        self.min_confidence = min_confidence
+        self.min_rows = min_rows
+        self.min_columns = min_columns
+        self.min_coverage = min_coverage
+        self.min_ocr_confidence = min_ocr_confidence
+        self.logger = logging.getLogger(__name__)
+
+    def group_rows(self, words):
+        """Regroupe les mots en lignes (centres verticaux proches), triées de haut en bas"""
+        if not words:
+            return []
+        height = median(word['bottom'] - word['top'] for word in words) or 1
+        rows = []
+        for word in sorted(words, key=lambda w: (w['top'] + w['bottom']) / 2):
+            center = (word['top'] + word['bottom']) / 2
+            if rows and abs(center - rows[-1]['center']) <= height * 0.5:
+                row = rows[-1]
+                row['words'].append(word)
+                row['center'] += (center - row['center']) / len(row['words'])
+            else:
+                rows.append({"center": center, "words": [word]})
+        return [self.group_cells(row['words'], height) for row in rows]
+
+    def group_cells(self, words, height):
+        """Fusionne les mots voisins d'une ligne en cellules (écart inférieur à 0.8 corps)"""
+        cells = []
+        for word in sorted(words, key=lambda w: w['x0']):
+            if cells and word['x0'] - cells[-1]['x1'] <= height * 0.8:
+                cell = cells[-1]
+                cell['text'] += ' ' + word['text']
+                cell['x1'] = max(cell['x1'], word['x1'])
+                cell['words'].append(word)
+            else:
+                cells.append({"x0": word['x0'], "x1": word['x1'], "text": word['text'], "words": [word]})
+        return cells
+
+    def find_columns(self, rows):
+        """Colonnes: intervalles disjoints de la projection horizontale des cellules"""
+        width = max(len(row) for row in rows)
+        spans = sorted(
+            (cell['x0'], cell['x1']) for row in rows if len(row) == width for cell in row
+        )
+        columns = []
+        for x0, x1 in spans:
+            if columns and x0 <= columns[-1][1]:
+                columns[-1][1] = max(columns[-1][1], x1)
+            else:
+                columns.append([x0, x1])
+        return columns
+
+    @staticmethod
+    def assign(row, columns):
+        """Colonne de chaque cellule (recouvrement maximal); None si deux cellules se chevauchent"""
+        assigned = {}
+        for cell in row:
+            overlaps = [min(cell['x1'], x1) - max(cell['x0'], x0) for x0, x1 in columns]
+            best = max(range(len(columns)), key=lambda c: overlaps[c])
+            if overlaps[best] < 0 or best in assigned:
+                return None
+            assigned[best] = cell['text']
+        return assigned
+
+    def find_tables(self, rows):
+        """Suites d'au moins min_rows + 1 lignes d'au moins min_columns cellules"""
+        tables, current = [], []
+        for index, row in enumerate(rows):
+            if len(row) >= self.min_columns:
+                current.append(index)
+                continue
+            if len(current) > self.min_rows:
+                tables.append(current)
+            current = []
+        if len(current) > self.min_rows:
+            tables.append(current)
+        return tables
+
+    def parse_table(self, rows):
+        """Entrées produit d'un tableau et sa fiabilité (proportion de lignes bien alignées)"""
+        columns = self.find_columns(rows)
+        assigned_rows = [self.assign(row, columns) for row in rows]
+
+        # Colonne modèle: en-tête reconnu, sinon la colonne la plus riche en références
+        def is_data(assigned, column):
+            return assigned is not None and bool(SKU_PATTERN.match(assigned.get(column, '')))
+
+        sku_counts = [sum(is_data(assigned, c) for assigned in assigned_rows) for c in range(len(columns))]
+        first_data = next(
+            (i for i, assigned in enumerate(assigned_rows)
+             if assigned and any(SKU_PATTERN.match(value) for value in assigned.values())),
+            None
+        )
+        if first_data is None:
+            return [], 0.0
+
+        headers = {}
+        for assigned in assigned_rows[max(0, first_data - 2):first_data]:
+            for column, text in (assigned or {}).items():
+                headers[column] = f"{headers.get(column, '')} {text}".strip()
+        keys = {column: header_key(text) for column, text in headers.items()}
+
+        model_column = next((c for c, key in keys.items() if key == 'model'), None)
+        if model_column is None:
+            model_column = max(range(len(columns)), key=lambda c: sku_counts[c])
+        if sku_counts[model_column] < self.min_rows or len(keys) < 2:
+            return [], 0.0
+
+        entries, fitted = [], 0
+        body = assigned_rows[first_data:]
+        for assigned in body:
+            if not is_data(assigned, model_column):
+                continue
+            fitted += 1
+            specs = []
+            for column in sorted(assigned):
+                if column == model_column:
+                    continue
+                key = keys.get(column, f"column_{column + 1}")
+                value = normalize_price(assigned[column]) if key == 'price' else assigned[column]
+                specs.append((key, value))
+            # Clés du gabarit d'abord (price, length, watts...), puis les autres colonnes
+            specs.sort(key=lambda spec: TEMPLATE_ORDER.get(spec[0], len(TEMPLATE_ORDER)))
+            entries.append((assigned[model_column], specs))
+        return entries, fitted / max(1, len(body))
+
+    def extract_page(self, words, title=None):
+        """Markdown du gabarit pour une page de tableaux, ou None si la page est incertaine"""
+        if not words:
+            return None
+        if any('conf' in word for word in words):
+            confidence = sum(word.get('conf', 0) for word in words) / len(words)
+            if confidence < self.min_ocr_confidence:
+                return None
+
+        rows = self.group_rows(words)
+        tables = self.find_tables(rows)
+        if not tables:
+            return None
+
+        entries, in_table = [], set()
+        for table in tables:
+            table_entries, confidence = self.parse_table([rows[i] for i in table])
+            if not table_entries or confidence < self.min_confidence:
+                return None
+            entries.extend(table_entries)
+            in_table.update(table)
+
+        table_words = sum(len(cell['words']) for i in in_table for cell in rows[i])
+        if table_words / len(words) < self.min_coverage:
+            return None
+
+        # Texte hors tableaux: titre (première ligne) et description
+        other_lines = [' '.join(cell['text'] for cell in row) for i, row in enumerate(rows) if i not in in_table]
+        lines = []
+        if other_lines or title:
+            lines.append(f"# {other_lines[0] if other_lines else title}")
+        if len(other_lines) > 1:
+            lines.append(f"- Description: {' '.join(other_lines[1:])}")
+        lines.extend(['', '## Product Specifications'])
+        for model, specs in entries:
+            lines.append(f"# {model}")
+            lines.extend(f"- {key}: {value}" for key, value in specs)
+            lines.append('')
+        return '\n'.join(lines).strip() + '\n'
+
+
+def main():
+    # Configuration
+    pdf_path = "input/document.pdf"
+
+    try:
+        import pypdf
+
+        extractor = TableExtractor()
+        reader = pypdf.PdfReader(pdf_path)
+        for page_num, page in enumerate(reader.pages, 1):
+            _, words = words_from_pypdf(page)
+            content = extractor.extract_page(words)
+            print(f"--- Page {page_num}: {'tableau' if content else 'GPT'}")
+            if content:
+                print(content)
+
+    except Exception as e:
+        logging.error(f"Erreur principale: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+import unicodedata
+
+
+def fold(text):
+    """Minuscules sans accents (numéro -> numero)"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
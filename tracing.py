@@ -0,0 +1,171 @@
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Tracer:
+    """Spans, compteurs et histogrammes de latence, exportables au format Chrome trace.
+
+    Désactivé par défaut: chaque point d'instrumentation se réduit alors à un test de
+    booléen. Le fichier JSON produit s'ouvre dans chrome://tracing ou Perfetto, et sa clé
+    "metrics" résume compteurs (octets, pages, appels...) et histogrammes par opération.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+        self.logger = logging.getLogger(__name__)
+
+    def reset(self):
+        """Vide les événements et métriques collectés"""
+        with self.lock:
+            self.origin = time.perf_counter()
+            self.events = []
+            self.counters = defaultdict(float)
+            self.histograms = defaultdict(list)
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def add_span(self, name, start, duration, **args):
+        """Enregistre un span terminé (start en secondes perf_counter)"""
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": name.split('.', 1)[0],
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {key: value if isinstance(value, (int, float, bool)) else str(value)[:200]
+                     for key, value in args.items()}
+        }
+        with self.lock:
+            self.events.append(event)
+            self.histograms[f"{name}.ms"].append(duration * 1000)
+
+    @contextmanager
+    def span(self, name, **args):
+        """Mesure la durée du bloc"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter() - start, **args)
+
+    def count(self, name, value=1):
+        """Incrémente un compteur (appels, pages, octets...)"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += value
+
+    def observe(self, name, value):
+        """Ajoute une valeur à un histogramme"""
+        if not self.enabled:
+            return
+        with self.lock:
+            self.histograms[name].append(value)
+
+    def summary(self):
+        """Compteurs et percentiles des histogrammes"""
+        with self.lock:
+            histograms = {}
+            for name, values in self.histograms.items():
+                ordered = sorted(values)
+                histograms[name] = {
+                    "count": len(ordered),
+                    "total": sum(ordered),
+                    "mean": sum(ordered) / len(ordered),
+                    "p50": ordered[len(ordered) // 2],
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                    "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+                    "max": ordered[-1]
+                }
+            return {"counters": dict(self.counters), "histograms": histograms}
+
+    def save(self, path):
+        """Écrit la trace (format Chrome trace) et le résumé des métriques"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        summary = self.summary()
+        with self.lock:
+            events = list(self.events)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "metrics": summary}, f)
+        os.replace(tmp_path, path)
+        return path
+
+    def log_summary(self):
+        """Journalise le temps total passé dans chaque opération"""
+        histograms = self.summary()["histograms"]
+        for name, stats in sorted(histograms.items(), key=lambda item: -item[1]["total"]):
+            if name.endswith('.ms'):
+                self.logger.info(
+                    f"Trace {name[:-3]}: {stats['count']} fois, total {stats['total'] / 1000:.1f}s, "
+                    f"p50 {stats['p50']:.0f}ms, p99 {stats['p99']:.0f}ms"
+                )
+
+
+# Traceur global du processus, partagé par toutes les étapes
+tracer = Tracer()
+
+
+def traced(name):
+    """Décorateur: span autour d'une méthode, avec son premier argument comme cible"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name, target=args[1] if len(args) > 1 else ''):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Un seul profileur actif par processus: Python 3.12+ refuse d'en activer un second
+# ("Another profiling tool is already active") et, avant, le profil englobant perdait ses données
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def profile(name, output_dir, top=25):
+    """Exécute le bloc sous cProfile; écrit <name>.prof et journalise les fonctions les plus coûteuses.
+
+    Une étape appelée depuis une étape déjà profilée (dédoublonnage lancé par l'étape
+    d'embeddings) n'est pas profilée à part: elle figure dans le profil englobant.
+    """
+    if not _profile_lock.acquire(blocking=False):
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        yield
+    finally:
+        profiler.disable()
+        _profile_lock.release()
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(output_dir / f"{name}.prof")
+
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(top)
+        logging.getLogger(__name__).info(f"Profil de l'étape {name}:\n{stream.getvalue()}")
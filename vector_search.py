@@ -0,0 +1,296 @@
+import json
+import logging
+import os
+from pathlib import Path
+import numpy as np
+from artifact_store import ArtifactStore
+
+
+def normalize_rows(vectors):
+    """Normalise des vecteurs (L2) en float32"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k(scores, k):
+    """Retourne les indices et scores des k meilleurs éléments de chaque ligne, triés"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(np.float32)
+    if k < scores.shape[1]:
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+
+def merge_top_k(best_ids, best_scores, ids, scores, k):
+    """Fusionne deux ensembles de candidats top-k"""
+    all_ids = np.concatenate([best_ids, ids], axis=1)
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    pos, merged_scores = top_k(all_scores, k)
+    return np.take_along_axis(all_ids, pos, axis=1), merged_scores
+
+
+def exact_search(vectors, queries, k=10, block_size=65536):
+    """Recherche cosinus exacte par blocs (vecteurs et requêtes déjà normalisés)"""
+    num_queries = queries.shape[0]
+    best_ids = np.empty((num_queries, 0), dtype=np.int64)
+    best_scores = np.empty((num_queries, 0), dtype=np.float32)
+
+    for start in range(0, vectors.shape[0], block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        scores = queries @ block.T
+        ids, block_scores = top_k(scores, k)
+        best_ids, best_scores = merge_top_k(best_ids, best_scores, ids + start, block_scores, k)
+
+    return best_ids, best_scores
+
+
+def file_signature(path):
+    """Taille, date de modification et inode d'un fichier"""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def format_results(metadata, ids, scores):
+    """Associe les métadonnées des chunks aux indices retournés par une recherche"""
+    results = []
+    for query_ids, query_scores in zip(ids, scores):
+        hits = []
+        for rank, (idx, score) in enumerate(zip(query_ids, query_scores), 1):
+            if idx < 0:
+                continue
+            chunk_metadata = metadata[idx] if idx < len(metadata) else {}
+            hits.append({"rank": rank, "index": int(idx), "score": float(score), **chunk_metadata})
+        results.append(hits)
+    return results
+
+
+class IVFIndex:
+    """Index approximatif à listes inversées (k-means sphérique)"""
+
+    def __init__(self, n_lists=None, n_probe=8, n_iter=10, sample_size=100000, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.sample_size = sample_size
+        self.seed = seed
+        self.centroids = None
+        self.list_ids = None
+        self.list_offsets = None
+
+    def assign(self, vectors, block_size=65536):
+        """Affecte chaque vecteur à son centroïde le plus proche"""
+        assignments = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], block_size):
+            block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+            assignments[start:start + block_size] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def train(self, vectors):
+        """Entraîne les centroïdes puis construit les listes inversées"""
+        num_rows = vectors.shape[0]
+        if not self.n_lists:
+            self.n_lists = max(1, int(np.sqrt(num_rows)))
+        self.n_lists = min(self.n_lists, num_rows)
+
+        rng = np.random.default_rng(self.seed)
+        sample_ids = np.sort(rng.choice(num_rows, size=min(num_rows, self.sample_size), replace=False))
+        sample = np.asarray(vectors[sample_ids], dtype=np.float32)
+        self.centroids = sample[rng.choice(sample.shape[0], size=self.n_lists, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            labels = np.argmax(sample @ self.centroids.T, axis=1)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=self.n_lists) == 0
+            # Les listes vides sont réinitialisées sur des points aléatoires
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+            self.centroids = normalize_rows(sums)
+
+        assignments = self.assign(vectors)
+        self.list_ids = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self
+
+    def search(self, vectors, queries, k=10, n_probe=None):
+        """Recherche approximative en ne visitant que les listes les plus proches"""
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        probe_lists, _ = top_k(queries @ self.centroids.T, n_probe)
+
+        all_ids = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        all_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        for q, lists in enumerate(probe_lists):
+            candidates = np.concatenate([
+                self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists
+            ])
+            if candidates.size == 0:
+                continue
+            candidates.sort()
+            scores = np.asarray(vectors[candidates], dtype=np.float32) @ queries[q]
+            pos, best = top_k(scores[np.newaxis, :], k)
+            all_ids[q, :pos.shape[1]] = candidates[pos[0]]
+            all_scores[q, :pos.shape[1]] = best[0]
+        return all_ids, all_scores
+
+    def save(self, path):
+        """Sauvegarde l'index sur disque"""
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_ids=self.list_ids,
+            list_offsets=self.list_offsets,
+            n_probe=self.n_probe
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Charge un index sauvegardé"""
+        data = np.load(path)
+        index = cls(n_lists=data['centroids'].shape[0], n_probe=int(data['n_probe']))
+        index.centroids = data['centroids']
+        index.list_ids = data['list_ids']
+        index.list_offsets = data['list_offsets']
+        return index
+
+
+class VectorIndex:
+    """Index de recherche sur les sorties de l'EmbeddingProcessor (embeddings.npy + chunks.json)"""
+
+    def __init__(self, embeddings_dir, block_size=65536):
+        self.embeddings_dir = Path(embeddings_dir)
+        self.block_size = block_size
+        self.logger = logging.getLogger(__name__)
+
+        self.embeddings_path = self.embeddings_dir / "embeddings.npy"
+        self.normalized_path = self.embeddings_dir / "embeddings_normalized.npy"
+        self.ivf_path = self.embeddings_dir / "ivf_index.npz"
+        self.sources_path = self.embeddings_dir / "vector_index.json"
+        self.sources = self.load_sources()
+        self.source_digest = None
+
+        self.metadata = self.load_metadata()
+        self.vectors = self.load_vectors()
+        self.ivf = None
+        if self.ivf_path.exists() and self.is_fresh(self.ivf_path):
+            self.ivf = IVFIndex.load(self.ivf_path)
+            self.logger.info(f"Index IVF chargé: {self.ivf_path}")
+
+    def load_sources(self):
+        """Charge l'empreinte de embeddings.npy enregistrée pour chaque fichier dérivé"""
+        if not self.sources_path.exists():
+            return {}
+        with open(self.sources_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def embeddings_digest(self):
+        """Empreinte SHA-256 de embeddings.npy, calculée au plus une fois"""
+        if self.source_digest is None:
+            self.source_digest = ArtifactStore.hash_file(self.embeddings_path)
+        return self.source_digest
+
+    def is_fresh(self, path):
+        """Vérifie qu'un fichier dérivé a été calculé à partir du embeddings.npy actuel.
+
+        La date de modification ne suffit pas: un embeddings.npy relié depuis l'ArtifactStore
+        garde la date de l'artefact et paraît plus ancien que des fichiers dérivés périmés. Le
+        contenu n'est rehaché que si la signature (taille, date, inode) a changé.
+        """
+        entry = self.sources.get(Path(path).name)
+        if not entry or entry['signature'] != file_signature(path):
+            return False
+        if entry['source_signature'] == file_signature(self.embeddings_path):
+            return True
+        return entry['source'] == self.embeddings_digest()
+
+    def record_source(self, path):
+        """Associe un fichier dérivé à l'empreinte de embeddings.npy"""
+        self.sources[Path(path).name] = {
+            "source": self.embeddings_digest(),
+            "source_signature": file_signature(self.embeddings_path),
+            "signature": file_signature(path)
+        }
+        tmp_path = self.sources_path.with_name(self.sources_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.sources, f, indent=2)
+        os.replace(tmp_path, self.sources_path)
+
+    def load_metadata(self):
+        """Charge les métadonnées des chunks"""
+        chunks_json_path = self.embeddings_dir / "chunks.json"
+        if not chunks_json_path.exists():
+            return []
+        with open(chunks_json_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('metadata', [])
+
+    def load_vectors(self):
+        """Charge la matrice normalisée en float32, en mémoire mappée"""
+        raw = np.load(self.embeddings_path, mmap_mode='r')
+
+        if self.normalized_path.exists() and self.is_fresh(self.normalized_path):
+            normalized = np.load(self.normalized_path, mmap_mode='r')
+            if normalized.shape == raw.shape and normalized.dtype == np.float32:
+                return normalized
+
+        # Normalisation par blocs pour ne jamais charger toute la matrice brute
+        self.logger.info(f"Normalisation de {raw.shape[0]} vecteurs: {self.normalized_path}")
+        normalized = np.lib.format.open_memmap(
+            self.normalized_path, mode='w+', dtype=np.float32, shape=raw.shape
+        )
+        for start in range(0, raw.shape[0], self.block_size):
+            normalized[start:start + self.block_size] = normalize_rows(raw[start:start + self.block_size])
+        normalized.flush()
+        del normalized
+        self.record_source(self.normalized_path)
+        return np.load(self.normalized_path, mmap_mode='r')
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    def build_ivf(self, n_lists=None, n_probe=8, n_iter=10):
+        """Construit et sauvegarde l'index approximatif IVF"""
+        self.logger.info(f"Construction de l'index IVF sur {len(self)} vecteurs")
+        self.ivf = IVFIndex(n_lists=n_lists, n_probe=n_probe, n_iter=n_iter).train(self.vectors)
+        self.ivf.save(self.ivf_path)
+        self.record_source(self.ivf_path)
+        self.logger.info(f"Index IVF créé: {self.ivf_path} ({self.ivf.n_lists} listes)")
+        return self.ivf
+
+    def search_vectors(self, queries, k=10, approximate=False, n_probe=None):
+        """Retourne les indices et scores cosinus des top-k pour un lot de requêtes"""
+        queries = normalize_rows(queries)
+        if approximate and self.ivf is not None:
+            return self.ivf.search(self.vectors, queries, k=k, n_probe=n_probe)
+        return exact_search(self.vectors, queries, k=k, block_size=self.block_size)
+
+    def search(self, queries, k=10, approximate=False, n_probe=None):
+        """Recherche top-k avec les métadonnées des chunks pour chaque requête"""
+        ids, scores = self.search_vectors(queries, k=k, approximate=approximate, n_probe=n_probe)
+        return format_results(self.metadata, ids, scores)
+
+
+def main():
+    # Configuration
+    embeddings_directory = "output"
+
+    try:
+        index = VectorIndex(embeddings_directory)
+        results = index.search(index.vectors[:1], k=5)
+        for hit in results[0]:
+            print(f"{hit['score']:.4f} {hit.get('filename')} #{hit.get('chunk_id')}")
+
+    except Exception as e:
+        logging.error(f"Erreur principale: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()